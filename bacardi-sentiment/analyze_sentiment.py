@@ -1,105 +1,231 @@
 from database import DatabaseManager
-from sentiment_analyzer import SentimentAnalyzer
-import sqlite3
+from sentiment_analyzer import SentimentAnalyzer, ENGINES, scorer_version_for
+from sentiment_cache import SentimentCache
+from collections import deque
+from itertools import islice
+from multiprocessing import Pool
+import argparse
+import config
+import os
 import time
 
-def analyze_all_posts():
-    """Analyze sentiment for all posts without sentiment data"""
-    print("Starting sentiment analysis for all unanalyzed posts...")
+# Per-process analyzer, built once by _init_worker in each pool worker
+_worker_analyzer = None
+
+def score_posts(analyzer, posts):
+    """Score a batch at once, falling back to per-post scoring on errors
     
-    db = DatabaseManager()
-    analyzer = SentimentAnalyzer()
+    Posts that still fail are returned as (post, {'error': message}).
+    """
+    try:
+        batch = analyzer.analyze_batch([post['text'] for post in posts])
+        return list(zip(posts, analyzer.iter_batch_results(batch)))
+    except Exception:
+        results = []
+        for post in posts:
+            try:
+                results.append((post, analyzer.analyze_sentiment(post['text'])))
+            except Exception as e:
+                print(f"Error analyzing post {post['post_id']}: {e}")
+                print(f"Post text preview: {str(post['text'])[:100]}...")
+                results.append((post, {'error': str(e)}))
+        return results
+
+def build_analyzer(use_cache=True, engine='exact'):
+    """Create a SentimentAnalyzer, optionally backed by the persistent cache"""
+    cache = SentimentCache() if use_cache else None
+    return SentimentAnalyzer(cache=cache, engine=engine)
+
+def _analyzer_stats(analyzer):
+    """Current cache and cascade counters of an analyzer"""
+    return {
+        'cache': analyzer.cache.stats() if analyzer.cache is not None else None,
+        'cascade': analyzer.cascade_stats() if analyzer.engine == 'cascade' else None
+    }
+
+def _init_worker(analyzer_options):
+    """Build one SentimentAnalyzer per pool worker"""
+    global _worker_analyzer
+    _worker_analyzer = build_analyzer(**analyzer_options)
+
+def _score_chunk(posts):
+    """Pool task: score a chunk with this worker's analyzer"""
+    results = score_posts(_worker_analyzer, posts)
+    return results, os.getpid(), _analyzer_stats(_worker_analyzer)
+
+def iter_chunks(posts, batch_size):
+    """Lazily split any iterable of posts into lists of at most batch_size"""
+    posts = iter(posts)
+    while True:
+        chunk = list(islice(posts, batch_size))
+        if not chunk:
+            return
+        yield chunk
+
+def iter_scored_chunks(posts, batch_size=500, workers=1, analyzer_options=None, analyzer_stats=None):
+    """Yield lists of (post, sentiment) pairs, scored serially or by a process pool
     
-    # Get all posts without sentiment analysis directly from database
-    conn = sqlite3.connect(db.db_path)
+    posts may be any iterable, including a streaming database cursor; at
+    most two chunks per worker are in flight at a time. When analyzer_stats
+    is a dict it is filled with the latest cache and cascade counters of
+    every scoring process, keyed by pid.
+    """
+    analyzer_options = analyzer_options or {}
+    chunks = iter_chunks(posts, batch_size)
     
-    # First, check what columns exist in the table
-    cursor = conn.execute("PRAGMA table_info(social_posts)")
-    columns = [row[1] for row in cursor.fetchall()]
-    print(f"Available columns: {columns}")
+    if workers <= 1:
+        analyzer = build_analyzer(**analyzer_options)
+        for chunk in chunks:
+            results = score_posts(analyzer, chunk)
+            if analyzer_stats is not None:
+                analyzer_stats[os.getpid()] = _analyzer_stats(analyzer)
+            yield results
+        return
     
-    # Check if confidence_score column exists
-    has_confidence = 'confidence_score' in columns
+    # Workers only score; the caller stays the single writer to SQLite.
+    # Pool.imap would drain the whole input up front, so keep a bounded
+    # window of pending tasks instead.
+    with Pool(processes=workers, initializer=_init_worker, initargs=(analyzer_options,)) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.apply_async(_score_chunk, (chunk,)))
+            if len(pending) < workers * 2:
+                continue
+            results, pid, stats = pending.popleft().get()
+            if analyzer_stats is not None:
+                analyzer_stats[pid] = stats
+            yield results
+        while pending:
+            results, pid, stats = pending.popleft().get()
+            if analyzer_stats is not None:
+                analyzer_stats[pid] = stats
+            yield results
+
+def print_cache_stats(analyzer_stats):
+    """Summarize cache counters collected from every scoring process"""
+    cache_stats = {pid: stats['cache'] for pid, stats in analyzer_stats.items() if stats['cache']}
+    if not cache_stats:
+        return
+    memory_hits = sum(stats['memory_hits'] for stats in cache_stats.values())
+    disk_hits = sum(stats['disk_hits'] for stats in cache_stats.values())
+    misses = sum(stats['misses'] for stats in cache_stats.values())
+    lookups = memory_hits + disk_hits + misses
+    hit_rate = (memory_hits + disk_hits) / lookups * 100 if lookups else 0
+    print(f"Sentiment cache: {memory_hits} memory hits, {disk_hits} disk hits, "
+          f"{misses} misses ({hit_rate:.1f}% of scoring skipped)")
+
+def print_cascade_stats(analyzer_stats):
+    """Summarize how often the cascade engine had to run TextBlob"""
+    cascade_stats = [stats['cascade'] for stats in analyzer_stats.values() if stats['cascade']]
+    if not cascade_stats:
+        return
+    scored = sum(stats['scored'] for stats in cascade_stats)
+    escalated = sum(stats['escalated'] for stats in cascade_stats)
+    escalation_rate = escalated / scored * 100 if scored else 0
+    print(f"Cascade: {escalated}/{scored} posts needed TextBlob "
+          f"({escalation_rate:.1f}% escalated, {100 - escalation_rate:.1f}% approximated)")
+
+def iter_posts(pages):
+    """Flatten DatabaseManager pages into one stream of posts"""
+    for page in pages:
+        yield from page
+
+def split_failures(results):
+    """Separate scored results from (post, error) failures"""
+    scored = [(post, sentiment) for post, sentiment in results if 'error' not in sentiment]
+    failures = [(post, sentiment['error']) for post, sentiment in results if 'error' in sentiment]
+    return scored, failures
+
+def analyze_all_posts(workers=1, batch_size=500, use_cache=True, engine='exact', commit_every=20000,
+                      resume=False):
+    """Analyze sentiment for all posts without sentiment data
     
-    query = '''
-    SELECT post_id, text, platform, author, timestamp 
-    FROM social_posts 
-    WHERE sentiment_label IS NULL OR sentiment_score IS NULL
-    '''
+    Posts are streamed from the database in keyset-paginated pages and
+    results are written with executemany, committing every commit_every
+    rows, so memory stays flat however large the backlog is. Every commit
+    also checkpoints the run (last post id, failures) in analysis_runs,
+    which resume=True continues from.
+    """
+    print("Starting sentiment analysis for all unanalyzed posts...")
     
-    cursor = conn.execute(query)
-    unanalyzed_posts = []
+    db = DatabaseManager()
     
-    for row in cursor.fetchall():
-        unanalyzed_posts.append({
-            'post_id': row[0],
-            'text': row[1],
-            'platform': row[2], 
-            'author': row[3],
-            'timestamp': row[4]
-        })
+    run = db.get_resumable_run() if resume else None
+    if resume and run is None:
+        print("No interrupted run to resume, starting a new one")
+    if run is not None:
+        # Keep the engine of the interrupted run so all its rows match
+        engine = run['engine']
+        print(f"Resuming run {run['run_id']} after post id {run['last_id']} "
+              f"({run['processed']} posts already processed)")
     
-    conn.close()
+    if engine != 'exact':
+        print(f"Using the {engine} scoring engine")
+    if workers > 1:
+        print(f"Using a pool of {workers} worker processes")
     
-    if not unanalyzed_posts:
+    total = db.count_unanalyzed_posts(after_id=run['last_id'] if run else 0)
+    if not total:
+        if run is not None:
+            db.finish_analysis_run(run['run_id'])
         print("✅ All posts already have sentiment analysis!")
         return
     
-    print(f"Found {len(unanalyzed_posts)} posts to analyze...")
-    
-    # Process posts
-    conn = sqlite3.connect(db.db_path)
-    
-    for i, post in enumerate(unanalyzed_posts):
-        try:
-            # Analyze sentiment
-            sentiment = analyzer.analyze_sentiment(post['text'])
-            
-            # Update post directly in database (with or without confidence_score)
-            if has_confidence:
-                update_query = '''
-                UPDATE social_posts 
-                SET sentiment_score = ?, sentiment_label = ?, confidence_score = ?
-                WHERE post_id = ?
-                '''
-                
-                conn.execute(update_query, (
-                    sentiment.get('sentiment_score', 0),
-                    sentiment.get('sentiment_label', 'neutral'),
-                    sentiment.get('confidence_score', 0),
-                    post['post_id']
-                ))
-            else:
-                update_query = '''
-                UPDATE social_posts 
-                SET sentiment_score = ?, sentiment_label = ?
-                WHERE post_id = ?
-                '''
-                
-                conn.execute(update_query, (
-                    sentiment.get('sentiment_score', 0),
-                    sentiment.get('sentiment_label', 'neutral'),
-                    post['post_id']
-                ))
-            
-            # Progress update every 10 posts
-            if (i + 1) % 10 == 0:
-                print(f"Progress: {i + 1}/{len(unanalyzed_posts)} posts analyzed")
-                conn.commit()  # Save progress
-                time.sleep(0.1)  # Small delay
-                
-        except Exception as e:
-            print(f"Error analyzing post {post['post_id']}: {e}")
-            print(f"Post text preview: {post['text'][:100]}...")
+    print(f"Found {total} posts to analyze...")
+    
+    if run is None:
+        run = {'run_id': db.start_analysis_run(scorer_version_for(engine), engine),
+               'last_id': 0, 'processed': 0}
+    
+    # Writes and page reads share the pooled connection; each page is fully
+    # fetched before its results are written, so they never interleave
+    conn = db.get_connection()
+    
+    processed = 0
+    failed = 0
+    last_id = run['last_id']
+    uncommitted = 0
+    failures = []
+    analyzer_stats = {}
+    analyzer_options = {'use_cache': use_cache, 'engine': engine}
+    posts = iter_posts(db.iter_unanalyzed_posts(batch_size, after_id=last_id))
+    for results in iter_scored_chunks(posts, batch_size, workers,
+                                      analyzer_options, analyzer_stats):
+        scored, chunk_failures = split_failures(results)
+        db.update_post_sentiments(scored, conn)
+        failures.extend(chunk_failures)
+        
+        # Chunks come back in id order, so the last one bounds the checkpoint
+        if results:
+            last_id = results[-1][0]['id']
+        processed += len(results)
+        failed += len(chunk_failures)
+        uncommitted += len(results)
+        
+        # Large transactions, no artificial delay between them; the
+        # checkpoint commits together with the results it describes
+        if uncommitted >= commit_every:
+            db.checkpoint_analysis_run(conn, run['run_id'], last_id,
+                                       run['processed'] + processed, failures)
+            conn.commit()
+            uncommitted = 0
+            failures = []
+            print(f"Progress: {processed}/{total} posts analyzed")
     
     # Final commit
+    db.checkpoint_analysis_run(conn, run['run_id'], last_id, run['processed'] + processed, failures)
     conn.commit()
-    conn.close()
+    db.finish_analysis_run(run['run_id'])
+    print(f"Progress: {processed}/{total} posts analyzed")
     
     print("✅ Sentiment analysis complete!")
+    if failed:
+        print(f"⚠️ {failed} posts failed, rerun with --retry-failed to reprocess them")
+    print_cache_stats(analyzer_stats)
+    print_cascade_stats(analyzer_stats)
     
     # Final stats
-    conn = sqlite3.connect(db.db_path)
+    conn = db.get_connection()
     final_query = '''
     SELECT 
         COUNT(*) as total_posts,
@@ -108,12 +234,11 @@ def analyze_all_posts():
     '''
     cursor = conn.execute(final_query)
     result = cursor.fetchone()
-    conn.close()
     
     print(f"Final stats: {result[1]} analyzed posts out of {result[0]} total posts")
     
     # Show breakdown by sentiment
-    conn = sqlite3.connect(db.db_path)
+    conn = db.get_connection()
     breakdown_query = '''
     SELECT 
         sentiment_label,
@@ -127,7 +252,143 @@ def analyze_all_posts():
     print("\nSentiment breakdown:")
     for row in cursor.fetchall():
         print(f"  {row[0]}: {row[1]} posts")
-    conn.close()
+
+def rescore_stale_posts(workers=1, batch_size=500, use_cache=True, engine='exact', commit_every=20000):
+    """Rescore only posts whose scorer_version differs from the current one
+    
+    Work is proportional to the stale rows. Each transaction stamps the
+    rows it rewrites, so an interrupted rescore simply continues on the
+    next invocation.
+    """
+    db = DatabaseManager()
+    current_version = scorer_version_for(engine)
+    
+    total = db.count_stale_posts(current_version)
+    if not total:
+        print(f"✅ All posts already scored by scorer version {current_version}!")
+        return
+    
+    stale_versions = ', '.join(str(version) for version in db.get_stale_versions(current_version))
+    print(f"Rescoring {total} posts from scorer versions [{stale_versions}] to {current_version}...")
+    conn = db.get_connection()
+    
+    processed = 0
+    uncommitted = 0
+    analyzer_options = {'use_cache': use_cache, 'engine': engine}
+    posts = iter_posts(db.iter_stale_posts(current_version, batch_size))
+    for results in iter_scored_chunks(posts, batch_size, workers, analyzer_options):
+        scored, failures = split_failures(results)
+        db.update_post_sentiments(scored, conn)
+        processed += len(scored)
+        uncommitted += len(results)
+        
+        if uncommitted >= commit_every:
+            conn.commit()
+            uncommitted = 0
+            print(f"Progress: {processed}/{total} posts rescored")
+    
+    conn.commit()
+    print(f"✅ Rescored {processed}/{total} stale posts")
+
+def relabel_all_posts(thresholds=None, weights=None):
+    """Apply new thresholds/weights to every post from its stored components"""
+    thresholds = thresholds or config.SENTIMENT_THRESHOLDS
+    weights = weights or config.SENTIMENT_WEIGHTS
+    print(f"Relabeling posts with thresholds {thresholds} and weights {weights}...")
+    
+    db = DatabaseManager()
+    start = time.perf_counter()
+    relabeled, changed, skipped = db.relabel_posts(thresholds, weights)
+    elapsed = time.perf_counter() - start
+    
+    print(f"✅ Rewrote {relabeled} posts in {elapsed:.2f}s ({changed} changed label)")
+    if skipped:
+        print(f"⚠️ {skipped} posts have no stored components; run --rescore-stale to score them")
+
+def retry_failed_posts(workers=1, batch_size=500, use_cache=True, engine='exact'):
+    """Rescore only the posts recorded in analysis_failures"""
+    db = DatabaseManager()
+    
+    total = db.count_failed_posts()
+    if not total:
+        print("✅ No failed posts to retry!")
+        return
+    
+    print(f"Retrying {total} failed posts...")
+    conn = db.get_connection()
+    
+    recovered = 0
+    still_failing = 0
+    analyzer_options = {'use_cache': use_cache, 'engine': engine}
+    posts = iter_posts(db.iter_failed_posts(batch_size))
+    for results in iter_scored_chunks(posts, batch_size, workers, analyzer_options):
+        scored, failures = split_failures(results)
+        db.update_post_sentiments(scored, conn)
+        db.clear_failures(conn, [post for post, _ in scored])
+        db.update_failures(conn, failures)
+        conn.commit()
+        recovered += len(scored)
+        still_failing += len(failures)
+    
+    print(f"✅ Recovered {recovered} posts, {still_failing} still failing")
+
+def main():
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Analyze sentiment for unanalyzed posts")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="number of worker processes used for scoring (default: 1)")
+    parser.add_argument('--batch-size', type=int, default=500,
+                        help="posts per page and scoring chunk (default: 500)")
+    parser.add_argument('--commit-every', type=int, default=20000,
+                        help="rows written per transaction (default: 20000)")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="always rescore instead of consulting the sentiment cache")
+    parser.add_argument('--engine', choices=ENGINES, default='exact',
+                        help="scoring engine: exact TextBlob+VADER, the vectorized lexicon "
+                             "approximation for bulk rescores, or cascade (VADER with approximate "
+                             "TextBlob, exact TextBlob only near a label cut point) (default: exact)")
+    parser.add_argument('--resume', action='store_true',
+                        help="continue the last interrupted run from its checkpoint")
+    parser.add_argument('--retry-failed', action='store_true',
+                        help="only rescore posts that failed in earlier runs")
+    parser.add_argument('--rescore-stale', action='store_true',
+                        help="only rescore posts scored by another scorer version")
+    parser.add_argument('--relabel', action='store_true',
+                        help="recompute scores and labels from stored components without rescoring")
+    parser.add_argument('--positive-threshold', type=float,
+                        help="relabel with this positive cut point instead of config")
+    parser.add_argument('--negative-threshold', type=float,
+                        help="relabel with this negative cut point instead of config")
+    parser.add_argument('--textblob-weight', type=float,
+                        help="relabel with this TextBlob weight; VADER gets the rest")
+    args = parser.parse_args()
+    
+    if args.relabel:
+        thresholds = dict(config.SENTIMENT_THRESHOLDS)
+        if args.positive_threshold is not None:
+            thresholds['positive'] = args.positive_threshold
+        if args.negative_threshold is not None:
+            thresholds['negative'] = args.negative_threshold
+        weights = dict(config.SENTIMENT_WEIGHTS)
+        if args.textblob_weight is not None:
+            weights = {'textblob': args.textblob_weight, 'vader': 1 - args.textblob_weight}
+        relabel_all_posts(thresholds, weights)
+        return
+    
+    if args.retry_failed:
+        retry_failed_posts(workers=args.workers, batch_size=args.batch_size,
+                           use_cache=not args.no_cache, engine=args.engine)
+        return
+    
+    if args.rescore_stale:
+        rescore_stale_posts(workers=args.workers, batch_size=args.batch_size,
+                            use_cache=not args.no_cache, engine=args.engine,
+                            commit_every=args.commit_every)
+        return
+    
+    analyze_all_posts(workers=args.workers, batch_size=args.batch_size,
+                      use_cache=not args.no_cache, engine=args.engine,
+                      commit_every=args.commit_every, resume=args.resume)
 
 if __name__ == "__main__":
-    analyze_all_posts()
\ No newline at end of file
+    main()
\ No newline at end of file
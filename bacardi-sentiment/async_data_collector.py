@@ -273,6 +273,10 @@ class AsyncDataCollector:
         """Save a single post to database"""
         return self.db.save_post(post_data)
     
+    def save_posts(self, posts):
+        """Bulk-save posts; returns inserted, ignored, failed and linked counts"""
+        return self.db.ingest_posts(posts)
+    
     async def collect_api_data_async(self, keywords=None, limit_per_keyword=100):
         """Async API data collection"""
         if keywords is None:
@@ -305,16 +309,9 @@ class AsyncDataCollector:
             print(f"\n✅ API collection complete: {len(all_posts)} posts")
             
             # Save posts to database
-            saved_count = 0
-            for post in all_posts:
-                try:
-                    if self.save_post(post):
-                        saved_count += 1
-                except Exception as e:
-                    print(f"Error saving post: {e}")
-                    continue
-            
-            print(f"💾 Saved {saved_count} posts to database")
+            counts = self.save_posts(all_posts)
+            print(f"💾 Saved {counts['inserted']} posts to database "
+                  f"({counts['ignored']} already stored, {counts['failed']} failed)")
             
         finally:
             # Close Reddit connection
@@ -0,0 +1,112 @@
+import argparse
+import random
+import re
+import time
+from textblob.en.sentiments import PatternAnalyzer
+from analyze_sentiment import iter_scored_chunks, print_cascade_stats
+from sentiment_analyzer import SentimentAnalyzer, ENGINES
+
+# Building blocks for a synthetic mixed Reddit/YouTube corpus
+OPENERS = [
+    "Just tried BACARDÍ Superior", "Honestly Breezer is", "Captain Morgan vs Bacardi:",
+    "Malibu and pineapple", "My bartender swears by Bacardi Gold", "Reserva 8 neat",
+    "Had a mojito with white rum", "Bought a bottle of Kraken rum", "Havana Club daiquiri"
+]
+MIDDLES = [
+    "and it was incredibly smooth", "but the taste was really disappointing",
+    "which is fine I guess", "and I absolutely LOVE it!!!", "not bad, not great",
+    "and the hangover was terrible", "for a great price", "kind of overrated tbh",
+    "and it never disappoints", "but it is way too sweet for me"
+]
+EXTRAS = [
+    "", "", "😀", "😡", "#rumlife", "@bacardi", "https://youtu.be/abc123",
+    "https://reddit.com/r/rum/comments/xyz", "lol", "10/10 would recommend"
+]
+
+def make_corpus(rows, seed=42):
+    """Build a reproducible synthetic corpus of post dicts"""
+    rng = random.Random(seed)
+    posts = []
+    for i in range(rows):
+        text = " ".join(part for part in (
+            rng.choice(OPENERS), rng.choice(MIDDLES), rng.choice(EXTRAS), rng.choice(EXTRAS)
+        ) if part)
+        posts.append({'post_id': f"bench_{i}", 'text': text})
+    return posts
+
+def benchmark_workers(posts, workers, batch_size, engine='exact'):
+    """Score the corpus once and return posts per second"""
+    start = time.perf_counter()
+    scored = 0
+    analyzer_options = {'use_cache': False, 'engine': engine}
+    analyzer_stats = {}
+    for results in iter_scored_chunks(posts, batch_size, workers, analyzer_options, analyzer_stats):
+        scored += len(results)
+    elapsed = time.perf_counter() - start
+    return scored / elapsed if elapsed > 0 else 0.0, analyzer_stats
+
+def legacy_clean_text(text):
+    """The previous three-pass, uncompiled cleaning"""
+    text = re.sub(r'http\S+', '', text)
+    text = re.sub(r'@\w+', '', text)
+    text = re.sub(r'#\w+', '', text)
+    return text.strip()
+
+def benchmark_preprocessing(posts):
+    """Time cleaning and TextBlob scoring, previous path vs current path"""
+    texts = [post['text'] for post in posts]
+    analyzer = SentimentAnalyzer()
+    pattern = PatternAnalyzer()
+    
+    timings = {}
+    for name, clean, polarity in (
+        ('previous', legacy_clean_text, lambda text: pattern.analyze(text)[0]),
+        ('current', analyzer.clean_text, analyzer.textblob_polarity)
+    ):
+        start = time.perf_counter()
+        cleaned_texts = [clean(text) for text in texts]
+        cleaned = time.perf_counter()
+        for cleaned_text in cleaned_texts:
+            polarity(cleaned_text)
+        scored = time.perf_counter()
+        timings[name] = (cleaned - start, scored - cleaned)
+    
+    for name, (clean_time, textblob_time) in timings.items():
+        print(f"   {name:<8}: cleaning {clean_time:.3f}s, TextBlob {textblob_time:.3f}s")
+    previous = sum(timings['previous'])
+    current = sum(timings['current'])
+    print(f"   preprocessing + TextBlob speedup: {previous / current:.2f}x")
+
+def main():
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Benchmark sentiment scoring throughput")
+    parser.add_argument('--rows', type=int, default=20000,
+                        help="size of the synthetic corpus (default: 20000)")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4],
+                        help="worker counts to compare (default: 1 2 4)")
+    parser.add_argument('--batch-size', type=int, default=500,
+                        help="posts per scoring chunk (default: 500)")
+    parser.add_argument('--engine', choices=ENGINES, nargs='+', default=['exact'],
+                        help="scoring engines to compare (default: exact)")
+    parser.add_argument('--preprocessing', action='store_true',
+                        help="also compare cleaning/tokenizing against the previous path")
+    args = parser.parse_args()
+    
+    print(f"🧪 Building synthetic corpus of {args.rows:,} posts...")
+    posts = make_corpus(args.rows)
+    
+    if args.preprocessing:
+        print("Cleaning and tokenizing:")
+        benchmark_preprocessing(posts)
+    
+    baseline = None
+    for engine in args.engine:
+        for workers in args.workers:
+            rate, analyzer_stats = benchmark_workers(posts, workers, args.batch_size, engine)
+            baseline = baseline or rate
+            print(f"   engine={engine:<7} workers={workers:>2}: "
+                  f"{rate:,.0f} posts/s ({rate / baseline:.2f}x)")
+            print_cascade_stats(analyzer_stats)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+import argparse
+import os
+import random
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from database import DatabaseManager
+from post_snapshot import SNAPSHOT_QUERY
+from timestamps import to_day
+
+# The dashboard aggregates in memory (post_snapshot.py); this is the SQL it
+# still runs: snapshot loads and re-reads, then displayed posts by id
+DASHBOARD_QUERIES = {
+    'snapshot load': f"{SNAPSHOT_QUERY} WHERE id > 1000 ORDER BY id",
+    'snapshot changes': "SELECT post_row_id FROM post_changes WHERE seq > 10 AND seq <= 20",
+    'snapshot re-read': f"{SNAPSHOT_QUERY} WHERE id IN (1, 2, 3)",
+    'posts by id': "SELECT id, platform, text, author FROM social_posts WHERE id IN (1, 2, 3)",
+}
+
+def seed_posts(db, rows, seed=42):
+    """Fill an empty database with synthetic posts so the planner has realistic statistics"""
+    rng = random.Random(seed)
+    now = datetime.now()
+    platforms = ['reddit', 'youtube', 'news', 'trustpilot', 'google_reviews']
+    brands = ['primary', 'direct_competitor', 'premium_competitor', 'budget_competitor', 'general']
+    keywords = ['bacardi', 'breezer', 'captain morgan', 'malibu', 'havana club']
+    labels = ['positive', 'negative', 'neutral', None]
+    
+    conn = db.get_connection()
+    epochs = [int((now - timedelta(minutes=rng.randrange(60 * 24 * 730))).timestamp()) for _ in range(rows)]
+    conn.executemany('''
+        INSERT INTO social_posts
+        (platform, post_id, text, author, timestamp, ts_epoch, ts_day, sentiment_score,
+         sentiment_label, engagement_score, keyword_matched, brand_category, canonical_post_id)
+        VALUES (?, ?, ?, ?, datetime(?, 'unixepoch'), ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', [(
+        rng.choice(platforms),
+        f"plan_{i}",
+        f"synthetic post {i}",
+        f"user_{rng.randrange(500)}",
+        epochs[i],
+        epochs[i],
+        to_day(epochs[i]),
+        rng.uniform(-1, 1),
+        rng.choice(labels),
+        rng.uniform(0, 200),
+        rng.choice(keywords),
+        rng.choice(brands),
+        f"plan_{rng.randrange(i)}" if i and rng.random() < 0.2 else None
+    ) for i in range(rows)])
+    conn.execute("ANALYZE")
+    conn.commit()
+
+def capture_manager_queries(db):
+    """Run DatabaseManager's read methods and collect the SELECTs they issue"""
+    statements = []
+    conn = db.get_connection()
+    conn.set_trace_callback(statements.append)
+    try:
+        db.get_sentiment_trends()
+        db.get_platform_breakdown()
+        db.get_recent_posts()
+        db.get_top_negative_posts()
+        db.count_unanalyzed_posts()
+        next(db.iter_unanalyzed_posts(), None)
+    finally:
+        conn.set_trace_callback(None)
+    return [sql for sql in statements if sql.lstrip().upper().startswith('SELECT')]
+
+def full_table_scans(conn, sql):
+    """Plan steps of a query that scan social_posts row by row"""
+    plan = conn.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall()
+    return [detail for _, _, _, detail in plan
+            if detail.startswith('SCAN social_posts') and 'INDEX' not in detail]
+
+def main():
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Check that dashboard and trend queries use indexes")
+    parser.add_argument('--db', help="database to check (default: a synthetic temporary database)")
+    parser.add_argument('--rows', type=int, default=20000,
+                        help="synthetic posts to seed when no --db is given (default: 20000)")
+    args = parser.parse_args()
+    
+    if args.db:
+        db = DatabaseManager(args.db)
+    else:
+        tmp_dir = tempfile.mkdtemp()
+        db = DatabaseManager(os.path.join(tmp_dir, 'query_plans.db'))
+        print(f"🧪 Seeding {args.rows:,} synthetic posts...")
+        seed_posts(db, args.rows)
+    
+    queries = [(f"DatabaseManager #{i + 1}", sql) for i, sql in enumerate(capture_manager_queries(db))]
+    queries += [(f"dashboard {name}", sql) for name, sql in DASHBOARD_QUERIES.items()]
+    
+    conn = db.get_connection()
+    failures = 0
+    for name, sql in queries:
+        scans = full_table_scans(conn, sql)
+        if scans:
+            failures += 1
+            print(f"❌ {name}: {'; '.join(scans)}")
+        else:
+            print(f"✅ {name}")
+    
+    db.close_all()
+    print(f"\n{len(queries) - failures}/{len(queries)} queries avoid full table scans")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
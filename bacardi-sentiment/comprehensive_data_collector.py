@@ -1,37 +1,22 @@
 import asyncio
 import praw
 import requests
-import sqlite3
 from datetime import datetime, timedelta
 import time
 import random
 import config
 from database import DatabaseManager
 from sentiment_analyzer import SentimentAnalyzer
+from sentiment_cache import SentimentCache
+from analyze_sentiment import score_posts
 
 class ComprehensiveDataCollector:
     def __init__(self):
         self.db = DatabaseManager()
-        self.analyzer = SentimentAnalyzer()
+        self.analyzer = SentimentAnalyzer(cache=SentimentCache())
         
-        # Enhanced keyword list
-        self.enhanced_keywords = [
-            # Primary Bacardi brands
-            'bacardi', 'breezer', 'bacardi rum', 'bacardi superior', 'bacardi gold',
-            'BACARDÍ Reserva 8', 'BACARDÍ Carta', 'BACARDI', 'Bacardilegacy', 'Bacardilimon',
-            
-            # Brand variations and campaigns
-            'cocacolabacardilegacy', 'bacardi reserva', 'bacardi carta blanca',
-            'bacardi heritage', 'bacardi premium', 'bacardi white rum',
-            
-            # Competitors
-            'captain morgan', 'malibu', 'absolut vodka', 'smirnoff', 'grey goose',
-            'hennessy', 'jose cuervo', 'johnnie walker', 'havana club', 'kraken rum',
-            
-            # Generic terms
-            'rum review', 'best rum', 'premium rum', 'white rum', 'spiced rum',
-            'rum cocktail', 'mojito', 'rum and coke', 'daiquiri'
-        ]
+        # Enhanced keyword list, shared with the keyword mention index
+        self.enhanced_keywords = list(config.ENHANCED_KEYWORDS)
         
         # Initialize Reddit API
         try:
@@ -435,39 +420,45 @@ class ComprehensiveDataCollector:
         """Save a single post to database"""
         return self.db.save_post(post_data)
     
+    def save_posts(self, posts):
+        """Bulk-save posts; returns inserted, ignored, failed and linked counts"""
+        return self.db.ingest_posts(posts)
+    
     def analyze_sentiment_for_posts(self, posts):
         """Analyze sentiment for collected posts"""
         print(f"\n🧠 Analyzing sentiment for {len(posts)} posts...")
         
         analyzed_posts = []
-        for i, post in enumerate(posts):
-            try:
-                sentiment = self.analyzer.analyze_sentiment(post['text'])
-                
-                # Add sentiment data to post
-                post.update({
-                    'sentiment_score': sentiment['sentiment_score'],
-                    'sentiment_label': sentiment['sentiment_label'],
-                    'confidence_score': sentiment['confidence']
-                })
-                
-                analyzed_posts.append(post)
-                
-                # Progress update
-                if (i + 1) % 25 == 0:
-                    print(f"  Progress: {i + 1}/{len(posts)} posts analyzed")
-                    
-            except Exception as e:
-                print(f"  ⚠️ Error analyzing sentiment for post {i}: {e}")
-                # Add neutral sentiment as fallback
-                post.update({
-                    'sentiment_score': 0.0,
-                    'sentiment_label': 'neutral',
-                    'confidence_score': 0.0
-                })
+        batch_size = 100
+        for start in range(0, len(posts), batch_size):
+            chunk = posts[start:start + batch_size]
+            
+            # Add sentiment data to posts; a failing batch is rescored post by post
+            for post, sentiment in score_posts(self.analyzer, chunk):
+                if 'error' in sentiment:
+                    # Add neutral sentiment as fallback
+                    post.update({
+                        'sentiment_score': 0.0,
+                        'sentiment_label': 'neutral',
+                        'confidence_score': 0.0
+                    })
+                else:
+                    post.update({
+                        'sentiment_score': sentiment['sentiment_score'],
+                        'sentiment_label': sentiment['sentiment_label'],
+                        'confidence_score': sentiment['confidence'],
+                        'textblob_score': sentiment['textblob_score'],
+                        'vader_score': sentiment['vader_score'],
+                        'scorer_version': sentiment['scorer_version']
+                    })
                 analyzed_posts.append(post)
+            
+            # Progress update
+            print(f"  Progress: {start + len(chunk)}/{len(posts)} posts analyzed")
         
         print(f"✅ Sentiment analysis complete!")
+        cache_stats = self.analyzer.cache.stats()
+        print(f"   💾 Sentiment cache hit rate: {cache_stats['hit_rate'] * 100:.1f}%")
         return analyzed_posts
     
     def comprehensive_collection(self, custom_keywords=None, analyze_sentiment=True):
@@ -506,16 +497,10 @@ class ComprehensiveDataCollector:
                 keyword_posts = self.analyze_sentiment_for_posts(keyword_posts)
             
             # Save posts to database
-            saved_count = 0
-            for post in keyword_posts:
-                try:
-                    if self.save_post(post):
-                        saved_count += 1
-                except Exception as e:
-                    print(f"   ⚠️ Error saving post: {e}")
-                    continue
-            
-            print(f"   💾 Saved: {saved_count} posts to database")
+            counts = self.save_posts(keyword_posts)
+            saved_count = counts['inserted']
+            print(f"   💾 Saved: {saved_count} posts to database "
+                  f"({counts['ignored']} already stored, {counts['failed']} failed)")
             
             # Track stats
             keyword_stats[keyword] = {
@@ -564,8 +549,7 @@ class ComprehensiveDataCollector:
         
         # Database summary
         try:
-            import sqlite3
-            conn = sqlite3.connect(self.db.db_path)
+            conn = self.db.get_connection()
             
             # Platform breakdown
             platform_query = '''
@@ -617,8 +601,6 @@ class ComprehensiveDataCollector:
                 percentage = (row[1] / total_saved * 100) if total_saved > 0 else 0
                 print(f"   {row[0].title()}: {row[1]:,} posts ({percentage:.1f}%) - Avg Score: {row[2]:.3f}")
             
-            conn.close()
-            
         except Exception as e:
             print(f"⚠️ Error generating database summary: {e}")
         
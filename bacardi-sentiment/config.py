@@ -25,6 +25,25 @@ COMPETITORS = [
     'kraken rum'
 ]
 
+# Full keyword set of the comprehensive collector, also indexed as mentions
+ENHANCED_KEYWORDS = [
+    # Primary Bacardi brands
+    'bacardi', 'breezer', 'bacardi rum', 'bacardi superior', 'bacardi gold',
+    'BACARDÍ Reserva 8', 'BACARDÍ Carta', 'BACARDI', 'Bacardilegacy', 'Bacardilimon',
+    
+    # Brand variations and campaigns
+    'cocacolabacardilegacy', 'bacardi reserva', 'bacardi carta blanca',
+    'bacardi heritage', 'bacardi premium', 'bacardi white rum',
+    
+    # Competitors
+    'captain morgan', 'malibu', 'absolut vodka', 'smirnoff', 'grey goose',
+    'hennessy', 'jose cuervo', 'johnnie walker', 'havana club', 'kraken rum',
+    
+    # Generic terms
+    'rum review', 'best rum', 'premium rum', 'white rum', 'spiced rum',
+    'rum cocktail', 'mojito', 'rum and coke', 'daiquiri'
+]
+
 # Try to import API keys from local config file
 try:
     from config_local import *
@@ -48,6 +67,17 @@ SENTIMENT_THRESHOLDS = {
     'negative': -0.1
 }
 
+# Weights of the TextBlob and VADER components in the combined score
+SENTIMENT_WEIGHTS = {
+    'textblob': 0.5,
+    'vader': 0.5
+}
+
+# Cascade engine: TextBlob only runs when the combined score with its
+# approximated TextBlob term lies within this distance of a
+# SENTIMENT_THRESHOLDS cut point
+CASCADE_UNCERTAINTY_BAND = 0.25
+
 # Collection settings
 DEFAULT_TWEET_LIMIT = 100
 DEFAULT_REDDIT_LIMIT = 50
@@ -3,9 +3,10 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-import sqlite3
 from datetime import datetime, timedelta
 import time
+from timestamps import format_epoch
+from query_builder import in_list, window_start
 
 # Page config
 st.set_page_config(
@@ -82,6 +83,15 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# Sidebar time periods as rolling windows in days
+DATE_RANGE_DAYS = {
+    "Last 2 years": 730,
+    "Last 1 year": 365,
+    "Last 6 months": 182,
+    "Last 3 months": 91,
+    "Last 30 days": 30,
+}
+
 # Initialize database connection
 @st.cache_resource
 def init_database():
@@ -92,27 +102,91 @@ def init_database():
         st.error("❌ Database module not found. Please ensure database.py exists.")
         return None
 
-def get_engagement_formula(conn):
-    """Build engagement calculation based on available columns"""
-    column_check = conn.execute("PRAGMA table_info(social_posts)").fetchall()
-    column_names = [col[1] for col in column_check]
+# Process-wide columnar copy of social_posts, shared by every session and
+# by the DatabaseManager's trend and platform readers
+def load_snapshot():
+    return init_database().snapshot
+
+def fetch_posts(conn, columns, ids):
+    """Columns of the social_posts rows with these ids, in the order of ids"""
+    placeholders, params = in_list(ids)
+    posts_df = pd.read_sql_query(f"SELECT id, {columns} FROM social_posts WHERE id IN {placeholders}",
+                                 conn, params=params)
+    order = {post_id: position for position, post_id in enumerate(ids)}
+    posts_df = posts_df.sort_values('id', key=lambda column: column.map(order))
+    return posts_df.drop(columns='id').reset_index(drop=True)
+
+# Cached loaders. Every key includes DatabaseManager.get_data_version(), which
+# moves whenever a collector or the analyzer writes, so cached results are
+# reused until the data changes and never after.
+@st.cache_data(max_entries=8, show_spinner=False)
+def load_overview(data_version):
+    """Summary of every stored post, near-duplicates included"""
+    snapshot = load_snapshot()
+    with snapshot.lock:
+        snapshot.refresh(init_database().get_connection())
+        return snapshot.summary(snapshot.mask(include_duplicates=True))
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def load_panels(filters, data_version):
+    """Data for every dashboard panel under one filter selection, as a dict
     
-    engagement_calc = []
-    if 'likes' in column_names:
-        engagement_calc.append('COALESCE(likes, 0)')
-    if 'upvotes' in column_names:
-        engagement_calc.append('COALESCE(upvotes, 0)')
-    if 'comments' in column_names:
-        engagement_calc.append('COALESCE(comments, 0)')
-    if 'retweets' in column_names:
-        engagement_calc.append('COALESCE(retweets, 0)')
-    if 'engagement_score' in column_names:
-        return 'COALESCE(engagement_score, 0)'
+    filters is a sorted tuple of PostSnapshot.mask() keyword arguments.
+    Every panel's numbers come from one aggregation pass over the
+    in-memory snapshot; only the displayed posts are read from SQL, by id.
+    """
+    db = init_database()
+    snapshot = load_snapshot()
+    with snapshot.lock:
+        snapshot.refresh(db.get_connection())
+        mask = snapshot.mask(**dict(filters))
+        aggregates = snapshot.aggregate(mask)
+        panels = {
+            'stats': aggregates['summary'],
+            'dist_df': aggregates['sentiment_label'],
+            'platform_df': aggregates['platform'],
+            'brand_df': aggregates['brand_category'],
+            'timeline_df': aggregates['day'],
+            'keyword_df': aggregates['keyword_matched'],
+        }
+        top_post_ids = snapshot.top_ids(mask, 'engagement', 15)
+        recent_post_ids = snapshot.top_ids(mask, 'epoch', 20)
+    
+    conn = db.get_connection()
+    panels['top_posts_df'] = fetch_posts(conn, '''
+        platform,
+        text,
+        author,
+        sentiment_label,
+        sentiment_score,
+        COALESCE(engagement_score, 0) as total_engagement,
+        timestamp,
+        brand_category,
+        keyword_matched
+    ''', top_post_ids)
+    panels['recent_df'] = fetch_posts(conn, '''
+        platform,
+        author,
+        CASE
+            WHEN LENGTH(text) > 150 THEN SUBSTR(text, 1, 150) || '...'
+            ELSE text
+        END as text_preview,
+        sentiment_label,
+        ROUND(sentiment_score, 3) as sentiment_score,
+        COALESCE(datetime(ts_epoch, 'unixepoch'), 'No date available') as timestamp,
+        brand_category,
+        keyword_matched,
+        COALESCE(engagement_score, 0) as engagement
+    ''', recent_post_ids)
+    return panels
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def load_search_results(query, filters, data_version, since):
+    """DatabaseManager.search_posts() for a sorted tuple of filters
     
-    if engagement_calc:
-        return ' + '.join(engagement_calc)
-    else:
-        return '0'
+    since, the window_start() bound of the days filter, only keys the cache.
+    """
+    return init_database().search_posts(query, dict(filters), limit=50)
 
 def main():
     st.markdown('<h1 class="main-header">🥃 Bacardi Sentiment Analysis Dashboard</h1>', unsafe_allow_html=True)
@@ -123,13 +197,16 @@ def main():
     if not db:
         st.stop()
     
+    # Moves on every write to social_posts; part of each cache key
+    data_version = db.get_data_version()
+    
     # Sidebar controls
     st.sidebar.header("📊 Dashboard Controls")
     
     # Auto-refresh toggle
     auto_refresh = st.sidebar.checkbox("🔄 Auto-refresh (30s)", value=False)
     
-    # Manual refresh button
+    # Manual refresh button: writes already invalidate the caches, this drops them regardless
     if st.sidebar.button("🔄 Refresh Data"):
         st.cache_data.clear()
         st.rerun()
@@ -137,21 +214,11 @@ def main():
     # Sentiment Analysis Status
     st.sidebar.subheader("🧠 Sentiment Analysis Status")
     try:
-        conn = sqlite3.connect(db.db_path)
+        overall = load_overview(data_version)
         
-        analysis_query = '''
-        SELECT 
-            COUNT(*) as total_posts,
-            SUM(CASE WHEN sentiment_label IS NOT NULL THEN 1 ELSE 0 END) as analyzed_posts
-        FROM social_posts
-        '''
-        
-        analysis_df = pd.read_sql_query(analysis_query, conn)
-        conn.close()
-        
-        if not analysis_df.empty:
-            total = int(analysis_df.iloc[0]['total_posts'])
-            analyzed = int(analysis_df.iloc[0]['analyzed_posts'])
+        if overall['total_posts'] > 0:
+            total = overall['total_posts']
+            analyzed = overall['analyzed_posts']
             unanalyzed = total - analyzed
             progress = (analyzed / total * 100) if total > 0 else 0
             
@@ -194,6 +261,7 @@ def main():
     st.sidebar.subheader("🔍 Advanced Filters")
     min_engagement = st.sidebar.slider("Minimum engagement:", 0, 100, 0)
     show_verified_only = st.sidebar.checkbox("Verified authors only", value=False)
+    include_duplicates = st.sidebar.checkbox("Include near-duplicate posts", value=False)
     
     # Platform colors
     platform_colors = {
@@ -225,78 +293,32 @@ def main():
         time.sleep(30)
         st.rerun()
     
-    # Build filters based on selections
-    def build_filters():
-        filters = ["1=1"]  # Always true condition
-        
-        # Date filter
-        if date_range == "Last 2 years":
-            filters.append("timestamp >= datetime('now', '-2 years')")
-        elif date_range == "Last 1 year":
-            filters.append("timestamp >= datetime('now', '-1 year')")
-        elif date_range == "Last 6 months":
-            filters.append("timestamp >= datetime('now', '-6 months')")
-        elif date_range == "Last 3 months":
-            filters.append("timestamp >= datetime('now', '-3 months')")
-        elif date_range == "Last 30 days":
-            filters.append("timestamp >= datetime('now', '-30 days')")
-        
-        # Platform filter
-        if selected_platform != "All":
-            filters.append(f"platform = '{selected_platform}'")
-        
-        # Brand filter
-        if selected_brand != "All":
-            filters.append(f"brand_category = '{selected_brand}'")
-        
-        # Sentiment filter
-        if sentiment_filter != "All":
-            filters.append(f"sentiment_label = '{sentiment_filter}'")
-        
-        # Engagement filter
-        if min_engagement > 0:
-            conn_temp = sqlite3.connect(db.db_path)
-            engagement_formula = get_engagement_formula(conn_temp)
-            conn_temp.close()
-            filters.append(f"({engagement_formula}) >= {min_engagement}")
-        
-        # Verified filter
-        if show_verified_only:
-            filters.append("verified = 1")
-        
-        return " AND ".join(filters)
-    
-    filter_clause = build_filters()
+    # Sidebar selections as PostSnapshot.mask() filters; None means "All"
+    snapshot_filters = {
+        'since': window_start(DATE_RANGE_DAYS[date_range]) if date_range in DATE_RANGE_DAYS else None,
+        'platform': selected_platform if selected_platform != "All" else None,
+        'brand_category': selected_brand if selected_brand != "All" else None,
+        'sentiment_label': sentiment_filter if sentiment_filter != "All" else None,
+        'min_engagement': min_engagement,
+        'verified_only': show_verified_only,
+        'include_duplicates': include_duplicates,
+    }
     
     # Main dashboard content
     try:
-        conn = sqlite3.connect(db.db_path)
-        engagement_formula = get_engagement_formula(conn)
-        
-        # Overall metrics
-        metrics_query = f'''
-        SELECT 
-            AVG(sentiment_score) as avg_sentiment,
-            COUNT(*) as total_posts,
-            SUM(CASE WHEN sentiment_label = 'positive' THEN 1 ELSE 0 END) as positive_count,
-            SUM(CASE WHEN sentiment_label = 'negative' THEN 1 ELSE 0 END) as negative_count,
-            SUM(CASE WHEN sentiment_label = 'neutral' THEN 1 ELSE 0 END) as neutral_count,
-            MIN(timestamp) as earliest_post,
-            MAX(timestamp) as latest_post,
-            COUNT(DISTINCT platform) as platforms_covered,
-            COUNT(DISTINCT brand_category) as brand_categories,
-            AVG({engagement_formula}) as avg_engagement
-        FROM social_posts 
-        WHERE {filter_clause}
-        '''
-        
-        stats_df = pd.read_sql_query(metrics_query, conn)
-        stats = stats_df.iloc[0] if not stats_df.empty and stats_df.iloc[0]['total_posts'] > 0 else None
-        
-        if stats is None or stats['total_posts'] == 0:
+        panels = load_panels(tuple(sorted(snapshot_filters.items())), data_version)
+        stats = panels['stats']
+        dist_df = panels['dist_df']
+        platform_df = panels['platform_df']
+        brand_df = panels['brand_df']
+        timeline_df = panels['timeline_df']
+        keyword_df = panels['keyword_df']
+        top_posts_df = panels['top_posts_df']
+        recent_df = panels['recent_df']
+        
+        if stats['total_posts'] == 0:
             st.warning("⚠️ No data available for the selected filters.")
             st.info("Try adjusting your filters or run the data collector to gather more data.")
-            conn.close()
             return
         
         # Display key metrics
@@ -347,16 +369,7 @@ def main():
         with col1:
             st.subheader("📊 Sentiment Distribution")
             
-            dist_query = f'''
-            SELECT 
-                sentiment_label,
-                COUNT(*) as count
-            FROM social_posts 
-            WHERE {filter_clause} AND sentiment_label IS NOT NULL
-            GROUP BY sentiment_label
-            '''
-            
-            dist_df = pd.read_sql_query(dist_query, conn)
+            dist_df = dist_df.rename(columns={'post_count': 'count'})
             
             if not dist_df.empty:
                 fig = px.pie(
@@ -376,21 +389,7 @@ def main():
         with col2:
             st.subheader("📱 Platform Breakdown")
             
-            platform_query = f'''
-            SELECT 
-                platform,
-                COUNT(*) as post_count,
-                AVG(sentiment_score) as avg_sentiment,
-                SUM(CASE WHEN sentiment_label = 'positive' THEN 1 ELSE 0 END) as positive_count,
-                SUM(CASE WHEN sentiment_label = 'negative' THEN 1 ELSE 0 END) as negative_count
-            FROM social_posts 
-            WHERE {filter_clause}
-            AND platform NOT IN ('instagram', 'twitter')
-            GROUP BY platform
-            ORDER BY post_count DESC
-            '''
-            
-            platform_df = pd.read_sql_query(platform_query, conn)
+            platform_df = platform_df[~platform_df['platform'].isin(['instagram', 'twitter'])]
             
             if not platform_df.empty:
                 fig = px.bar(
@@ -414,22 +413,7 @@ def main():
         # Brand Category Analysis
         st.subheader("🏢 Brand Category Analysis")
         
-        brand_query = f'''
-        SELECT 
-            brand_category,
-            COUNT(*) as post_count,
-            AVG(sentiment_score) as avg_sentiment,
-            SUM(CASE WHEN sentiment_label = 'positive' THEN 1 ELSE 0 END) as positive_count,
-            SUM(CASE WHEN sentiment_label = 'negative' THEN 1 ELSE 0 END) as negative_count,
-            AVG({engagement_formula}) as avg_engagement
-        FROM social_posts 
-        WHERE {filter_clause} AND brand_category IS NOT NULL 
-        AND brand_category != 'general'
-        GROUP BY brand_category
-        ORDER BY post_count DESC
-        '''
-        
-        brand_df = pd.read_sql_query(brand_query, conn)
+        brand_df = brand_df[brand_df['brand_category'] != 'general']
         
         if not brand_df.empty:
             col1, col2 = st.columns(2)
@@ -466,27 +450,10 @@ def main():
         # Timeline Analysis
         st.subheader("📈 Sentiment Timeline")
         
-        timeline_query = f'''
-        SELECT 
-            DATE(timestamp) as date,
-            AVG(sentiment_score) as avg_sentiment,
-            COUNT(*) as post_count,
-            SUM(CASE WHEN sentiment_label = 'positive' THEN 1 ELSE 0 END) as positive_count,
-            SUM(CASE WHEN sentiment_label = 'negative' THEN 1 ELSE 0 END) as negative_count
-        FROM social_posts 
-        WHERE {filter_clause} 
-        AND timestamp IS NOT NULL 
-        AND timestamp != ''
-        AND timestamp != 'null'
-        GROUP BY DATE(timestamp)
-        ORDER BY date DESC
-        LIMIT 30
-        '''
-        
-        timeline_df = pd.read_sql_query(timeline_query, conn)
+        # Latest 30 days with posts
+        timeline_df = timeline_df.rename(columns={'day': 'date'}).sort_values('date').tail(30)
         
         if not timeline_df.empty:
-            timeline_df = timeline_df.sort_values('date')  # Sort chronologically for display
             
             fig = make_subplots(
                 rows=2, cols=1,
@@ -532,23 +499,11 @@ def main():
             st.plotly_chart(fig, use_container_width=True)
             
             # Add info about data quality
-            conn_temp = sqlite3.connect(db.db_path)
-            data_quality_query = '''
-            SELECT 
-                COUNT(*) as total_posts,
-                SUM(CASE WHEN timestamp IS NOT NULL AND timestamp != '' AND timestamp != 'null' THEN 1 ELSE 0 END) as posts_with_valid_dates,
-                SUM(CASE WHEN timestamp IS NULL OR timestamp = '' OR timestamp = 'null' THEN 1 ELSE 0 END) as posts_with_null_dates
-            FROM social_posts
-            '''
-            quality_result = pd.read_sql_query(data_quality_query, conn_temp)
-            conn_temp.close()
+            total = overall['total_posts']
+            valid = overall['dated_posts']
+            null_dates = total - valid
             
-            if not quality_result.empty:
-                total = quality_result.iloc[0]['total_posts']
-                valid = quality_result.iloc[0]['posts_with_valid_dates']
-                null_dates = quality_result.iloc[0]['posts_with_null_dates']
-                
-                st.info(f"📊 Data Quality: {valid:,} posts with valid dates, {null_dates:,} posts with missing timestamps out of {total:,} total posts")
+            st.info(f"📊 Data Quality: {valid:,} posts with valid dates, {null_dates:,} posts with missing timestamps out of {total:,} total posts")
         else:
             st.warning("⚠️ No posts with valid timestamps found for the selected filters.")
             st.info("💡 Most posts in the database appear to have NULL timestamps. This is likely due to data collection issues where timestamp data wasn't properly captured.")
@@ -556,23 +511,10 @@ def main():
         # Keyword Analysis
         st.subheader("🔥 Keyword Analysis")
         try:
-            keyword_query = f'''
-            SELECT 
-                keyword_matched,
-                COUNT(*) as mention_count,
-                AVG(sentiment_score) as avg_sentiment,
-                SUM(CASE WHEN sentiment_label = 'positive' THEN 1 ELSE 0 END) as positive_count,
-                SUM(CASE WHEN sentiment_label = 'negative' THEN 1 ELSE 0 END) as negative_count
-            FROM social_posts 
-            WHERE keyword_matched IS NOT NULL AND keyword_matched != ''
-            AND keyword_matched NOT LIKE '%rum%'
-            AND {filter_clause}
-            GROUP BY keyword_matched
-            ORDER BY mention_count DESC
-            LIMIT 10
-            '''
-            
-            keyword_df = pd.read_sql_query(keyword_query, conn)
+            keyword_df = keyword_df[
+                (keyword_df['keyword_matched'] != '') &
+                ~keyword_df['keyword_matched'].str.contains('rum', case=False, regex=False)
+            ].rename(columns={'post_count': 'mention_count'}).head(10)
             
             if not keyword_df.empty:
                 col1, col2 = st.columns(2)
@@ -605,25 +547,6 @@ def main():
         # Top Performing Content
         st.subheader("🔥 Top Performing Content")
         
-        top_posts_query = f'''
-        SELECT 
-            platform,
-            text,
-            author,
-            sentiment_label,
-            sentiment_score,
-            ({engagement_formula}) as total_engagement,
-            timestamp,
-            brand_category,
-            keyword_matched
-        FROM social_posts 
-        WHERE {filter_clause}
-        ORDER BY total_engagement DESC
-        LIMIT 15
-        '''
-        
-        top_posts_df = pd.read_sql_query(top_posts_query, conn)
-        
         if not top_posts_df.empty:
             with st.expander("View Top 15 Most Engaging Posts"):
                 for _, post in top_posts_df.iterrows():
@@ -647,41 +570,37 @@ def main():
                     </div>
                     """, unsafe_allow_html=True)
         
+        # Full-text search
+        st.subheader("🔎 Search Posts")
+        search_text = st.text_input(
+            "Search post text:",
+            placeholder="e.g. hangover, price, campaign name (all words must appear; end a word with * for prefixes)"
+        )
+        if search_text:
+            search_filters = {
+                'platform': selected_platform if selected_platform != "All" else None,
+                'brand_category': selected_brand if selected_brand != "All" else None,
+                'sentiment_label': sentiment_filter if sentiment_filter != "All" else None,
+                'days': DATE_RANGE_DAYS.get(date_range),
+                'min_engagement': min_engagement,
+                'verified_only': show_verified_only,
+                'include_duplicates': include_duplicates,
+            }
+            try:
+                search_df = load_search_results(
+                    search_text, tuple(sorted(search_filters.items())), data_version, snapshot_filters['since']
+                )
+                if not search_df.empty:
+                    st.caption(f"{len(search_df)} best matches for the selected filters")
+                    st.dataframe(search_df.drop(columns=['rank']), use_container_width=True, hide_index=True)
+                else:
+                    st.info("No posts match this search for the selected filters.")
+            except Exception as e:
+                st.error(f"Error searching posts: {e}")
+        
         # Recent Posts Section
         st.subheader("📰 Recent Posts Sample")
         try:
-            recent_query = f'''
-            SELECT 
-                platform,
-                author,
-                CASE 
-                    WHEN LENGTH(text) > 150 THEN SUBSTR(text, 1, 150) || '...'
-                    ELSE text
-                END as text_preview,
-                sentiment_label,
-                ROUND(sentiment_score, 3) as sentiment_score,
-                CASE 
-                    WHEN timestamp IS NOT NULL AND timestamp != '' AND timestamp != 'null' 
-                    THEN DATETIME(timestamp)
-                    ELSE 'No date available'
-                END as timestamp,
-                brand_category,
-                keyword_matched,
-                ({engagement_formula}) as engagement
-            FROM social_posts 
-            WHERE {filter_clause}
-            ORDER BY 
-                CASE 
-                    WHEN timestamp IS NOT NULL AND timestamp != '' AND timestamp != 'null' 
-                    THEN timestamp 
-                    ELSE '1900-01-01' 
-                END DESC,
-                id DESC
-            LIMIT 20
-            '''
-            
-            recent_df = pd.read_sql_query(recent_query, conn)
-            
             if not recent_df.empty:
                 def highlight_sentiment(row):
                     if row['sentiment_label'] == 'positive':
@@ -753,46 +672,28 @@ def main():
                         mime="text/csv"
                     )
         
-        conn.close()
-    
     except Exception as e:
         st.error(f"Error loading dashboard data: {e}")
         st.error("Please check your database connection and ensure data has been collected.")
     
     # Footer with database info
     try:
-        conn = sqlite3.connect(db.db_path)
-        
-        footer_query = '''
-        SELECT 
-            COUNT(*) as total_posts,
-            COUNT(DISTINCT platform) as platforms,
-            MIN(timestamp) as earliest,
-            MAX(timestamp) as latest,
-            SUM(CASE WHEN sentiment_label IS NOT NULL THEN 1 ELSE 0 END) as processed_posts
-        FROM social_posts
-        '''
-        
-        footer_df = pd.read_sql_query(footer_query, conn)
-        conn.close()
-        
-        if not footer_df.empty:
-            info = footer_df.iloc[0]
-            
-            footer_text = (
-                f"📊 Dashboard | Updated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} | "
-                f"Total Posts: {int(info['total_posts']):,} | "
-                f"Processed: {int(info['processed_posts']):,} | "
-                f"Platforms: {int(info['platforms'])}"
-            )
-            
-            if info['earliest'] and info['latest']:
-                footer_text += f" | Period: {info['earliest'][:10]} to {info['latest'][:10]}"
-            
-            if info['processed_posts'] < info['total_posts']:
-                footer_text += f" | ⚠️ {int(info['total_posts']) - int(info['processed_posts'])} posts need sentiment analysis"
-            
-            st.caption(footer_text)
+        info = overall
+        
+        footer_text = (
+            f"📊 Dashboard | Updated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} | "
+            f"Total Posts: {info['total_posts']:,} | "
+            f"Processed: {info['analyzed_posts']:,} | "
+            f"Platforms: {info['platforms_covered']}"
+        )
+        
+        if info['earliest_epoch'] is not None:
+            footer_text += f" | Period: {format_epoch(info['earliest_epoch'])[:10]} to {format_epoch(info['latest_epoch'])[:10]}"
+        
+        if info['analyzed_posts'] < info['total_posts']:
+            footer_text += f" | ⚠️ {info['total_posts'] - info['analyzed_posts']} posts need sentiment analysis"
+        
+        st.caption(footer_text)
         
     except Exception as e:
         st.caption(f"📊 Dashboard | Updated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
@@ -1,6 +1,5 @@
 import praw
 import requests
-import sqlite3
 from datetime import datetime, timedelta
 import time
 import random
@@ -264,39 +263,11 @@ class EnhancedDataCollector:
     
     def save_post(self, post_data):
         """Save a single post to database"""
-        conn = sqlite3.connect(self.db.db_path)
-        cursor = conn.cursor()
-        
-        try:
-            cursor.execute('''
-                INSERT OR IGNORE INTO social_posts 
-                (platform, post_id, text, author, timestamp, likes, 
-                 comments, upvotes, url, keyword_matched, brand_category, subreddit, video_id)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                post_data.get('platform'),
-                post_data.get('post_id'),
-                post_data.get('text'),
-                post_data.get('author'),
-                post_data.get('timestamp'),
-                post_data.get('likes', 0),
-                post_data.get('comments', 0),
-                post_data.get('upvotes', 0),
-                post_data.get('url'),
-                post_data.get('keyword_matched'),
-                post_data.get('brand_category'),
-                post_data.get('subreddit'),
-                post_data.get('video_id')
-            ))
-            
-            conn.commit()
-            return cursor.rowcount > 0
-            
-        except Exception as e:
-            print(f"Error saving post: {e}")
-            return False
-        finally:
-            conn.close()
+        return self.db.save_post(post_data)
+    
+    def save_posts(self, posts):
+        """Bulk-save posts; returns inserted, ignored, failed and linked counts"""
+        return self.db.ingest_posts(posts)
     
     def collect_competitor_data(self):
         """Collect data for all competitors defined in config"""
@@ -341,16 +312,9 @@ class EnhancedDataCollector:
             
             # Save to database
             if brand_posts:
-                saved_count = 0
-                for post in brand_posts:
-                    try:
-                        if self.save_post(post):
-                            saved_count += 1
-                    except Exception as e:
-                        print(f"⚠️ Error saving post: {e}")
-                        continue
-                
-                print(f"  💾 Saved: {saved_count} posts to database")
+                counts = self.save_posts(brand_posts)
+                print(f"  💾 Saved: {counts['inserted']} posts to database "
+                      f"({counts['ignored']} already stored, {counts['failed']} failed)")
                 all_posts.extend(brand_posts)
             else:
                 print(f"  ⚠️ No data collected for {brand}")
@@ -373,7 +337,7 @@ class EnhancedDataCollector:
         print("=" * 40)
         
         try:
-            conn = sqlite3.connect(self.db.db_path)
+            conn = self.db.get_connection()
             
             for brand in brands:
                 query = '''
@@ -417,8 +381,6 @@ class EnhancedDataCollector:
                 for row in results:
                     print(f"   {row[0].title().replace('_', ' ')}: {row[1]} posts ({row[2]} brands)")
             
-            conn.close()
-            
         except Exception as e:
             print(f"⚠️ Error generating summary: {e}")
         
@@ -452,10 +414,7 @@ class EnhancedDataCollector:
                 for post in reddit_posts:
                     post['keyword_matched'] = keyword
                     post['brand_category'] = 'general'
-                    try:
-                        self.save_post(post)
-                    except:
-                        pass
+                self.save_posts(reddit_posts)
                 print(f"  📊 Reddit: {len(reddit_posts)} posts")
             
             # YouTube search
@@ -464,10 +423,7 @@ class EnhancedDataCollector:
                 for post in youtube_posts:
                     post['keyword_matched'] = keyword
                     post['brand_category'] = 'general'
-                    try:
-                        self.save_post(post)
-                    except:
-                        pass
+                self.save_posts(youtube_posts)
                 print(f"  📺 YouTube: {len(youtube_posts)} comments")
             
             all_posts.extend(reddit_posts)
@@ -514,13 +470,7 @@ def main():
         all_posts.extend(youtube_posts)
         
         # Save posts
-        saved_count = 0
-        for post in all_posts:
-            try:
-                if collector.save_post(post):
-                    saved_count += 1
-            except:
-                pass
+        saved_count = collector.save_posts(all_posts)['inserted']
         
         print(f"\n✅ Collected and saved {saved_count} posts")
     else:
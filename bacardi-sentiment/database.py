@@ -1,149 +1,205 @@
+import re
 import sqlite3
 import pandas as pd
 from datetime import datetime
 import os
+import threading
+from near_duplicates import NearDuplicateIndex, simhash_many, to_signed, from_signed
+from post_ids import LEGACY_SCRAPED_ID, stable_post_id
+from timestamps import DAY_SECONDS, to_epoch, to_day, day_start_epoch
+from keyword_mentions import KeywordMentionIndex
+from query_builder import in_list, window_start
+from post_snapshot import LABELS, PostSnapshot
+import migrations
+
+# Applied to every pooled connection. WAL lets the dashboard read while a
+# collector writes; synchronous=NORMAL only fsyncs at checkpoints under WAL;
+# a 64 MB page cache and 256 MB memory map keep hot pages out of read() calls.
+CONNECTION_PRAGMAS = (
+    "journal_mode = WAL",
+    "synchronous = NORMAL",
+    "cache_size = -65536",
+    "mmap_size = 268435456",
+)
+
+# Columns written by ingest_posts, in DatabaseManager._post_row order
+POST_COLUMNS = (
+    'platform', 'post_id', 'text', 'author', 'timestamp', 'ts_epoch', 'ts_day',
+    'sentiment_score', 'sentiment_label', 'confidence_score', 'engagement_score', 'likes', 'retweets',
+    'comments', 'upvotes', 'followers', 'url', 'keyword_matched', 'brand_category',
+    'subreddit', 'video_id', 'textblob_score', 'vader_score', 'scorer_version',
+    'simhash', 'canonical_post_id'
+)
+INSERT_POST_SQL = f'''
+    INSERT OR IGNORE INTO social_posts ({', '.join(POST_COLUMNS)})
+    VALUES ({', '.join('?' * len(POST_COLUMNS))})
+'''
+
+# Sentiment fields a near-duplicate copies from its canonical post
+SENTIMENT_FIELDS = ('sentiment_score', 'sentiment_label', 'confidence_score',
+                    'textblob_score', 'vader_score', 'scorer_version')
+
+# Posts per ingest transaction
+INGEST_BATCH_SIZE = 5000
+
+# search_posts lets FTS5 rank the matches on its own and joins social_posts
+# only to the best SEARCH_CANDIDATES of them: joining every post containing a
+# common word ("price") costs seconds on millions of rows. When filters leave
+# fewer than the limit, it retries with four times the candidates until the
+# matches run out.
+SEARCH_CANDIDATES = 5000
+
+SEARCH_TERM_PATTERN = re.compile(r'\w+\*?')
+
+# Post columns filtered by equality when a value is given
+EQUALITY_FILTERS = ('platform', 'brand_category', 'sentiment_label', 'keyword_matched')
+
+def fts_query(text):
+    """FTS5 MATCH expression for plain search text: all words must appear
+    
+    Words are quoted so punctuation and FTS operators in user input can't
+    cause syntax errors; a trailing * keeps prefix search ("hango*").
+    """
+    terms = []
+    for term in SEARCH_TERM_PATTERN.findall(text or ''):
+        prefix = term.endswith('*')
+        terms.append(f'"{term.rstrip("*")}"' + ('*' if prefix else ''))
+    return ' '.join(terms)
+
+def post_filters(filters, alias=''):
+    """WHERE conditions and params for a dict of social_posts filters
+    
+    filters may hold EQUALITY_FILTERS values, days (posts from the last N
+    days, bounded by window_start), min_engagement, verified_only and
+    include_duplicates (near-duplicates are left out by default). Values
+    only ever become params: the SQL text depends on which filters are set,
+    never on their values, so each filter shape is prepared once per
+    connection and user input can't reach the SQL. alias prefixes columns
+    ('p.') when social_posts is joined. Returns (conditions, params).
+    """
+    conditions = []
+    params = []
+    for column in EQUALITY_FILTERS:
+        if filters.get(column):
+            conditions.append(f"{alias}{column} = ?")
+            params.append(filters[column])
+    if filters.get('days'):
+        conditions.append(f"{alias}ts_epoch >= ?")
+        params.append(window_start(filters['days']))
+    if filters.get('min_engagement'):
+        conditions.append(f"COALESCE({alias}engagement_score, 0) >= ?")
+        params.append(filters['min_engagement'])
+    if filters.get('verified_only'):
+        conditions.append(f"{alias}verified = 1")
+    if not filters.get('include_duplicates'):
+        conditions.append(f"{alias}canonical_post_id IS NULL")
+    return conditions, params
+
+class ThreadConnection:
+    """One thread's SQLite connection, closed by that thread when it ends
+    
+    Kept in DatabaseManager's thread-local storage, which Python clears on
+    the exiting thread itself, so __del__ runs where sqlite3 allows the
+    close. generation lets close_all() retire connections of other threads.
+    """
+    
+    def __init__(self, conn, generation):
+        self.conn = conn
+        self.generation = generation
+        self.pid = os.getpid()
+    
+    def close(self):
+        conn, self.conn = self.conn, None
+        if conn is not None and self.pid == os.getpid():
+            conn.close()
+    
+    def detach(self):
+        """Hand over the connection without closing it"""
+        conn, self.conn = self.conn, None
+        return conn
+    
+    def __del__(self):
+        self.close()
 
 class DatabaseManager:
     def __init__(self, db_path="data/bacardi_posts.db"):
         self.db_path = db_path
+        self.near_duplicates = NearDuplicateIndex()
+        self.keyword_mentions = KeywordMentionIndex()
+        self.snapshot = PostSnapshot()
+        self._local = threading.local()
+        self._generation = 0
+        self._generation_lock = threading.Lock()
+        self._inherited = []
         # Create data directory if it doesn't exist
         os.makedirs(os.path.dirname(db_path), exist_ok=True)
         self.init_database()
     
     def init_database(self):
-        """Create tables if they don't exist"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Main social posts table with all necessary fields
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS social_posts (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                platform TEXT NOT NULL,
-                post_id TEXT UNIQUE,
-                text TEXT NOT NULL,
-                author TEXT,
-                timestamp DATETIME,
-                sentiment_score REAL,
-                sentiment_label TEXT,
-                confidence_score REAL,
-                engagement_score REAL,
-                likes INTEGER DEFAULT 0,
-                retweets INTEGER DEFAULT 0,
-                comments INTEGER DEFAULT 0,
-                upvotes INTEGER DEFAULT 0,
-                followers INTEGER DEFAULT 0,
-                url TEXT,
-                keyword_matched TEXT,
-                brand_category TEXT,
-                subreddit TEXT,
-                video_id TEXT,
-                verified BOOLEAN DEFAULT 0,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Add missing columns to existing table if they don't exist
-        self._add_missing_columns(cursor)
-        
-        # Daily summary table for trends
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS daily_summary (
-                date DATE PRIMARY KEY,
-                total_posts INTEGER,
-                positive_count INTEGER,
-                negative_count INTEGER,
-                neutral_count INTEGER,
-                avg_sentiment REAL,
-                top_keywords TEXT,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Keywords tracking table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS keyword_mentions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                keyword TEXT,
-                post_id TEXT,
-                platform TEXT,
-                timestamp DATETIME,
-                sentiment_score REAL,
-                FOREIGN KEY (post_id) REFERENCES social_posts (post_id)
-            )
-        ''')
-        
-        conn.commit()
-        conn.close()
+        """Bring the schema up to date; a current database costs one PRAGMA read"""
+        migrations.migrate(self.get_connection())
         print(f"Database initialized at: {self.db_path}")
     
-    def _add_missing_columns(self, cursor):
-        """Add missing columns to existing table"""
-        # Get existing columns
-        cursor.execute("PRAGMA table_info(social_posts)")
-        existing_columns = [column[1] for column in cursor.fetchall()]
-        
-        # Define new columns that might be missing
-        new_columns = [
-            ('url', 'TEXT'),
-            ('keyword_matched', 'TEXT'),
-            ('brand_category', 'TEXT'),
-            ('subreddit', 'TEXT'),
-            ('video_id', 'TEXT'),
-            ('verified', 'BOOLEAN DEFAULT 0'),
-            ('upvotes', 'INTEGER DEFAULT 0'),
-            ('engagement_score', 'REAL'),
-            ('confidence_score', 'REAL')
-        ]
-        
-        # Add missing columns
-        for column_name, column_type in new_columns:
-            if column_name not in existing_columns:
-                try:
-                    cursor.execute(f'ALTER TABLE social_posts ADD COLUMN {column_name} {column_type}')
-                    print(f"Added column: {column_name}")
-                except Exception as e:
-                    print(f"Error adding column {column_name}: {e}")
+    def get_connection(self):
+        """This thread's connection, opened and tuned on first use
+        
+        sqlite3 connections may only be used on the thread that opened them,
+        so each thread gets one and closes it itself: when the thread ends
+        (Streamlit runs every rerun on a fresh thread), or at its next call
+        after close_all(). Forked workers open their own. Callers commit but
+        never close.
+        """
+        current = getattr(self._local, 'current', None)
+        if current is not None and current.pid != os.getpid():
+            # Inherited across fork: the parent still uses it, so keep it
+            # referenced and untouched instead of letting it close here
+            self._inherited.append(current.detach())
+            current = None
+        if current is not None and current.generation != self._generation:
+            current.close()
+            current = None
+        if current is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            for pragma in CONNECTION_PRAGMAS:
+                conn.execute(f"PRAGMA {pragma}")
+            current = self._local.current = ThreadConnection(conn, self._generation)
+        return current.conn
+    
+    def close(self):
+        """Close this thread's connection; its next get_connection() opens a new one"""
+        current = getattr(self._local, 'current', None)
+        if current is not None:
+            current.close()
+            self._local.current = None
+    
+    def close_all(self):
+        """Close every thread's connection, for shutdown
+        
+        This thread's closes now. sqlite3 won't close a connection from
+        another thread, so every other thread closes its own at its next
+        get_connection() or when it ends.
+        """
+        with self._generation_lock:
+            self._generation += 1
+        self.close()
+    
+    def get_data_version(self):
+        """Change counter for cache keys: moves whenever a post is added, updated or deleted
+        
+        PRAGMA data_version only tells one connection whether others wrote
+        since it last looked, and its values mean nothing across connections,
+        so the counter pairs the newest post id with the newest post_changes
+        entry instead. Both are single index lookups.
+        """
+        conn = self.get_connection()
+        return conn.execute('''
+            SELECT (SELECT COALESCE(MAX(id), 0) FROM social_posts),
+                   (SELECT COALESCE(MAX(seq), 0) FROM post_changes)
+        ''').fetchone()
     
     def save_post(self, post_data):
         """Save a single post to database"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        try:
-            engagement_score = self._calculate_engagement_score(post_data)
-            
-            cursor.execute('''
-                INSERT OR IGNORE INTO social_posts 
-                (platform, post_id, text, author, timestamp, likes, 
-                 comments, upvotes, url, keyword_matched, brand_category, 
-                 subreddit, video_id, engagement_score)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                post_data.get('platform'),
-                post_data.get('post_id'),
-                post_data.get('text'),
-                post_data.get('author'),
-                post_data.get('timestamp'),
-                post_data.get('likes', 0),
-                post_data.get('comments', 0),
-                post_data.get('upvotes', 0),
-                post_data.get('url'),
-                post_data.get('keyword_matched'),
-                post_data.get('brand_category'),
-                post_data.get('subreddit'),
-                post_data.get('video_id'),
-                engagement_score
-            ))
-            
-            conn.commit()
-            return cursor.rowcount > 0
-            
-        except Exception as e:
-            print(f"Error saving post: {e}")
-            return False
-        finally:
-            conn.close()
+        return self.ingest_posts([post_data])['inserted'] > 0
     
     def save_posts(self, posts_data):
         """Save analyzed posts to database"""
@@ -151,60 +207,154 @@ class DatabaseManager:
             print("No posts to save")
             return
         
-        conn = sqlite3.connect(self.db_path)
+        counts = self.ingest_posts(posts_data)
+        
+        print(f"Saved {counts['inserted']} new posts ({counts['linked']} linked as near-duplicates), "
+              f"skipped {counts['ignored']} duplicates, {counts['failed']} failed")
+        return counts['inserted']
+    
+    def ingest_posts(self, posts, batch_size=INGEST_BATCH_SIZE):
+        """Bulk-insert any iterable of posts, one executemany transaction per batch
+        
+        Posts whose post_id is already stored (or repeated in the batch)
+        are ignored; posts missing platform or text, or rejected by SQLite,
+        fail without affecting the rest. Returns a dict of inserted,
+        ignored, failed and linked (near-duplicate) counts.
+        """
+        counts = {'inserted': 0, 'ignored': 0, 'failed': 0, 'linked': 0}
+        batch = []
+        for post in posts:
+            batch.append(post)
+            if len(batch) >= batch_size:
+                self._ingest_batch(batch, counts)
+                batch = []
+        if batch:
+            self._ingest_batch(batch, counts)
+        return counts
+    
+    def _ingest_batch(self, posts, counts):
+        """Prepare one batch in Python, then write it in a single transaction"""
+        conn = self.get_connection()
         cursor = conn.cursor()
         
-        saved_count = 0
-        skipped_count = 0
+        # post_ids already stored; NULL ids never collide, as with INSERT OR IGNORE
+        post_ids = list({post.get('post_id') for post in posts if post.get('post_id') is not None})
+        seen = set()
+        for start in range(0, len(post_ids), 500):
+            chunk = post_ids[start:start + 500]
+            placeholders, params = in_list(chunk)
+            cursor.execute(f"SELECT post_id FROM social_posts WHERE post_id IN {placeholders}", params)
+            seen.update(row[0] for row in cursor.fetchall())
+        
+        new_posts = []
+        for post in posts:
+            post_id = post.get('post_id')
+            if post_id is not None and post_id in seen:
+                counts['ignored'] += 1
+            elif not post.get('platform') or post.get('text') is None:
+                counts['failed'] += 1
+            else:
+                if post_id is not None:
+                    seen.add(post_id)
+                new_posts.append(post)
+        if not new_posts:
+            return
+        
+        # Link near-duplicates to stored canonical posts, or to earlier posts
+        # of this batch; a linked post without sentiment takes its canonical's
+        fingerprints = simhash_many([post.get('text') for post in new_posts])
+        candidates = self.near_duplicates.load_candidates(cursor, fingerprints, SENTIMENT_FIELDS)
         
-        for post in posts_data:
+        # (row, post_id, fingerprint to index or None, mention rows) per post to insert
+        prepared = []
+        for position, (post, fingerprint) in enumerate(zip(new_posts, fingerprints)):
             try:
-                # Calculate engagement score based on platform
-                engagement_score = self._calculate_engagement_score(post)
-                
-                cursor.execute('''
-                    INSERT OR IGNORE INTO social_posts 
-                    (platform, post_id, text, author, timestamp, sentiment_score, 
-                     sentiment_label, confidence_score, engagement_score, likes, retweets, 
-                     comments, upvotes, followers, url, keyword_matched, brand_category, 
-                     subreddit, video_id)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    post.get('platform'),
-                    post.get('post_id'),
-                    post.get('text'),
-                    post.get('author'),
-                    post.get('timestamp'),
-                    post.get('sentiment_score'),
-                    post.get('sentiment_label'),
-                    post.get('confidence_score'),
-                    engagement_score,
-                    post.get('likes', 0),
-                    post.get('retweets', 0),
-                    post.get('comments', 0),
-                    post.get('upvotes', 0),
-                    post.get('followers', 0),
-                    post.get('url'),
-                    post.get('keyword_matched'),
-                    post.get('brand_category'),
-                    post.get('subreddit'),
-                    post.get('video_id')
-                ))
-                
-                if cursor.rowcount > 0:
-                    saved_count += 1
-                else:
-                    skipped_count += 1
-                    
-            except sqlite3.IntegrityError:
-                skipped_count += 1
+                canonical = candidates.find_closest(position)
+                canonical_post_id = canonical.get('post_id') if canonical is not None else None
+                if canonical_post_id is not None and post.get('sentiment_score') is None:
+                    post = dict(post, **{field: canonical.get(field) for field in SENTIMENT_FIELDS})
+                row = self._post_row(post, self._calculate_engagement_score(post), fingerprint, canonical_post_id)
+                mentions = self.keyword_mentions.mention_rows(
+                    post.get('post_id'), post.get('platform'), post.get('text'), post.get('timestamp'),
+                    row[POST_COLUMNS.index('ts_day')], post.get('sentiment_score'), canonical_post_id is not None
+                )
+            except Exception as e:
+                print(f"Error preparing post {post.get('post_id')}: {e}")
+                counts['failed'] += 1
                 continue
+            
+            if canonical_post_id is None:
+                candidates.add_candidate(position, post)
+                prepared.append((row, post.get('post_id'), fingerprint, mentions))
+            else:
+                counts['linked'] += 1
+                prepared.append((row, post.get('post_id'), None, mentions))
+        
+        if not prepared:
+            return
         
-        conn.commit()
-        conn.close()
+        try:
+            cursor.executemany(INSERT_POST_SQL, [row for row, _, _, _ in prepared])
+            inserted = cursor.rowcount
+            self.near_duplicates.add_many(cursor, [(post_id, fingerprint) for _, post_id, fingerprint, _ in prepared])
+            self.keyword_mentions.add_many(cursor, [mention for _, _, _, mentions in prepared for mention in mentions])
+            conn.commit()
+        except sqlite3.Error as e:
+            # Fall back to row-by-row inserts so one bad row costs only itself
+            conn.rollback()
+            print(f"Batch insert failed ({e}), retrying {len(prepared)} posts one by one")
+            inserted = 0
+            failed = 0
+            for row, post_id, fingerprint, mentions in prepared:
+                try:
+                    cursor.execute(INSERT_POST_SQL, row)
+                    if cursor.rowcount > 0:
+                        inserted += 1
+                        self.near_duplicates.add(cursor, post_id, fingerprint)
+                        self.keyword_mentions.add_many(cursor, mentions)
+                except sqlite3.Error:
+                    failed += 1
+            conn.commit()
+            counts['failed'] += failed
+            counts['ignored'] += len(prepared) - inserted - failed
+            counts['inserted'] += inserted
+            return
         
-        print(f"Saved {saved_count} new posts, skipped {skipped_count} duplicates")
-        return saved_count
+        # Rows another writer stored since the lookup are ignored by the INSERT
+        counts['inserted'] += inserted
+        counts['ignored'] += len(prepared) - inserted
+    
+    def _post_row(self, post, engagement_score, fingerprint, canonical_post_id):
+        """Values for INSERT_POST_SQL, in POST_COLUMNS order"""
+        epoch = to_epoch(post.get('timestamp'))
+        return (
+            post.get('platform'),
+            post.get('post_id'),
+            post.get('text'),
+            post.get('author'),
+            post.get('timestamp'),
+            epoch,
+            to_day(epoch),
+            post.get('sentiment_score'),
+            post.get('sentiment_label'),
+            post.get('confidence_score'),
+            engagement_score,
+            post.get('likes', 0),
+            post.get('retweets', 0),
+            post.get('comments', 0),
+            post.get('upvotes', 0),
+            post.get('followers', 0),
+            post.get('url'),
+            post.get('keyword_matched'),
+            post.get('brand_category'),
+            post.get('subreddit'),
+            post.get('video_id'),
+            post.get('textblob_score'),
+            post.get('vader_score'),
+            post.get('scorer_version'),
+            to_signed(fingerprint) if fingerprint is not None else None,
+            canonical_post_id
+        )
     
     def _calculate_engagement_score(self, post):
         """Calculate simple engagement score based on platform metrics"""
@@ -227,83 +377,146 @@ class DatabaseManager:
         return 0
     
     def get_sentiment_trends(self, days=7):
-        """Get sentiment trends for last N days"""
-        conn = sqlite3.connect(self.db_path)
-        
-        query = '''
-            SELECT DATE(timestamp) as date,
-                   AVG(sentiment_score) as avg_sentiment,
-                   COUNT(*) as post_count,
-                   SUM(CASE WHEN sentiment_label = 'positive' THEN 1 ELSE 0 END) as positive,
-                   SUM(CASE WHEN sentiment_label = 'negative' THEN 1 ELSE 0 END) as negative,
-                   SUM(CASE WHEN sentiment_label = 'neutral' THEN 1 ELSE 0 END) as neutral,
-                   AVG(engagement_score) as avg_engagement
-            FROM social_posts 
-            WHERE timestamp >= date('now', '-{} days')
-            GROUP BY DATE(timestamp)
-            ORDER BY date DESC
-        '''.format(days)
-        
-        df = pd.read_sql_query(query, conn)
-        conn.close()
-        return df
+        """Get sentiment trends for last N days
+        
+        Read from the snapshot's per-day sums, so the cost grows with the
+        days asked for and the posts changed since the last read, not with
+        the corpus.
+        """
+        with self.snapshot.lock:
+            self.snapshot.refresh(self.get_connection())
+            df = self.snapshot.rollup('day', day_start_epoch(days) // DAY_SECONDS)
+        df = df.rename(columns={'day': 'date', **{f'{label}_count': label for label in LABELS}})
+        df = df.sort_values('date', ascending=False).reset_index(drop=True)
+        return df[['date', 'avg_sentiment', 'post_count', 'positive', 'negative', 'neutral', 'avg_engagement']]
     
     def get_platform_breakdown(self):
-        """Get sentiment breakdown by platform"""
-        conn = sqlite3.connect(self.db_path)
-        
-        query = '''
-            SELECT platform,
-                   COUNT(*) as total_posts,
+        """Get sentiment breakdown by platform, from the snapshot's per-day sums like get_sentiment_trends()"""
+        with self.snapshot.lock:
+            self.snapshot.refresh(self.get_connection())
+            df = self.snapshot.rollup('platform', day_start_epoch(7) // DAY_SECONDS)
+        df = df.rename(columns={'post_count': 'total_posts', **{f'{label}_count': label for label in LABELS}})
+        return df[['platform', 'total_posts', 'avg_sentiment', 'positive', 'negative', 'neutral']]
+    
+    def get_share_of_voice(self, days=30, keywords=None):
+        """Mentions, average sentiment and share of mentions per tracked keyword over the last N days
+        
+        Reads only the keyword_mentions (keyword, day) index. Mentions in
+        near-duplicate posts are left out, so a reposted story counts once.
+        Pass keywords to compare a subset, e.g. Bacardi against
+        config.COMPETITORS.
+        """
+        conn = self.get_connection()
+        
+        params = [to_day(day_start_epoch(days))]
+        keyword_filter = ''
+        if keywords:
+            keywords = [keyword.lower() for keyword in keywords]
+            placeholders, keyword_params = in_list(keywords)
+            keyword_filter = f"AND keyword IN {placeholders}"
+            params.extend(keyword_params)
+        
+        query = f'''
+            SELECT keyword,
+                   COUNT(*) as mentions,
                    AVG(sentiment_score) as avg_sentiment,
-                   SUM(CASE WHEN sentiment_label = 'positive' THEN 1 ELSE 0 END) as positive,
-                   SUM(CASE WHEN sentiment_label = 'negative' THEN 1 ELSE 0 END) as negative,
-                   SUM(CASE WHEN sentiment_label = 'neutral' THEN 1 ELSE 0 END) as neutral
-            FROM social_posts 
-            WHERE timestamp >= date('now', '-7 days')
-            GROUP BY platform
+                   COUNT(*) * 1.0 / SUM(COUNT(*)) OVER () as share_of_voice
+            FROM keyword_mentions
+            WHERE ts_day >= ? AND is_duplicate = 0 {keyword_filter}
+            GROUP BY keyword
+            ORDER BY mentions DESC
         '''
         
-        df = pd.read_sql_query(query, conn)
-        conn.close()
+        df = pd.read_sql_query(query, conn, params=params)
         return df
     
+    def search_posts(self, query, filters=None, limit=50):
+        """Posts whose text matches query, best matches first, from the posts_fts index
+        
+        filters takes the keys of post_filters (platform,
+        brand, label and keyword values, days, min_engagement, verified_only,
+        include_duplicates). Returns a DataFrame with a highlighted snippet
+        and bm25 rank.
+        """
+        match = fts_query(query)
+        if not match:
+            return pd.DataFrame()
+        
+        conditions, params = post_filters(filters or {}, alias='p.')
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        
+        conn = self.get_connection()
+        query_sql = f'''
+            SELECT p.id, p.platform, p.author, datetime(p.ts_epoch, 'unixepoch') as timestamp,
+                   p.sentiment_label, p.sentiment_score, p.brand_category, p.url, c.rank
+            FROM (
+                SELECT rowid, rank FROM posts_fts
+                WHERE posts_fts MATCH ?
+                ORDER BY rank
+                LIMIT ?
+            ) c
+            JOIN social_posts p ON p.id = c.rowid
+            {where}
+            ORDER BY c.rank
+            LIMIT ?
+        '''
+        
+        candidates = SEARCH_CANDIDATES
+        matches = None
+        while True:
+            df = pd.read_sql_query(query_sql, conn, params=[match, candidates] + params + [limit])
+            if len(df) >= limit:
+                break
+            if matches is None:
+                matches = conn.execute("SELECT COUNT(*) FROM posts_fts WHERE posts_fts MATCH ?",
+                                       (match,)).fetchone()[0]
+            if candidates >= matches:
+                break
+            candidates *= 4
+        
+        # Snippets only for the posts returned
+        placeholders, ids = in_list(df['id'].tolist())
+        snippets = dict(conn.execute(f'''
+            SELECT rowid, snippet(posts_fts, 0, '**', '**', '…', 16) FROM posts_fts
+            WHERE posts_fts MATCH ? AND rowid IN {placeholders}
+        ''', [match] + ids))
+        df.insert(df.columns.get_loc('rank'), 'snippet', df['id'].map(snippets))
+        return df.drop(columns='id')
+    
     def get_recent_posts(self, limit=10):
         """Get most recent posts"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self.get_connection()
         
         query = '''
             SELECT platform, text, sentiment_label, sentiment_score, 
                    timestamp, author, likes, retweets, comments, upvotes
             FROM social_posts 
-            ORDER BY timestamp DESC 
+            ORDER BY ts_epoch DESC 
             LIMIT ?
         '''
         
         df = pd.read_sql_query(query, conn, params=[limit])
-        conn.close()
         return df
     
     def get_top_negative_posts(self, limit=5):
         """Get most negative posts for alerts"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self.get_connection()
         
         query = '''
             SELECT platform, text, sentiment_score, author, timestamp
             FROM social_posts 
             WHERE sentiment_label = 'negative' 
-            AND timestamp >= date('now', '-1 days')
+            AND ts_epoch >= ?
             ORDER BY sentiment_score ASC 
             LIMIT ?
         '''
         
-        df = pd.read_sql_query(query, conn, params=[limit])
-        conn.close()
+        df = pd.read_sql_query(query, conn, params=[day_start_epoch(1), limit])
         return df
     
     def get_database_stats(self):
         """Get overall database statistics"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self.get_connection()
         cursor = conn.cursor()
         
         # Total posts
@@ -321,7 +534,7 @@ class DatabaseManager:
         
         # Date range
         cursor.execute('''
-            SELECT MIN(timestamp), MAX(timestamp) 
+            SELECT datetime(MIN(ts_epoch), 'unixepoch'), datetime(MAX(ts_epoch), 'unixepoch')
             FROM social_posts
         ''')
         date_range = cursor.fetchone()
@@ -334,8 +547,6 @@ class DatabaseManager:
         ''')
         platform_breakdown = dict(cursor.fetchall())
         
-        conn.close()
-        
         return {
             'total_posts': total_posts,
             'sentiment_breakdown': sentiment_breakdown,
@@ -345,7 +556,7 @@ class DatabaseManager:
 
     def get_unanalyzed_posts(self):
         """Get all posts without sentiment analysis"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self.get_connection()
         
         query = '''
         SELECT post_id, text, platform, author, timestamp 
@@ -365,32 +576,371 @@ class DatabaseManager:
                 'timestamp': row[4]
             })
         
-        conn.close()
         return posts
 
-    def update_post_sentiment(self, post_id, sentiment_data):
-        """Update sentiment for a specific post"""
-        conn = sqlite3.connect(self.db_path)
-        
+    def count_unanalyzed_posts(self, after_id=0):
+        """Count posts without sentiment analysis"""
+        conn = self.get_connection()
+        cursor = conn.execute('''
+            SELECT COUNT(*) FROM social_posts
+            WHERE id > ? AND (sentiment_label IS NULL OR sentiment_score IS NULL)
+            AND canonical_post_id IS NULL
+        ''', (after_id,))
+        count = cursor.fetchone()[0]
+        return count
+    
+    def iter_unanalyzed_posts(self, page_size=1000, after_id=0):
+        """Yield pages of posts without sentiment analysis, keyset-paginated by id
+        
+        Each page is a fresh bounded query (id > last seen id), so memory
+        stays constant and no read transaction is held open between pages.
+        Pass after_id to continue from a checkpoint. Near-duplicates are
+        skipped; they receive their canonical post's result.
+        """
         query = '''
-        UPDATE social_posts 
-        SET sentiment_score = ?, sentiment_label = ?, confidence_score = ?
-        WHERE post_id = ?
+        SELECT id, post_id, text, platform, author, timestamp
+        FROM social_posts
+        WHERE id > ? AND (sentiment_label IS NULL OR sentiment_score IS NULL)
+        AND canonical_post_id IS NULL
+        ORDER BY id
+        LIMIT ?
+        '''
+        
+        last_id = after_id
+        conn = self.get_connection()
+        while True:
+            rows = conn.execute(query, (last_id, page_size)).fetchall()
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            yield [self._post_row_to_dict(row) for row in rows]
+    
+    def _post_row_to_dict(self, row):
+        """(id, post_id, text, platform, author, timestamp) row as a post dict"""
+        return {
+            'id': row[0],
+            'post_id': row[1],
+            'text': row[2],
+            'platform': row[3],
+            'author': row[4],
+            'timestamp': row[5]
+        }
+    
+    def update_post_sentiments(self, results, conn=None):
+        """Write many (post, sentiment) results with one executemany
+        
+        Pass an open connection to batch several calls into one large
+        transaction; the caller then owns the commit.
+        """
+        own_conn = conn is None
+        if own_conn:
+            conn = self.get_connection()
+        
+        values = [(
+            sentiment.get('sentiment_score', 0),
+            sentiment.get('sentiment_label', 'neutral'),
+            sentiment.get('confidence', 0),
+            sentiment.get('textblob_score'),
+            sentiment.get('vader_score'),
+            sentiment.get('scorer_version')
+        ) for post, sentiment in results]
+        assignments = '''
+        SET sentiment_score = ?, sentiment_label = ?, confidence_score = ?,
+            textblob_score = ?, vader_score = ?, scorer_version = ?
         '''
         
-        conn.execute(query, (
-            sentiment_data.get('sentiment_score', 0),
-            sentiment_data.get('sentiment_label', 'neutral'),
-            sentiment_data.get('confidence_score', 0),
-            post_id
-        ))
+        conn.executemany(f"UPDATE social_posts {assignments} WHERE id = ?",
+                         [row + (post['id'],) for row, (post, _) in zip(values, results)])
+        
+        # Near-duplicates share their canonical post's result
+        conn.executemany(f"UPDATE social_posts {assignments} WHERE canonical_post_id = ?",
+                         [row + (post['post_id'],) for row, (post, _) in zip(values, results)])
+        
+        if own_conn:
+            conn.commit()
+    
+    def relabel_posts(self, thresholds, weights):
+        """Recompute combined scores and labels from the stored components
+        
+        One set-based UPDATE, no rescoring, that rewrites only the rows
+        whose score or label changes, so rows already matching fire no
+        triggers and leave the indexes alone. Posts stored without a
+        TextBlob component keep VADER alone. Returns (rewritten rows,
+        rows whose label changed, rows skipped because they have no stored
+        components).
+        """
+        combined = '''(CASE WHEN textblob_score IS NULL THEN vader_score
+                            ELSE :textblob * textblob_score + :vader * vader_score END)'''
+        label = f'''(CASE WHEN {combined} >= :positive THEN 'positive'
+                         WHEN {combined} <= :negative THEN 'negative'
+                         ELSE 'neutral' END)'''
+        params = {
+            'textblob': weights['textblob'],
+            'vader': weights['vader'],
+            'positive': thresholds['positive'],
+            'negative': thresholds['negative']
+        }
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute("SELECT COUNT(*) FROM social_posts WHERE vader_score IS NULL")
+        skipped = cursor.fetchone()[0]
+        
+        cursor.execute(f'''
+            SELECT COUNT(*) FROM social_posts
+            WHERE vader_score IS NOT NULL AND sentiment_label IS NOT {label}
+        ''', params)
+        changed = cursor.fetchone()[0]
+        
+        cursor.execute(f'''
+            UPDATE social_posts
+            SET sentiment_score = {combined},
+                confidence_score = ABS({combined}),
+                sentiment_label = {label}
+            WHERE vader_score IS NOT NULL
+            AND (sentiment_score IS NOT {combined} OR sentiment_label IS NOT {label})
+        ''', params)
+        relabeled = cursor.rowcount
         
         conn.commit()
-        conn.close()
+        return relabeled, changed, skipped
+    
+    def get_stale_versions(self, current_version):
+        """Distinct scorer versions other than current_version (None for unversioned rows)
+        
+        Walks the scorer_version index with one MIN() seek per version
+        instead of scanning the table.
+        """
+        conn = self.get_connection()
+        versions = []
+        if conn.execute("SELECT 1 FROM social_posts WHERE scorer_version IS NULL LIMIT 1").fetchone():
+            versions.append(None)
+        
+        version = conn.execute("SELECT MIN(scorer_version) FROM social_posts").fetchone()[0]
+        while version is not None:
+            if version != current_version:
+                versions.append(version)
+            version = conn.execute(
+                "SELECT MIN(scorer_version) FROM social_posts WHERE scorer_version > ?", (version,)
+            ).fetchone()[0]
+        return versions
+    
+    def count_stale_posts(self, current_version):
+        """Count posts scored by another scorer version, or never scored"""
+        conn = self.get_connection()
+        count = 0
+        for version in self.get_stale_versions(current_version):
+            count += conn.execute(
+                "SELECT COUNT(*) FROM social_posts WHERE scorer_version IS ? AND canonical_post_id IS NULL",
+                (version,)
+            ).fetchone()[0]
+        return count
+    
+    def iter_stale_posts(self, current_version, page_size=1000):
+        """Yield pages of posts whose scorer_version differs from current_version
+        
+        Each stale version is an index range on (scorer_version, id), paged
+        by id, so the cost is proportional to the stale rows only.
+        """
+        query = '''
+        SELECT id, post_id, text, platform, author, timestamp
+        FROM social_posts
+        WHERE scorer_version IS ? AND id > ? AND canonical_post_id IS NULL
+        ORDER BY id
+        LIMIT ?
+        '''
+        
+        conn = self.get_connection()
+        for version in self.get_stale_versions(current_version):
+            last_id = 0
+            while True:
+                rows = conn.execute(query, (version, last_id, page_size)).fetchall()
+                if not rows:
+                    break
+                last_id = rows[-1][0]
+                yield [self._post_row_to_dict(row) for row in rows]
+    
+    def start_analysis_run(self, scorer_version, engine):
+        """Record a new analysis run and return its run_id
+        
+        Older unfinished runs are marked abandoned so --resume always picks
+        up the run that was interrupted most recently.
+        """
+        conn = self.get_connection()
+        conn.execute("UPDATE analysis_runs SET status = 'abandoned' WHERE status = 'running'")
+        cursor = conn.execute('''
+            INSERT INTO analysis_runs (scorer_version, engine, updated_at)
+            VALUES (?, ?, CURRENT_TIMESTAMP)
+        ''', (scorer_version, engine))
+        run_id = cursor.lastrowid
+        conn.commit()
+        return run_id
+    
+    def get_resumable_run(self):
+        """Latest analysis run that never finished, or None"""
+        conn = self.get_connection()
+        cursor = conn.execute('''
+            SELECT run_id, scorer_version, engine, last_id, processed, failed
+            FROM analysis_runs
+            WHERE status = 'running'
+            ORDER BY run_id DESC
+            LIMIT 1
+        ''')
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        return {
+            'run_id': row[0],
+            'scorer_version': row[1],
+            'engine': row[2],
+            'last_id': row[3],
+            'processed': row[4],
+            'failed': row[5]
+        }
+    
+    def checkpoint_analysis_run(self, conn, run_id, last_id, processed, failures):
+        """Store a run's progress and new failures on the caller's connection
+        
+        Called right before the caller commits its sentiment updates, so
+        the checkpoint and the results land in the same transaction.
+        failures is a list of (post, error message) pairs.
+        """
+        conn.executemany('''
+            INSERT OR REPLACE INTO analysis_failures (post_row_id, run_id, error)
+            VALUES (?, ?, ?)
+        ''', [(post['id'], run_id, error) for post, error in failures])
+        conn.execute('''
+            UPDATE analysis_runs
+            SET last_id = ?, processed = ?, failed = failed + ?, updated_at = CURRENT_TIMESTAMP
+            WHERE run_id = ?
+        ''', (last_id, processed, len(failures), run_id))
+    
+    def finish_analysis_run(self, run_id):
+        """Mark an analysis run as completed"""
+        conn = self.get_connection()
+        conn.execute('''
+            UPDATE analysis_runs
+            SET status = 'completed', finished_at = CURRENT_TIMESTAMP
+            WHERE run_id = ?
+        ''', (run_id,))
+        conn.commit()
+    
+    def count_failed_posts(self):
+        """Count posts recorded as failed by analysis runs"""
+        conn = self.get_connection()
+        count = conn.execute("SELECT COUNT(*) FROM analysis_failures").fetchone()[0]
+        return count
+    
+    def iter_failed_posts(self, page_size=1000):
+        """Yield pages of posts recorded in analysis_failures, keyset-paginated by id"""
+        query = '''
+        SELECT p.id, p.post_id, p.text, p.platform, p.author, p.timestamp
+        FROM analysis_failures f
+        JOIN social_posts p ON p.id = f.post_row_id
+        WHERE f.post_row_id > ?
+        ORDER BY f.post_row_id
+        LIMIT ?
+        '''
+        
+        last_id = 0
+        conn = self.get_connection()
+        while True:
+            rows = conn.execute(query, (last_id, page_size)).fetchall()
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            yield [self._post_row_to_dict(row) for row in rows]
+    
+    def clear_failures(self, conn, posts):
+        """Forget failures of posts that have now been scored"""
+        conn.executemany("DELETE FROM analysis_failures WHERE post_row_id = ?",
+                         [(post['id'],) for post in posts])
+    
+    def update_failures(self, conn, failures):
+        """Refresh the error of posts that failed again on retry"""
+        conn.executemany('''
+            UPDATE analysis_failures SET error = ?, failed_at = CURRENT_TIMESTAMP
+            WHERE post_row_id = ?
+        ''', [(error, post['id']) for post, error in failures])
+    
+    def update_post_sentiment(self, post_id, sentiment_data):
+        """Update sentiment for a specific post and its near-duplicates, via update_post_sentiments"""
+        conn = self.get_connection()
+        row = conn.execute("SELECT id FROM social_posts WHERE post_id = ?", (post_id,)).fetchone()
+        if row is None:
+            return
+        
+        # Older callers pass confidence_score, analyze_text results carry confidence
+        sentiment = dict(sentiment_data)
+        sentiment.setdefault('confidence', sentiment_data.get('confidence_score', 0))
+        self.update_post_sentiments([({'id': row[0], 'post_id': post_id}, sentiment)])
+    
+    def collapse_duplicate_posts(self):
+        """One-off job: give legacy scraped rows stable ids and drop the repeats
+        
+        Rows scraped before stable ids carry a different salted hash() id
+        on every run. Each group of rows with the same stable id keeps one
+        row (the one already holding the stable id, else the oldest), and
+        links and index entries pointing at the others move to it.
+        Returns (groups_collapsed, rows_removed).
+        """
+        conn = self.get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT id, post_id, platform, text, url FROM social_posts ORDER BY id")
+            
+            groups = {}
+            for row_id, post_id, platform, text, url in cursor.fetchall():
+                new_id = stable_post_id(platform, text, url)
+                if post_id == new_id or LEGACY_SCRAPED_ID.match(post_id):
+                    groups.setdefault(new_id, []).append((row_id, post_id))
+            
+            collapsed = 0
+            removed = 0
+            for new_id, rows in groups.items():
+                if all(post_id == new_id for _, post_id in rows):
+                    continue
+                
+                keeper = next((row for row in rows if row[1] == new_id), rows[0])
+                duplicates = [row for row in rows if row is not keeper]
+                old_ids = [(post_id,) for _, post_id in rows if post_id != new_id]
+                
+                cursor.executemany("DELETE FROM social_posts WHERE id = ?",
+                                   [(row_id,) for row_id, _ in duplicates])
+                cursor.executemany("DELETE FROM analysis_failures WHERE post_row_id = ?",
+                                   [(row_id,) for row_id, _ in duplicates])
+                cursor.execute("UPDATE social_posts SET post_id = ? WHERE id = ?", (new_id, keeper[0]))
+                cursor.executemany("UPDATE social_posts SET canonical_post_id = ? WHERE canonical_post_id = ?",
+                                   [(new_id,) + old_id for old_id in old_ids])
+                cursor.executemany("DELETE FROM simhash_bands WHERE post_id = ?", old_ids)
+                
+                collapsed += 1
+                removed += len(duplicates)
+            
+            # A keeper linked to one of its own repeats is now canonical itself
+            cursor.execute("UPDATE social_posts SET canonical_post_id = NULL WHERE canonical_post_id = post_id")
+            
+            # Re-index the surviving canonical posts under their new ids
+            cursor.execute('''
+                SELECT post_id, simhash FROM social_posts
+                WHERE simhash IS NOT NULL AND canonical_post_id IS NULL
+                  AND post_id NOT IN (SELECT post_id FROM simhash_bands)
+            ''')
+            for post_id, value in cursor.fetchall():
+                self.near_duplicates.add(cursor, post_id, from_signed(value))
+            
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        
+        print(f"Collapsed {collapsed} duplicate groups, removed {removed} rows")
+        return collapsed, removed
     
     def clear_database(self):
         """Clear all data from database (use with caution!)"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self.get_connection()
         cursor = conn.cursor()
         
         cursor.execute("DELETE FROM social_posts")
@@ -398,7 +948,6 @@ class DatabaseManager:
         cursor.execute("DELETE FROM keyword_mentions")
         
         conn.commit()
-        conn.close()
         print("Database cleared!")
     
     def backup_database(self, backup_path=None):
@@ -407,9 +956,10 @@ class DatabaseManager:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             backup_path = f"data/bacardi_posts_backup_{timestamp}.db"
         
-        # Simple file copy for SQLite
-        import shutil
-        shutil.copy2(self.db_path, backup_path)
+        # Online backup: a plain file copy would miss pages still in the WAL
+        target = sqlite3.connect(backup_path)
+        self.get_connection().backup(target)
+        target.close()
         print(f"Database backed up to: {backup_path}")
         return backup_path
 
@@ -3,6 +3,7 @@ import subprocess
 import sys
 import os
 from database import DatabaseManager
+from timestamps import epoch_days_ago
 import config
 
 class HybridDataCollector:
@@ -37,16 +38,8 @@ class HybridDataCollector:
                     print(f"   📺 YouTube: {len(youtube_posts)} comments")
                 
                 # Save posts immediately
-                saved_count = 0
-                for post in reddit_posts + youtube_posts:
-                    try:
-                        if api_collector.save_post(post):
-                            saved_count += 1
-                    except Exception as e:
-                        print(f"Error saving post: {e}")
-                        continue
-                
-                print(f"   💾 Saved: {saved_count} posts")
+                counts = api_collector.save_posts(reddit_posts + youtube_posts)
+                print(f"   💾 Saved: {counts['inserted']} posts")
             
             print(f"\n✅ API Collection complete: {len(all_posts)} posts")
             return all_posts
@@ -115,8 +108,7 @@ class HybridDataCollector:
         print("=" * 40)
         
         try:
-            import sqlite3
-            conn = sqlite3.connect(self.db.db_path)
+            conn = self.db.get_connection()
             
             # Overall stats
             stats_query = '''
@@ -169,13 +161,13 @@ class HybridDataCollector:
             recent_query = '''
             SELECT platform, COUNT(*) as count
             FROM social_posts
-            WHERE timestamp >= datetime('now', '-24 hours')
+            WHERE ts_epoch >= ?
             GROUP BY platform
             ORDER BY count DESC
             '''
             
             print(f"\n🕐 Last 24 Hours Activity:")
-            cursor = conn.execute(recent_query)
+            cursor = conn.execute(recent_query, (epoch_days_ago(1),))
             recent_data = cursor.fetchall()
             if recent_data:
                 for row in recent_data:
@@ -183,8 +175,6 @@ class HybridDataCollector:
             else:
                 print("   No recent activity")
             
-            conn.close()
-            
         except Exception as e:
             print(f"⚠️ Error generating summary: {e}")
         
@@ -0,0 +1,85 @@
+import re
+import config
+
+INSERT_MENTION_SQL = '''
+    INSERT OR IGNORE INTO keyword_mentions (keyword, post_id, platform, timestamp, ts_day, sentiment_score,
+                                            is_duplicate)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+'''
+
+def tracked_keywords():
+    """Brand, competitor and enhanced keywords from config, lowercased and deduplicated"""
+    keywords = (getattr(config, 'BRAND_KEYWORDS', []) + getattr(config, 'COMPETITORS', []) +
+                getattr(config, 'ENHANCED_KEYWORDS', []))
+    return sorted({keyword.strip().lower() for keyword in keywords if keyword.strip()})
+
+def keyword_pattern(keywords):
+    """One case-insensitive alternation matching any keyword as whole words
+    
+    Longer keywords come first so "bacardi rum" wins over "bacardi" at the
+    same position.
+    """
+    alternatives = '|'.join(re.escape(keyword) for keyword in sorted(keywords, key=len, reverse=True))
+    return re.compile(rf'(?<!\w)(?:{alternatives})(?!\w)', re.IGNORECASE)
+
+class KeywordMentionIndex:
+    """Inverted index of tracked keywords to the posts that mention them.
+    
+    Stored in keyword_mentions, one row per (post, keyword), with the
+    post's platform, day, sentiment and near-duplicate flag copied
+    alongside so share-of-voice queries read only the (keyword, ts_day)
+    index. Triggers in migrations.py keep the copies in step with
+    social_posts.
+    """
+    
+    def __init__(self, keywords=None):
+        self.keywords = keywords if keywords is not None else tracked_keywords()
+        self.pattern = keyword_pattern(self.keywords) if self.keywords else None
+        
+        # A longer match also mentions the keywords inside it ("bacardi gold" -> "bacardi")
+        self.contained = {
+            keyword: [other for other in self.keywords if keyword_pattern([other]).search(keyword)]
+            for keyword in self.keywords
+        }
+    
+    def find(self, text):
+        """Sorted tracked keywords mentioned in a text, found in one regex pass"""
+        if self.pattern is None or not text:
+            return []
+        found = set()
+        for match in self.pattern.finditer(text):
+            found.update(self.contained.get(match.group(0).lower(), ()))
+        return sorted(found)
+    
+    def mention_rows(self, post_id, platform, text, timestamp, ts_day, sentiment_score, is_duplicate):
+        """Values for INSERT_MENTION_SQL, one per keyword the post mentions"""
+        if post_id is None:
+            return []
+        return [(keyword, post_id, platform, timestamp, ts_day, sentiment_score, int(bool(is_duplicate)))
+                for keyword in self.find(text)]
+    
+    def add_many(self, cursor, rows):
+        """Insert mention rows; a (post, keyword) pair already stored is ignored"""
+        cursor.executemany(INSERT_MENTION_SQL, rows)
+    
+    def rebuild(self, conn, batch_size=5000):
+        """Re-extract mentions for every stored post, committing per id range
+        
+        Returns the number of mention rows written.
+        """
+        conn.execute("DELETE FROM keyword_mentions")
+        conn.commit()
+        max_id = conn.execute("SELECT MAX(id) FROM social_posts").fetchone()[0] or 0
+        written = 0
+        for start in range(0, max_id, batch_size):
+            posts = conn.execute('''
+                SELECT post_id, platform, text, timestamp, ts_day, sentiment_score,
+                       canonical_post_id IS NOT NULL
+                FROM social_posts WHERE id > ? AND id <= ?
+            ''', (start, start + batch_size)).fetchall()
+            rows = [row for post in posts for row in self.mention_rows(*post)]
+            cursor = conn.cursor()
+            self.add_many(cursor, rows)
+            written += len(rows)
+            conn.commit()
+        return written
@@ -1,8 +1,9 @@
 import sqlite3
 import os
+import migrations
 
 def migrate_database(db_path="data/bacardi_posts.db"):
-    """Add missing columns to existing database"""
+    """Apply pending schema migrations to an existing database"""
     
     if not os.path.exists(db_path):
         print(f"❌ Database not found at {db_path}")
@@ -15,44 +16,18 @@ def migrate_database(db_path="data/bacardi_posts.db"):
         conn = sqlite3.connect(db_path)
         cursor = conn.cursor()
         
-        # Get existing columns
-        cursor.execute("PRAGMA table_info(social_posts)")
-        existing_columns = [column[1] for column in cursor.fetchall()]
-        
-        print(f"📋 Existing columns: {', '.join(existing_columns)}")
-        
-        # Define new columns that might be missing
-        new_columns = [
-            ('url', 'TEXT'),
-            ('keyword_matched', 'TEXT'),
-            ('brand_category', 'TEXT'),
-            ('subreddit', 'TEXT'),
-            ('video_id', 'TEXT'),
-            ('verified', 'BOOLEAN DEFAULT 0'),
-            ('upvotes', 'INTEGER DEFAULT 0'),
-            ('engagement_score', 'REAL'),
-            ('confidence_score', 'REAL')
-        ]
-        
-        added_columns = []
+        version = migrations.get_version(conn)
+        print(f"📋 Schema version: {version} (latest: {migrations.SCHEMA_VERSION})")
         
-        # Add missing columns
-        for column_name, column_type in new_columns:
-            if column_name not in existing_columns:
-                try:
-                    cursor.execute(f'ALTER TABLE social_posts ADD COLUMN {column_name} {column_type}')
-                    added_columns.append(column_name)
-                    print(f"✅ Added column: {column_name}")
-                except Exception as e:
-                    print(f"❌ Error adding column {column_name}: {e}")
+        # Apply pending migration steps in order
+        applied = migrations.migrate(conn)
         
-        if added_columns:
-            conn.commit()
-            print(f"\n🎉 Migration complete! Added {len(added_columns)} columns:")
-            for col in added_columns:
-                print(f"   - {col}")
+        if applied:
+            print(f"\n🎉 Migration complete! Applied {len(applied)} steps:")
+            for number, description in applied:
+                print(f"   {number}. {description}")
         else:
-            print("✅ No migration needed - all columns already exist!")
+            print("✅ No migration needed - schema is up to date!")
         
         # Verify final schema
         cursor.execute("PRAGMA table_info(social_posts)")
@@ -79,11 +54,24 @@ def main():
     
     # Check if custom path provided
     import sys
-    if len(sys.argv) > 1:
-        db_path = sys.argv[1]
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    if args:
+        db_path = args[0]
     
     success = migrate_database(db_path)
     
+    # One-off: collapse rows the scraper stored under per-run hash() ids
+    if success and '--collapse-duplicates' in sys.argv:
+        from database import DatabaseManager
+        print("\n🧹 Collapsing duplicate scraped posts...")
+        DatabaseManager(db_path).collapse_duplicate_posts()
+    
+    # Online rebuild of social_posts to the current table definition
+    if success and '--rebuild' in sys.argv:
+        conn = sqlite3.connect(db_path, timeout=30)
+        migrations.rebuild_social_posts(conn)
+        conn.close()
+    
     if success:
         print(f"\n🎯 Next steps:")
         print(f"1. Run data collector: python data_collector.py")
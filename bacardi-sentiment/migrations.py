@@ -0,0 +1,580 @@
+import sqlite3
+from contextlib import contextmanager
+from near_duplicates import NearDuplicateIndex
+from keyword_mentions import KeywordMentionIndex
+from timestamps import DAY_SECONDS, to_epoch
+
+# Rows per transaction for migrations that rewrite existing data
+BATCH_SIZE = 5000
+
+# Secondary indexes on social_posts, checked by check_query_plans.py. Wide
+# ones are covering: dashboard aggregates and trend queries read only the
+# index, never the table rows. Changing this dict needs a new migration
+# that calls ensure_indexes. {table} is filled in so an online rebuild can
+# index its shadow copy before the swap.
+MANAGED_INDEXES = {
+    # Time-window trends, platform breakdown and recent posts
+    'idx_social_posts_timeline': '''
+        ON {table} (ts_epoch, ts_day, platform, sentiment_label, sentiment_score, engagement_score)
+    ''',
+    # Dashboard aggregates over canonical posts (near-duplicates filtered
+    # out); the leading column also serves propagation to linked copies
+    'idx_social_posts_canonical': '''
+        ON {table} (canonical_post_id, ts_epoch, ts_day, platform, brand_category,
+                    sentiment_label, sentiment_score, engagement_score,
+                    keyword_matched, verified)
+    ''',
+    # Negative-post alerts: one label, newest first, ranked by score
+    'idx_social_posts_label': '''
+        ON {table} (sentiment_label, ts_epoch, sentiment_score)
+    ''',
+    # Keyword leaderboard
+    'idx_social_posts_keyword': '''
+        ON {table} (keyword_matched, sentiment_label, sentiment_score)
+    ''',
+    # Stale-row lookups walk one scorer version at a time in id order
+    'idx_social_posts_scorer_version': '''
+        ON {table} (scorer_version, id)
+    ''',
+    # Partial index holding only the rows analyze_sentiment.py still has to score
+    'idx_social_posts_unanalyzed': '''
+        ON {table} (id)
+        WHERE (sentiment_label IS NULL OR sentiment_score IS NULL) AND canonical_post_id IS NULL
+    ''',
+}
+
+# Current definition of social_posts; {name} lets online rebuilds create a shadow copy
+SOCIAL_POSTS_TABLE = '''
+    CREATE TABLE IF NOT EXISTS {name} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        platform TEXT NOT NULL,
+        post_id TEXT UNIQUE,
+        text TEXT NOT NULL,
+        author TEXT,
+        timestamp DATETIME,
+        ts_epoch INTEGER,
+        ts_day INTEGER,
+        sentiment_score REAL,
+        sentiment_label TEXT,
+        confidence_score REAL,
+        textblob_score REAL,
+        vader_score REAL,
+        engagement_score REAL,
+        likes INTEGER DEFAULT 0,
+        retweets INTEGER DEFAULT 0,
+        comments INTEGER DEFAULT 0,
+        upvotes INTEGER DEFAULT 0,
+        followers INTEGER DEFAULT 0,
+        url TEXT,
+        keyword_matched TEXT,
+        brand_category TEXT,
+        subreddit TEXT,
+        video_id TEXT,
+        verified BOOLEAN DEFAULT 0,
+        scorer_version TEXT,
+        simhash INTEGER,
+        canonical_post_id TEXT,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+
+# Share of voice per keyword and day, read from the index alone
+KEYWORD_MENTIONS_DAY_INDEX = '''
+    CREATE INDEX IF NOT EXISTS idx_keyword_mentions_day
+    ON keyword_mentions (keyword, ts_day, platform, sentiment_score, is_duplicate)
+'''
+
+@contextmanager
+def immediate_transaction(conn):
+    """BEGIN IMMEDIATE ... COMMIT, rolled back if the block raises
+    
+    Holds the write lock from the start, so schema changes made in the
+    block are atomic even when another process migrates the same file.
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+def ensure_keyword_mention_triggers(conn):
+    """Keep keyword_mentions' copies of post_id, platform, day, sentiment and duplicate flag in step with social_posts"""
+    with immediate_transaction(conn):
+        create_keyword_mention_triggers(conn)
+
+def create_keyword_mention_triggers(conn):
+    """(Re)create the keyword_mentions triggers inside the caller's transaction"""
+    conn.execute("DROP TRIGGER IF EXISTS keyword_mentions_update")
+    conn.execute("DROP TRIGGER IF EXISTS keyword_mentions_delete")
+    conn.execute('''
+        CREATE TRIGGER keyword_mentions_update
+        AFTER UPDATE OF post_id, platform, timestamp, ts_day, sentiment_score, canonical_post_id
+        ON social_posts BEGIN
+            UPDATE keyword_mentions
+            SET post_id = NEW.post_id, platform = NEW.platform, timestamp = NEW.timestamp,
+                ts_day = NEW.ts_day, sentiment_score = NEW.sentiment_score,
+                is_duplicate = NEW.canonical_post_id IS NOT NULL
+            WHERE post_id = OLD.post_id;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER keyword_mentions_delete AFTER DELETE ON social_posts BEGIN
+            DELETE FROM keyword_mentions WHERE post_id = OLD.post_id;
+        END
+    ''')
+
+# posts_fts trigger -> (event, row whose id decides, body)
+POST_SEARCH_TRIGGERS = {
+    'insert': ('AFTER INSERT', 'NEW', '''
+        INSERT INTO posts_fts (rowid, text) VALUES (NEW.id, NEW.text);
+    '''),
+    'update': ('AFTER UPDATE OF text', 'OLD', '''
+        INSERT INTO posts_fts (posts_fts, rowid, text) VALUES ('delete', OLD.id, OLD.text);
+        INSERT INTO posts_fts (rowid, text) VALUES (NEW.id, NEW.text);
+    '''),
+    'delete': ('AFTER DELETE', 'OLD', '''
+        INSERT INTO posts_fts (posts_fts, rowid, text) VALUES ('delete', OLD.id, OLD.text);
+    '''),
+}
+
+def _create_post_search_triggers(conn, backfilling):
+    """(Re)create the posts_fts triggers, skipping rows the backfill has yet to reach while backfilling"""
+    for action, (event, row, body) in POST_SEARCH_TRIGGERS.items():
+        conn.execute(f"DROP TRIGGER IF EXISTS posts_fts_{action}")
+        when = (f"WHEN NOT EXISTS (SELECT 1 FROM posts_fts_backfill "
+                f"WHERE {row}.id > indexed_through AND {row}.id <= last_id)") if backfilling else ''
+        conn.execute(f"CREATE TRIGGER posts_fts_{action} {event} ON social_posts {when} BEGIN {body} END")
+
+def ensure_post_search(conn, batch_size=BATCH_SIZE):
+    """Create the posts_fts full-text index and its triggers, and rebuild it from social_posts
+    
+    posts_fts is an external-content FTS5 table: it stores only the index
+    and reads text back from social_posts by id. Existing posts are indexed
+    in id batches, one short transaction each. Until the backfill is done,
+    the triggers leave rows it has yet to reach to the backfill, which
+    reads their text as it stands then, so no post is indexed twice or
+    missed. The backfill's progress lives in posts_fts_backfill, so a run
+    that finds one under way (interrupted, or another process migrating
+    the same file) carries it on instead of starting over.
+    """
+    with immediate_transaction(conn):
+        conn.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS posts_fts USING fts5(
+                text, content='social_posts', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2'
+            )
+        ''')
+        conn.execute("CREATE TABLE IF NOT EXISTS posts_fts_backfill (indexed_through INTEGER, last_id INTEGER)")
+        if conn.execute("SELECT 1 FROM posts_fts_backfill").fetchone() is None:
+            last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM social_posts").fetchone()[0]
+            conn.execute("INSERT INTO posts_fts_backfill VALUES (0, ?)", (last_id,))
+            conn.execute("INSERT INTO posts_fts (posts_fts) VALUES ('delete-all')")
+            _create_post_search_triggers(conn, backfilling=True)
+    
+    while True:
+        with immediate_transaction(conn):
+            if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'posts_fts_backfill'").fetchone() is None:
+                return  # finished by another process
+            start, last_id = conn.execute("SELECT indexed_through, last_id FROM posts_fts_backfill").fetchone()
+            if start >= last_id:
+                _create_post_search_triggers(conn, backfilling=False)
+                conn.execute("DROP TABLE posts_fts_backfill")
+                return
+            end = min(start + batch_size, last_id)
+            conn.execute("INSERT INTO posts_fts (rowid, text) SELECT id, text FROM social_posts "
+                         "WHERE id > ? AND id <= ?", (start, end))
+            conn.execute("UPDATE posts_fts_backfill SET indexed_through = ?", (end,))
+
+def ensure_post_change_log(conn):
+    """Log ids of updated and deleted posts in post_changes, newest change last
+    
+    In-memory copies of social_posts (post_snapshot.py) re-read the rows
+    logged since their last refresh; new rows they find by id alone. Each
+    post keeps only its latest entry, so the log never outgrows the table.
+    """
+    with immediate_transaction(conn):
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS post_changes (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                post_row_id INTEGER NOT NULL UNIQUE
+            )
+        ''')
+        create_post_change_triggers(conn)
+
+def create_post_change_triggers(conn):
+    """(Re)create the post_changes triggers inside the caller's transaction"""
+    conn.execute("DROP TRIGGER IF EXISTS post_changes_update")
+    conn.execute("DROP TRIGGER IF EXISTS post_changes_delete")
+    conn.execute('''
+        CREATE TRIGGER post_changes_update
+        AFTER UPDATE OF ts_epoch, platform, brand_category, sentiment_label, keyword_matched,
+                        sentiment_score, engagement_score, verified, canonical_post_id ON social_posts BEGIN
+            DELETE FROM post_changes WHERE post_row_id = NEW.id;
+            INSERT INTO post_changes (post_row_id) VALUES (NEW.id);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER post_changes_delete AFTER DELETE ON social_posts BEGIN
+            DELETE FROM post_changes WHERE post_row_id = OLD.id;
+            INSERT INTO post_changes (post_row_id) VALUES (OLD.id);
+        END
+    ''')
+
+def index_names(name):
+    """The two names a managed index alternates between
+    
+    SQLite can't rename an index, so an online rebuild builds the shadow
+    table's copy under whichever name the live table isn't using.
+    """
+    return name, f"{name}_rebuilt"
+
+def index_sql(name, definition, table):
+    """CREATE INDEX statement of a managed index on table, whitespace normalized"""
+    return ' '.join(f"CREATE INDEX {name} {definition.format(table=table)}".split())
+
+def ensure_indexes(conn):
+    """Create the managed indexes, rebuilding any whose definition changed
+    
+    Each index is built and committed on its own, so writers wait for one
+    index build at a time rather than for the whole set.
+    """
+    for name, definition in MANAGED_INDEXES.items():
+        with immediate_transaction(conn):
+            existing = conn.execute(
+                "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = 'social_posts' "
+                "AND name IN (?, ?)", index_names(name)
+            ).fetchone()
+            if existing and ' '.join(existing[1].replace('"', '').split()) == index_sql(
+                    existing[0], definition, 'social_posts'):
+                continue
+            if existing:
+                conn.execute(f"DROP INDEX {existing[0]}")
+            conn.execute(index_sql(name, definition, 'social_posts'))
+    
+    # Refresh planner statistics for indexes that are new or changed
+    conn.execute("PRAGMA optimize")
+
+def add_missing_columns(conn, table, columns):
+    """ALTER TABLE ADD COLUMN each (name, type) the table lacks
+    
+    Two processes opening a fresh database migrate it at the same time,
+    so a column can appear between the PRAGMA read and the ALTER; that
+    duplicate-column error means the column is already there.
+    """
+    existing_columns = [column[1] for column in conn.execute(f"PRAGMA table_info({table})")]
+    for column_name, column_type in columns:
+        if column_name in existing_columns:
+            continue
+        try:
+            conn.execute(f'ALTER TABLE {table} ADD COLUMN {column_name} {column_type}')
+        except sqlite3.OperationalError as e:
+            if 'duplicate column name' not in str(e):
+                raise
+            continue
+        print(f"Added column: {column_name}" if table == 'social_posts' else f"Added column: {table}.{column_name}")
+
+def update_in_batches(conn, table, assignments, where='1=1', params=(), batch_size=BATCH_SIZE):
+    """Run an UPDATE over consecutive id ranges, committing after each
+    
+    Readers and the collectors' writes interleave between ranges instead
+    of waiting behind one table-wide transaction. Returns rows updated.
+    """
+    max_id = conn.execute(f"SELECT MAX(id) FROM {table}").fetchone()[0] or 0
+    updated = 0
+    for start in range(0, max_id, batch_size):
+        cursor = conn.execute(
+            f"UPDATE {table} SET {assignments} WHERE id > ? AND id <= ? AND ({where})",
+            (start, start + batch_size) + tuple(params)
+        )
+        updated += cursor.rowcount
+        conn.commit()
+    return updated
+
+def rebuild_table_online(conn, table, create_sql, expressions=None, batch_size=BATCH_SIZE,
+                         indexes=None, create_triggers=None):
+    """Rebuild a table into a new definition while readers and writers carry on
+    
+    create_sql is the new CREATE TABLE with {name} for the table name, and
+    expressions maps new columns to SQL over the old row (by default a
+    column keeps the same-named old column). Rows are copied into a shadow
+    table in id batches, one short transaction each, while triggers mirror
+    every insert, update and delete made meanwhile. indexes (name ->
+    definition with {table}, as MANAGED_INDEXES) are then built on the
+    shadow, one transaction each. A final transaction catches up, swaps the
+    shadow in and runs create_triggers(conn) to give it the old table's
+    triggers, so no write lands on the new table unindexed or untriggered.
+    Under WAL, readers keep their snapshot throughout. Returns the number of
+    rows in the rebuilt table.
+    """
+    shadow = f"{table}_shadow"
+    
+    # Leftovers of an interrupted rebuild are discarded and the copy restarts
+    for action in ('insert', 'update', 'delete'):
+        conn.execute(f"DROP TRIGGER IF EXISTS {shadow}_{action}")
+    conn.execute(f"DROP TABLE IF EXISTS {shadow}")
+    conn.execute(create_sql.format(name=shadow))
+    
+    old_columns = {column[1] for column in conn.execute(f"PRAGMA table_info({table})")}
+    new_columns = [column[1] for column in conn.execute(f"PRAGMA table_info({shadow})")]
+    expressions = dict(expressions or {})
+    copied = [column for column in new_columns if column in expressions or column in old_columns]
+    target = f"{shadow} ({', '.join(copied)})"
+    source = f"SELECT {', '.join(expressions.get(column, column) for column in copied)} FROM {table}"
+    copy_sql = f"INSERT OR REPLACE INTO {target} {source}"
+    
+    # Mirror concurrent writes before taking the id bound, so rows past it are never missed
+    conn.execute(f"CREATE TRIGGER {shadow}_insert AFTER INSERT ON {table} BEGIN "
+                 f"{copy_sql} WHERE id = NEW.id; END")
+    conn.execute(f"CREATE TRIGGER {shadow}_update AFTER UPDATE ON {table} BEGIN "
+                 f"DELETE FROM {shadow} WHERE id = OLD.id; {copy_sql} WHERE id = NEW.id; END")
+    conn.execute(f"CREATE TRIGGER {shadow}_delete AFTER DELETE ON {table} BEGIN "
+                 f"DELETE FROM {shadow} WHERE id = OLD.id; END")
+    conn.commit()
+    
+    max_id = conn.execute(f"SELECT MAX(id) FROM {table}").fetchone()[0] or 0
+    print(f"🔁 Rebuilding {table}: copying ids up to {max_id:,} in batches of {batch_size:,}")
+    reported = 0
+    for start in range(0, max_id, batch_size):
+        end = min(start + batch_size, max_id)
+        conn.execute(f"{copy_sql} WHERE id > ? AND id <= ?", (start, end))
+        conn.commit()
+        if end * 10 // max_id > reported:
+            reported = end * 10 // max_id
+            print(f"   {end:,}/{max_id:,} ids copied ({end * 100 // max_id}%)")
+    
+    for name, definition in (indexes or {}).items():
+        with immediate_transaction(conn):
+            taken = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+            shadow_name = next(candidate for candidate in index_names(name) if candidate not in taken)
+            conn.execute(index_sql(shadow_name, definition, shadow))
+        print(f"   Indexed {shadow} ({name})")
+    
+    # Swap: nothing can write between the catch-up and the rename
+    with immediate_transaction(conn):
+        conn.execute(f"INSERT OR IGNORE INTO {target} {source} WHERE id > ?", (max_id,))
+        for action in ('insert', 'update', 'delete'):
+            conn.execute(f"DROP TRIGGER {shadow}_{action}")
+        conn.execute(f"DROP TABLE {table}")
+        conn.execute(f"ALTER TABLE {shadow} RENAME TO {table}")
+        if create_triggers:
+            create_triggers(conn)
+    
+    rows = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    print(f"✅ Swapped in rebuilt {table} ({rows:,} rows)")
+    return rows
+
+def create_social_posts_triggers(conn):
+    """(Re)create every trigger on social_posts whose target table exists, inside the caller's transaction"""
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    create_keyword_mention_triggers(conn)
+    if 'posts_fts' in tables:
+        _create_post_search_triggers(conn, backfilling='posts_fts_backfill' in tables)
+    if 'post_changes' in tables:
+        create_post_change_triggers(conn)
+
+def rebuild_social_posts(conn, expressions=None, batch_size=BATCH_SIZE):
+    """Rebuild social_posts to SOCIAL_POSTS_TABLE online, with its managed indexes and triggers
+    
+    Brings databases whose columns were appended by ALTER TABLE to the
+    current definition, and is the path for changes ALTER cannot make.
+    Ids and text carry over unchanged, so the external-content posts_fts
+    index stays valid across the swap, and snapshots' post_changes
+    positions with it.
+    """
+    conn.execute("PRAGMA journal_mode = WAL")
+    return rebuild_table_online(conn, 'social_posts', SOCIAL_POSTS_TABLE, expressions, batch_size,
+                                indexes=MANAGED_INDEXES, create_triggers=create_social_posts_triggers)
+
+def create_base_tables(conn):
+    """Posts, daily summary and keyword tables, plus columns older databases lack"""
+    conn.execute(SOCIAL_POSTS_TABLE.format(name='social_posts'))
+    
+    # Databases created before these columns existed
+    add_missing_columns(conn, 'social_posts', [
+        ('url', 'TEXT'),
+        ('keyword_matched', 'TEXT'),
+        ('brand_category', 'TEXT'),
+        ('subreddit', 'TEXT'),
+        ('video_id', 'TEXT'),
+        ('verified', 'BOOLEAN DEFAULT 0'),
+        ('upvotes', 'INTEGER DEFAULT 0'),
+        ('engagement_score', 'REAL'),
+        ('confidence_score', 'REAL'),
+        ('scorer_version', 'TEXT'),
+        ('textblob_score', 'REAL'),
+        ('vader_score', 'REAL'),
+        ('simhash', 'INTEGER'),
+        ('canonical_post_id', 'TEXT'),
+        ('ts_epoch', 'INTEGER'),
+        ('ts_day', 'INTEGER')
+    ])
+    
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS daily_summary (
+            date DATE PRIMARY KEY,
+            total_posts INTEGER,
+            positive_count INTEGER,
+            negative_count INTEGER,
+            neutral_count INTEGER,
+            avg_sentiment REAL,
+            top_keywords TEXT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS keyword_mentions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            keyword TEXT,
+            post_id TEXT,
+            platform TEXT,
+            timestamp DATETIME,
+            sentiment_score REAL,
+            FOREIGN KEY (post_id) REFERENCES social_posts (post_id)
+        )
+    ''')
+
+def create_analysis_tables(conn):
+    """Checkpoints and failures of analyze_sentiment.py runs"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS analysis_runs (
+            run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            scorer_version TEXT,
+            engine TEXT,
+            status TEXT DEFAULT 'running',
+            last_id INTEGER DEFAULT 0,
+            processed INTEGER DEFAULT 0,
+            failed INTEGER DEFAULT 0,
+            started_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            updated_at DATETIME,
+            finished_at DATETIME
+        )
+    ''')
+    
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS analysis_failures (
+            post_row_id INTEGER PRIMARY KEY,
+            run_id INTEGER,
+            error TEXT,
+            failed_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (run_id) REFERENCES analysis_runs (run_id)
+        )
+    ''')
+
+def create_near_duplicate_index(conn):
+    """SimHash bands of canonical posts"""
+    NearDuplicateIndex().create_table(conn.cursor())
+
+def create_managed_indexes(conn):
+    """Secondary and covering indexes for the dashboard, trends and analyzer"""
+    ensure_indexes(conn)
+
+def add_epoch_timestamps(conn):
+    """UTC epoch and day columns backfilled from timestamp, indexes moved onto them"""
+    add_missing_columns(conn, 'social_posts', [('ts_epoch', 'INTEGER'), ('ts_day', 'INTEGER')])
+    conn.commit()
+    
+    # SQL date functions misread some collector formats, so parse in Python
+    conn.create_function('to_epoch', 1, to_epoch, deterministic=True)
+    updated = update_in_batches(
+        conn, 'social_posts',
+        f"ts_epoch = to_epoch(timestamp), ts_day = to_epoch(timestamp) / {DAY_SECONDS}",
+        "ts_epoch IS NULL AND timestamp IS NOT NULL"
+    )
+    print(f"Backfilled epoch timestamps on {updated:,} posts")
+    ensure_indexes(conn)
+
+def add_keyword_mention_columns(conn):
+    """Columns keyword_mentions gained after create_base_tables"""
+    add_missing_columns(conn, 'keyword_mentions', [('ts_day', 'INTEGER'), ('is_duplicate', 'INTEGER NOT NULL DEFAULT 0')])
+
+def index_keyword_mentions(conn):
+    """Keyword mentions as an inverted index over (keyword, day), backfilled from post texts"""
+    add_keyword_mention_columns(conn)
+    conn.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_keyword_mentions_post
+        ON keyword_mentions (post_id, keyword)
+    ''')
+    conn.execute(KEYWORD_MENTIONS_DAY_INDEX)
+    ensure_keyword_mention_triggers(conn)
+    
+    written = KeywordMentionIndex().rebuild(conn)
+    print(f"Indexed {written:,} keyword mentions")
+
+def create_post_search(conn):
+    """FTS5 full-text index over post text, kept current by triggers"""
+    ensure_post_search(conn)
+
+def create_post_change_log(conn):
+    """Change log of updated and deleted posts for incremental in-memory snapshots"""
+    ensure_post_change_log(conn)
+
+# Databases that ran the retired step 6 hold the sentiment cube. The dashboard
+# panels and the trend and platform readers all read the in-memory post
+# snapshot's running sums now, so nothing reads the cube and its triggers only
+# slow down writes
+def drop_sentiment_cube(conn):
+    """Drop the sentiment cube and its triggers"""
+    for action in ('insert', 'update', 'delete'):
+        conn.execute(f"DROP TRIGGER IF EXISTS sentiment_cube_{action}")
+    conn.execute("DROP TABLE IF EXISTS sentiment_cube")
+    conn.commit()
+
+def flag_duplicate_mentions(conn):
+    """Near-duplicate flag on keyword mentions, so share of voice counts each story once"""
+    add_keyword_mention_columns(conn)
+    ensure_keyword_mention_triggers(conn)
+    flagged = update_in_batches(
+        conn, 'keyword_mentions', "is_duplicate = 1",
+        "EXISTS (SELECT 1 FROM social_posts WHERE social_posts.post_id = keyword_mentions.post_id "
+        "AND social_posts.canonical_post_id IS NOT NULL)"
+    )
+    print(f"Flagged {flagged:,} keyword mentions of near-duplicate posts")
+    conn.execute("DROP INDEX IF EXISTS idx_keyword_mentions_day")
+    conn.execute(KEYWORD_MENTIONS_DAY_INDEX)
+    conn.commit()
+
+# (version, step) pairs applied in order; a database at user_version N has
+# run every step numbered up to N. Numbers of retired steps are never reused
+# (6 built the sentiment cube). Steps must be idempotent: one interrupted
+# before its version bump runs again.
+MIGRATIONS = [
+    (1, create_base_tables),
+    (2, create_analysis_tables),
+    (3, create_near_duplicate_index),
+    (4, create_managed_indexes),
+    (5, add_epoch_timestamps),
+    (7, index_keyword_mentions),
+    (8, create_post_search),
+    (9, create_post_change_log),
+    (10, drop_sentiment_cube),
+    (11, flag_duplicate_mentions),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+def get_version(conn):
+    """Schema version recorded in the database file"""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def migrate(conn):
+    """Apply pending migrations and return the (version, description) pairs applied
+    
+    An up-to-date database costs a single PRAGMA read.
+    """
+    version = get_version(conn)
+    applied = []
+    for number, step in MIGRATIONS:
+        if number <= version:
+            continue
+        description = step.__doc__
+        print(f"Applying migration {number}: {description}")
+        step(conn)
+        # Another process may have migrated further meanwhile; never step its version back
+        with immediate_transaction(conn):
+            if get_version(conn) < number:
+                conn.execute(f"PRAGMA user_version = {number}")
+        applied.append((number, description))
+    return applied
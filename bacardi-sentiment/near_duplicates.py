@@ -0,0 +1,236 @@
+import hashlib
+import re
+import numpy as np
+
+# Fingerprints within this many differing bits are treated as the same post
+MAX_DISTANCE = 3
+
+# Shorter texts ("love it", "great rum") collide too easily to link safely
+MIN_TOKENS = 8
+
+# 64-bit fingerprints split into four 16-bit bands: by pigeonhole, two
+# fingerprints within MAX_DISTANCE bits share at least one exact band
+BANDS = 4
+BAND_BITS = 16
+
+URL_PATTERN = re.compile(r'http\S+')
+WORD_PATTERN = re.compile(r'\w+')
+BIT_POSITIONS = np.arange(64, dtype=np.uint64)
+
+# Set bits of every byte value, for popcounts over arrays of fingerprints
+BYTE_POPCOUNT = np.array([bin(value).count('1') for value in range(256)], dtype=np.int64)
+
+def tokenize(text):
+    """Lowercased words with URLs removed"""
+    return WORD_PATTERN.findall(URL_PATTERN.sub(' ', (text or '').lower()))
+
+def simhash(text):
+    """64-bit SimHash over distinct words, or None for texts too short to compare"""
+    return simhash_many([text])[0]
+
+def simhash_many(texts):
+    """simhash() of every text, hashing each distinct word of the batch once"""
+    fingerprints = [None] * len(texts)
+    vocabulary = {}
+    codes = []
+    owners = []
+    positions = []
+    for position, text in enumerate(texts):
+        tokens = tokenize(text)
+        if len(tokens) < MIN_TOKENS:
+            continue
+        # Single words rather than bigrams: an appended "lol" flips far fewer bits
+        shingles = set(tokens)
+        codes.extend(vocabulary.setdefault(shingle, len(vocabulary)) for shingle in shingles)
+        owners.extend([len(positions)] * len(shingles))
+        positions.append(position)
+    if not positions:
+        return fingerprints
+    
+    hashes = np.array([
+        int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'big')
+        for shingle in vocabulary
+    ], dtype=np.uint64)[codes]
+    owners = np.array(owners)
+    shingle_counts = np.bincount(owners, minlength=len(positions))
+    
+    # Each bit of the fingerprint is the majority vote of that bit across shingles
+    packed = np.zeros(len(positions), dtype=np.uint64)
+    for bit in BIT_POSITIONS:
+        votes = np.bincount(owners, weights=(hashes >> bit) & np.uint64(1), minlength=len(positions))
+        packed |= (votes * 2 > shingle_counts).astype(np.uint64) << bit
+    for position, fingerprint in zip(positions, packed.tolist()):
+        fingerprints[position] = fingerprint
+    return fingerprints
+
+def to_signed(fingerprint):
+    """Store unsigned 64-bit fingerprints in SQLite's signed INTEGER"""
+    return fingerprint - (1 << 64) if fingerprint >= 1 << 63 else fingerprint
+
+def from_signed(value):
+    """Inverse of to_signed"""
+    return value + (1 << 64) if value < 0 else value
+
+def hamming_distance(a, b):
+    """Number of differing bits between two fingerprints"""
+    return bin(a ^ b).count('1')
+
+def hamming_distances(a, b):
+    """hamming_distance() of each pair of two equal-length uint64 arrays"""
+    return BYTE_POPCOUNT[np.ascontiguousarray(a ^ b).view(np.uint8)].reshape(-1, 8).sum(axis=1)
+
+def shared_keys(keys, targets):
+    """(i, j) index arrays of every pair with keys[i] == targets[j]"""
+    order = np.argsort(targets, kind='stable')
+    first = np.searchsorted(targets[order], keys, 'left')
+    counts = np.searchsorted(targets[order], keys, 'right') - first
+    pair_keys = np.repeat(np.arange(len(keys)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return pair_keys, order[np.repeat(first, counts) + offsets]
+
+class BatchCandidates:
+    """Canonical posts close to each fingerprint of one ingest batch
+    
+    Built by NearDuplicateIndex.load_candidates(), which compares the
+    whole batch with NumPy up front: for every distinct fingerprint it
+    keeps the indexed posts and the distinct fingerprints of the batch
+    itself within MAX_DISTANCE bits, closest first. find_closest() then
+    only walks those short lists, taking batch fingerprints once a post
+    carrying them was accepted as canonical with add_candidate().
+    """
+    
+    def __init__(self, fingerprint_ids, matches):
+        self.fingerprint_ids = fingerprint_ids
+        self.matches = matches
+        self.accepted = {}
+    
+    def find_closest(self, position):
+        """Closest canonical post to the batch's fingerprint at position, or None"""
+        fingerprint_id = self.fingerprint_ids[position]
+        if fingerprint_id is None:
+            return None
+        for match in self.matches[fingerprint_id]:
+            if isinstance(match, dict):
+                return match
+            if match in self.accepted:
+                return self.accepted[match]
+        return None
+    
+    def add_candidate(self, position, post):
+        """Make a not-yet-written canonical post findable by the rest of its batch"""
+        fingerprint_id = self.fingerprint_ids[position]
+        if fingerprint_id is not None:
+            self.accepted.setdefault(fingerprint_id, post)
+
+class NearDuplicateIndex:
+    """SimHash LSH index over canonical posts, stored next to social_posts.
+    
+    Only canonical posts are indexed, one row per band, so the index grows
+    with distinct content rather than with the number of posts. Lookups
+    work a batch at a time: load_candidates fetches every indexed post that
+    shares a band with the batch, and posts of the batch itself join the
+    returned BatchCandidates as they are accepted as canonical.
+    """
+    
+    def create_table(self, cursor):
+        """Create the band table if it doesn't exist"""
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS simhash_bands (
+                band_key INTEGER NOT NULL,
+                post_id TEXT NOT NULL,
+                PRIMARY KEY (band_key, post_id)
+            ) WITHOUT ROWID
+        ''')
+    
+    def band_keys(self, fingerprint):
+        """One key per band: band number in the high bits, band value in the low bits"""
+        mask = (1 << BAND_BITS) - 1
+        return [(band << BAND_BITS) | ((fingerprint >> (band * BAND_BITS)) & mask)
+                for band in range(BANDS)]
+    
+    def band_key_array(self, fingerprints):
+        """band_keys() of a uint64 array, one row per fingerprint"""
+        bands = np.arange(BANDS, dtype=np.uint64)
+        values = (fingerprints[:, None] >> (bands * np.uint64(BAND_BITS))) & np.uint64((1 << BAND_BITS) - 1)
+        return (values | (bands << np.uint64(BAND_BITS))).astype(np.int64)
+    
+    def load_candidates(self, cursor, fingerprints, columns=()):
+        """BatchCandidates of a batch of fingerprints (None for posts without one)
+        
+        Fetches every indexed post that shares a band with the batch, in a
+        few queries, then measures all pairs sharing a band at once. Matches
+        are ordered by distance, then band, indexed posts before the batch's
+        own. Indexed posts are dicts of post_id plus the requested
+        social_posts columns.
+        """
+        distinct = {}
+        fingerprint_ids = [None if fingerprint is None else distinct.setdefault(fingerprint, len(distinct))
+                           for fingerprint in fingerprints]
+        values = np.array(list(distinct), dtype=np.uint64)
+        keys = self.band_key_array(values).ravel()
+        
+        # (band key, fingerprint, row id) of indexed posts; their columns are
+        # only read for the few that turn out close
+        rows = []
+        unique_keys = np.unique(keys).tolist()
+        for start in range(0, len(unique_keys), 500):
+            chunk = unique_keys[start:start + 500]
+            cursor.execute(f'''
+                SELECT b.band_key, p.simhash, p.id
+                FROM simhash_bands b
+                JOIN social_posts p ON p.post_id = b.post_id
+                WHERE b.band_key IN ({",".join("?" * len(chunk))})
+            ''', chunk)
+            rows.extend(cursor.fetchall())
+        stored = np.array(rows, dtype=np.int64).reshape(-1, 3)
+        
+        # (fingerprint id, distance, band, source, match) of every close pair;
+        # source 0 matches an indexed post, 1 another fingerprint of the batch
+        found = []
+        # Casting the signed stored fingerprints to uint64 undoes to_signed()
+        for source, targets, target_values in ((0, stored[:, 0], stored[:, 1].astype(np.uint64)),
+                                               (1, keys, values)):
+            pair_keys, matches = shared_keys(keys, targets)
+            owners = pair_keys // BANDS
+            if source:
+                matches //= BANDS
+            distances = hamming_distances(values[owners], target_values[matches])
+            close = distances <= MAX_DISTANCE
+            found.append((owners[close], distances[close], pair_keys[close] % BANDS,
+                          np.full(np.count_nonzero(close), source), matches[close]))
+        owners, distances, bands, sources, matches = (np.concatenate(column) for column in zip(*found))
+        
+        selected = ''.join(f", {column}" for column in columns)
+        posts = {}
+        row_ids = np.unique(stored[matches[sources == 0], 2]).tolist()
+        for start in range(0, len(row_ids), 500):
+            chunk = row_ids[start:start + 500]
+            cursor.execute(f'''
+                SELECT id, post_id{selected} FROM social_posts
+                WHERE id IN ({",".join("?" * len(chunk))})
+            ''', chunk)
+            for row in cursor.fetchall():
+                posts[row[0]] = dict(zip(('post_id',) + tuple(columns), row[1:]))
+        
+        closest_first = [[] for _ in distinct]
+        order = np.lexsort((matches, sources, bands, distances, owners))
+        for owner, source, match in zip(owners[order].tolist(), sources[order].tolist(), matches[order].tolist()):
+            closest_first[owner].append(match if source else posts[int(stored[match, 2])])
+        return BatchCandidates(fingerprint_ids, closest_first)
+    
+    def add(self, cursor, post_id, fingerprint):
+        """Index a canonical post"""
+        if fingerprint is None:
+            return
+        cursor.executemany(
+            "INSERT OR IGNORE INTO simhash_bands (band_key, post_id) VALUES (?, ?)",
+            [(key, post_id) for key in self.band_keys(fingerprint)]
+        )
+    
+    def add_many(self, cursor, entries):
+        """Index many canonical posts given as (post_id, fingerprint) pairs"""
+        cursor.executemany(
+            "INSERT OR IGNORE INTO simhash_bands (band_key, post_id) VALUES (?, ?)",
+            [(key, post_id) for post_id, fingerprint in entries if fingerprint is not None
+             for key in self.band_keys(fingerprint)]
+        )
@@ -0,0 +1,20 @@
+import hashlib
+import re
+
+# Ids the scraper minted with Python's per-process salted hash(), e.g. "twitter_-8312..."
+LEGACY_SCRAPED_ID = re.compile(r'^(?:twitter|instagram|trustpilot|google|news)_-?\d+$')
+
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+def normalize_text(text):
+    """Lowercase and collapse whitespace so re-rendered markup maps to one id"""
+    return WHITESPACE_PATTERN.sub(' ', (text or '').lower()).strip()
+
+def stable_post_id(source, text, url=None):
+    """Deterministic post id from source, normalized text and URL
+
+    The same review scraped on any run, in any process, gets the same id,
+    so INSERT OR IGNORE drops it instead of storing and scoring it again.
+    """
+    key = '\x1f'.join((source, normalize_text(text), (url or '').strip()))
+    return f"{source}_{hashlib.sha1(key.encode('utf-8')).hexdigest()[:20]}"
\ No newline at end of file
@@ -0,0 +1,424 @@
+import threading
+import numpy as np
+import pandas as pd
+from timestamps import DAY_SECONDS
+from query_builder import in_list
+
+# Text columns held as small integer codes; code 0 stands for NULL
+CODED_COLUMNS = ('platform', 'brand_category', 'sentiment_label', 'keyword_matched')
+
+SNAPSHOT_QUERY = '''
+    SELECT id, ts_epoch, platform, brand_category, sentiment_label, keyword_matched,
+           sentiment_score, engagement_score, verified, canonical_post_id IS NOT NULL
+    FROM social_posts
+'''
+
+# Rows per fetchmany() while loading, and ids per IN (...) when re-reading changes
+FETCH_SIZE = 50000
+CHUNK_SIZE = 512
+
+LABELS = ('positive', 'negative', 'neutral')
+
+# Spare days past the newest post in the day bins, so each day's new posts
+# don't force a rebuild of every sum
+DAY_HEADROOM = 31
+
+# Per-row bin key column -> the _binned() sums it indexes
+BIN_KEYS = {'cell': 'cells_sums', 'day_key': 'day_sums', 'day_platform_key': 'day_platform_sums'}
+
+class PostSnapshot:
+    """Columnar in-memory copy of the social_posts columns the dashboard filters and aggregates.
+    
+    One NumPy array per column, in id order. refresh() appends rows past
+    the last id seen and re-reads rows that the post_changes log records
+    as updated or deleted since the last refresh, so after the first load
+    a refresh costs in proportion to what changed. Filters become boolean
+    masks and aggregates become bincounts, with no SQL per widget.
+    
+    The per-bin sums aggregate() and rollup() start from are kept current
+    by refresh() as well: rows it appends are added to them, and rows it
+    re-reads are taken out with their old values and added back with the
+    new ones.
+    
+    Threads sharing a snapshot hold lock around refresh and every read
+    that follows it.
+    """
+    
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.values = {column: [None] for column in CODED_COLUMNS}
+        self.codes = {column: {None: 0} for column in CODED_COLUMNS}
+        self.last_id = 0
+        self.last_change = 0
+        self._bins = None  # see _binned()
+        
+        # Per-row arrays; score is NaN until analyzed, epoch and day -1 without a timestamp.
+        # Each is a view of the first _size entries of a larger array in _store.
+        self._store = {
+            'ids': np.empty(0, dtype=np.int64),
+            'epoch': np.empty(0, dtype=np.int64),
+            'day': np.empty(0, dtype=np.intp),
+            'score': np.empty(0, dtype=np.float64),
+            'score_filled': np.empty(0, dtype=np.float64),
+            'scored': np.empty(0, dtype=np.float64),
+            'engagement': np.empty(0, dtype=np.float64),
+            'verified': np.empty(0, dtype=bool),
+            'duplicate': np.empty(0, dtype=bool),
+            'live': np.empty(0, dtype=bool),
+        }
+        for column in CODED_COLUMNS + tuple(BIN_KEYS):
+            self._store[column] = np.empty(0, dtype=np.intp)
+        self._size = 0
+        self.columns = dict(self._store)
+    
+    def __len__(self):
+        return int(np.count_nonzero(self.columns['live']))
+    
+    def __getattr__(self, name):
+        # Per-row arrays read as attributes: snapshot.epoch, snapshot.platform, ...
+        columns = self.__dict__.get('columns', {})
+        if name in columns:
+            return columns[name]
+        raise AttributeError(name)
+    
+    def refresh(self, conn):
+        """Pull new and changed rows from the database; returns the number of rows read"""
+        with self.lock:
+            # Bound the change log first: changes logged after it are picked up next time
+            last_change = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM post_changes").fetchone()[0]
+            
+            chunks = []
+            cursor = conn.execute(f"{SNAPSHOT_QUERY} WHERE id > ? ORDER BY id", (self.last_id,))
+            while True:
+                rows = cursor.fetchmany(FETCH_SIZE)
+                if not rows:
+                    break
+                chunks.append(self._rows_to_columns(rows))
+            if chunks:
+                self._append(chunks)
+            read = sum(len(chunk['ids']) for chunk in chunks)
+            
+            changed = [row[0] for row in conn.execute(
+                "SELECT post_row_id FROM post_changes WHERE seq > ? AND seq <= ?",
+                (self.last_change, last_change)
+            )]
+            for start in range(0, len(changed), CHUNK_SIZE):
+                chunk = changed[start:start + CHUNK_SIZE]
+                placeholders, params = in_list(chunk)
+                rows = conn.execute(f"{SNAPSHOT_QUERY} WHERE id IN {placeholders}", params).fetchall()
+                self._update(chunk, self._rows_to_columns(rows))
+                read += len(rows)
+            self.last_change = last_change
+            return read
+    
+    def _code(self, column, value):
+        """Code of a value in a coded column, assigning the next free code to new values"""
+        code = self.codes[column].get(value)
+        if code is None:
+            code = len(self.values[column])
+            self.codes[column][value] = code
+            self.values[column].append(value)
+        return code
+    
+    def _rows_to_columns(self, rows):
+        """SNAPSHOT_QUERY rows as a dict of per-row arrays"""
+        ids, epoch, platform, brand, label, keyword, score, engagement, verified, duplicate = (
+            zip(*rows) if rows else [()] * 10
+        )
+        epoch = np.array([-1 if value is None else value for value in epoch], dtype=np.int64)
+        score = np.array(score, dtype=np.float64)  # None becomes NaN
+        columns = {
+            'ids': np.array(ids, dtype=np.int64),
+            'epoch': epoch,
+            'day': np.where(epoch >= 0, epoch // DAY_SECONDS, -1).astype(np.intp),
+            'score': score,
+            'score_filled': np.nan_to_num(score),
+            'scored': (~np.isnan(score)).astype(np.float64),
+            'engagement': np.nan_to_num(np.array(engagement, dtype=np.float64)),
+            'verified': np.array([bool(value) for value in verified], dtype=bool),
+            'duplicate': np.array(duplicate, dtype=bool),
+            'live': np.ones(len(ids), dtype=bool),
+        }
+        for column, values in zip(CODED_COLUMNS, (platform, brand, label, keyword)):
+            columns[column] = np.array([self._code(column, value) for value in values], dtype=np.intp)
+        return columns
+    
+    def _append(self, chunks):
+        """Add chunks of rows with ids past every id held
+        
+        The arrays in _store at least double when full, so appending costs
+        in proportion to the rows added, not to the rows held.
+        """
+        start = self._size
+        size = start + sum(len(chunk['ids']) for chunk in chunks)
+        capacity = len(self._store['ids'])
+        if size > capacity:
+            capacity = max(size, 2 * capacity)
+            for name, current in self._store.items():
+                grown = np.empty(capacity, dtype=current.dtype)
+                grown[:start] = current[:start]
+                self._store[name] = grown
+        position = start
+        for chunk in chunks:
+            end = position + len(chunk['ids'])
+            for name, values in chunk.items():
+                self._store[name][position:end] = values
+            position = end
+        self._size = size
+        self.columns = {name: current[:size] for name, current in self._store.items()}
+        self.last_id = int(self.ids[-1])
+        self._bin(np.arange(start, size), 1)
+    
+    def _update(self, requested_ids, columns):
+        """Overwrite re-read rows in place; requested ids that came back empty were deleted"""
+        held = self._positions(np.array(requested_ids, dtype=np.int64))
+        held = held[held >= 0]
+        self._bin(held[self.live[held]], -1)
+        self.live[held] = False
+        
+        positions = self._positions(columns['ids'])
+        found = positions >= 0
+        for name, values in columns.items():
+            self.columns[name][positions[found]] = values[found]
+        self._bin(positions[found], 1)
+    
+    def _positions(self, ids):
+        """Array positions of ids, or -1 for ids not held"""
+        if not len(self.ids):
+            return np.full(len(ids), -1)
+        positions = np.minimum(np.searchsorted(self.ids, ids), len(self.ids) - 1)
+        return np.where(self.ids[positions] == ids, positions, -1)
+    
+    def code(self, column, value):
+        """Code of a value in a coded column, or -1 if no row holds it"""
+        return self.codes[column].get(value, -1)
+    
+    def mask(self, since=None, platform=None, brand_category=None, sentiment_label=None,
+             min_engagement=0, verified_only=False, include_duplicates=False):
+        """Boolean mask of live rows passing the dashboard's filters; None means no filter"""
+        mask = self.live.copy()
+        if since is not None:
+            mask &= self.epoch >= since
+        for column, value in (('platform', platform), ('brand_category', brand_category),
+                              ('sentiment_label', sentiment_label)):
+            if value is not None:
+                mask &= self.columns[column] == self.code(column, value)
+        if min_engagement > 0:
+            mask &= self.engagement >= min_engagement
+        if verified_only:
+            mask &= self.verified
+        if not include_duplicates:
+            mask &= ~self.duplicate
+        return mask
+    
+    def _binned(self):
+        """Bin layout and per-bin sums of the live rows, rebuilt when a row falls outside the layout
+        
+        'cell' keys bin rows by combined (platform, brand, label, keyword)
+        code, 'day_key' by (day, label) and 'day_platform_key' by (day,
+        platform, label), from 'first_day' on for 'days' days, posts
+        without a timestamp in a spare bin past the last day. The keys are
+        per-row columns; BIN_KEYS names the sums each indexes, which hold
+        post count, scored count, score sum and engagement sum per bin.
+        'day_rows' caches the row positions of days looked up so far.
+        """
+        if self._bins is None:
+            shape = tuple(len(self.values[column]) for column in CODED_COLUMNS)
+            dated = self.day[self.day >= 0]
+            first_day = int(dated.min()) if len(dated) else 0
+            days = (int(dated.max()) - first_day + 1 if len(dated) else 0) + DAY_HEADROOM
+            label_size = shape[CODED_COLUMNS.index('sentiment_label')]
+            platform_size = shape[CODED_COLUMNS.index('platform')]
+            bins = {
+                'shape': shape,
+                'first_day': first_day,
+                'days': days,
+                'day_rows': {},
+                'cells_sums': int(np.prod(shape)),
+                'day_sums': days * label_size + 1,
+                'day_platform_sums': days * platform_size * label_size + 1,
+            }
+            for name in BIN_KEYS.values():
+                bins[name] = [np.zeros(bins[name], dtype=np.int64)] + [np.zeros(bins[name]) for _ in range(3)]
+            self._bins = bins
+            self._bin(np.arange(self._size), 1)
+        return self._bins
+    
+    def _bin(self, positions, sign):
+        """Add (sign 1) or take out (sign -1) rows at positions from the _binned() sums
+        
+        Adding sets the rows' keys first, and only live rows count. A row
+        whose value has no bin yet (a new code, or a day out of range)
+        drops the sums, to be rebuilt at the next _binned().
+        """
+        bins = self._bins
+        if bins is None or not len(positions):
+            return
+        if sign > 0:
+            shape, first_day, days = bins['shape'], bins['first_day'], bins['days']
+            day = self.day[positions]
+            dated = day[day >= 0]
+            if (shape != tuple(len(self.values[column]) for column in CODED_COLUMNS)
+                    or (len(dated) and (dated.min() < first_day or dated.max() >= first_day + days))):
+                self._bins = None
+                return
+            label, platform = self.sentiment_label[positions], self.platform[positions]
+            label_size = shape[CODED_COLUMNS.index('sentiment_label')]
+            platform_size = shape[CODED_COLUMNS.index('platform')]
+            self.cell[positions] = np.ravel_multi_index(
+                tuple(self.columns[column][positions] for column in CODED_COLUMNS), shape)
+            self.day_key[positions] = np.where(day >= 0, (day - first_day) * label_size + label, days * label_size)
+            self.day_platform_key[positions] = np.where(
+                day >= 0, ((day - first_day) * platform_size + platform) * label_size + label,
+                days * platform_size * label_size)
+            positions = positions[self.live[positions]]
+        
+        weights = (self.scored[positions], self.score_filled[positions], self.engagement[positions])
+        for key, name in BIN_KEYS.items():
+            for total, part in zip(bins[name], self._sums(self.columns[key][positions], len(bins[name][0]), weights)):
+                total += sign * part
+        for day in np.unique(self.day[positions]):
+            bins['day_rows'].pop(day, None)
+    
+    def _day_rows(self, day):
+        """Positions of the rows on a UTC day, found once until rows on it change"""
+        day_rows = self._binned()['day_rows']
+        if day not in day_rows:
+            day_rows[day] = np.flatnonzero(self.day == day)
+        return day_rows[day]
+    
+    def _sums(self, keys, size, weights):
+        """Post count plus one bincount per weights array (scored, score_filled, engagement) over size bins"""
+        return [np.bincount(keys, minlength=size)] + [np.bincount(keys, weights=array, minlength=size)
+                                                     for array in weights]
+    
+    def aggregate(self, mask):
+        """summary() and every group_by() of the masked rows, from one pass over them
+        
+        Rows are binned by their combined (platform, brand, label, keyword)
+        code and by (day, label), four sums per bin: post count, scored
+        count, score sum and engagement sum. Every panel is then a sum over
+        those small tables instead of another pass over the rows. The keys
+        and live-row sums are kept current across refreshes, so a mask
+        passing under half the rows bincounts just those rows, and a broader
+        one subtracts the live rows it leaves out. Returns a dict with 'summary' plus a
+        group_by() frame for each of CODED_COLUMNS and 'day'.
+        """
+        bins = self._binned()
+        shape, first_day, days = bins['shape'], bins['first_day'], bins['days']
+        label_axis = CODED_COLUMNS.index('sentiment_label')
+        label_size = shape[label_axis]
+        
+        broad = np.count_nonzero(mask) * 2 >= len(mask)
+        selected = np.flatnonzero(self.live & ~mask if broad else mask)
+        weights = (self.scored[selected], self.score_filled[selected], self.engagement[selected])
+        tables = []
+        for keys, totals in ((self.cell, bins['cells_sums']), (self.day_key, bins['day_sums'])):
+            sums = self._sums(keys[selected], len(totals[0]), weights)
+            tables.append([total - part for total, part in zip(totals, sums)] if broad else sums)
+        cube = [table.reshape(shape) for table in tables[0]]
+        # The spare bin holds posts without a timestamp
+        by_day = [table[:-1].reshape(days, label_size) for table in tables[1]]
+        
+        result = {}
+        for axis, column in enumerate(CODED_COLUMNS):
+            others = tuple(other for other in range(len(shape)) if other not in (axis, label_axis))
+            if axis == label_axis:
+                tables = [np.diag(table.sum(axis=others)) for table in cube]
+            else:
+                tables = [table.sum(axis=others) for table in cube]
+                tables = [table.T for table in tables] if axis > label_axis else tables
+            result[column] = self._frame(column, np.array(self.values[column], dtype=object), tables)
+        result['day'] = self._frame('day', self._dates(first_day, days), by_day)
+        
+        # Earliest and latest posts are on the first and last days holding any
+        dated_days = np.flatnonzero(by_day[0].sum(axis=1))
+        if len(dated_days):
+            first, last = (rows[mask[rows]] for rows in (self._day_rows(first_day + day)
+                                                          for day in dated_days[[0, -1]]))
+            earliest, latest = int(self.epoch[first].min()), int(self.epoch[last].max())
+        else:
+            earliest = latest = None
+        count, score_count, score_sum, engagement_sum = (table.sum() for table in cube)
+        by_label = cube[0].sum(axis=tuple(other for other in range(len(shape)) if other != label_axis))
+        platform_axis = CODED_COLUMNS.index('platform')
+        by_platform = cube[0].sum(axis=tuple(other for other in range(len(shape)) if other != platform_axis))
+        result['summary'] = {
+            'total_posts': int(count),
+            'analyzed_posts': int(count - by_label[0]),
+            'avg_sentiment': float(score_sum / score_count) if score_count else None,
+            **{f'{name}_count': int(by_label[self.code('sentiment_label', name)])
+               if self.code('sentiment_label', name) >= 0 else 0 for name in LABELS},
+            'earliest_epoch': earliest,
+            'latest_epoch': latest,
+            'dated_posts': int(by_day[0].sum()),
+            'platforms_covered': int(np.count_nonzero(by_platform[1:])),
+            'avg_engagement': float(engagement_sum / count) if count else None,
+        }
+        return result
+    
+    def rollup(self, column, since_day):
+        """group_by() frame of every live post on UTC days from since_day on, near-duplicates included
+        
+        column is 'day' or 'platform'. Read straight from the sums refresh()
+        keeps current, so the cost depends on the number of days and values,
+        not of rows.
+        """
+        bins = self._binned()
+        shape, first_day, days = bins['shape'], bins['first_day'], bins['days']
+        label_size = shape[CODED_COLUMNS.index('sentiment_label')]
+        platform_size = shape[CODED_COLUMNS.index('platform')]
+        start = min(max(since_day - first_day, 0), days)
+        if column == 'day':
+            tables = [table[:-1].reshape(days, label_size)[start:] for table in bins['day_sums']]
+            return self._frame('day', self._dates(first_day, days)[start:], tables)
+        tables = [table[:-1].reshape(days, platform_size, label_size)[start:].sum(axis=0)
+                  for table in bins['day_platform_sums']]
+        return self._frame('platform', np.array(self.values['platform'], dtype=object), tables)
+    
+    def _dates(self, first_day, days):
+        """'YYYY-MM-DD' of days UTC days from first_day"""
+        return pd.to_datetime(np.arange(days) + first_day, unit='D').strftime('%Y-%m-%d')
+    
+    def _frame(self, column, values, tables):
+        """group_by() frame from (value, label) tables of the four aggregate() sums"""
+        post_count, score_count, score_sum, engagement_sum = (table.sum(axis=1) for table in tables)
+        frame = pd.DataFrame({
+            column: values,
+            'post_count': post_count.astype(np.int64),
+            'avg_sentiment': score_sum / np.where(score_count > 0, score_count, np.nan),
+            'avg_engagement': engagement_sum / np.where(post_count > 0, post_count, np.nan),
+        })
+        for label in LABELS:
+            code = self.code('sentiment_label', label)
+            frame[f'{label}_count'] = tables[0][:, code].astype(np.int64) if code >= 0 else 0
+        
+        frame = frame[frame['post_count'] > 0]
+        if column != 'day':
+            frame = frame[frame[column].notna()]
+        return frame.sort_values('post_count', ascending=False).reset_index(drop=True)
+    
+    def summary(self, mask):
+        """Headline metrics of the masked rows as a dict"""
+        return self.aggregate(mask)['summary']
+    
+    def group_by(self, mask, column):
+        """Per-value post count, average sentiment, label counts and average engagement
+        
+        column is one of CODED_COLUMNS, or 'day' for UTC days (posts without
+        a timestamp or a value left out). Returns a DataFrame sorted by
+        post_count, largest first. Use aggregate() when several are needed.
+        """
+        return self.aggregate(mask)[column]
+    
+    def top_ids(self, mask, by, limit):
+        """Ids of the masked rows with the highest 'engagement' or newest 'epoch', ties to newest id"""
+        values = self.columns[by][mask]
+        ids = self.ids[mask]
+        if len(values) > limit:
+            # Only rows at or above the limit-th largest value can make the cut
+            threshold = np.partition(values, len(values) - limit)[len(values) - limit]
+            keep = values >= threshold
+            values, ids = values[keep], ids[keep]
+        order = np.lexsort((ids, values))[::-1][:limit]
+        return ids[order].tolist()
@@ -0,0 +1,28 @@
+from timestamps import epoch_days_ago
+
+# Rolling windows start on the hour: the bound repeats for an hour, so results
+# cached on it stay reusable, and it stays a plain ts_epoch index range
+WINDOW_STEP_SECONDS = 3600
+
+# Smallest padded IN list; longer lists round up to the next power of two
+MIN_IN_LIST = 8
+
+def window_start(days):
+    """Epoch bound of a rolling "last N days" window, rounded down to WINDOW_STEP_SECONDS"""
+    return epoch_days_ago(days) // WINDOW_STEP_SECONDS * WINDOW_STEP_SECONDS
+
+def in_list(values):
+    """'(?, ?, ...)' placeholders and params for an IN list
+    
+    The list is padded to a power of two by repeating its last value, so
+    a handful of statement texts cover every length and sqlite3's
+    per-connection statement cache keeps hitting. An empty list gives '()',
+    which SQLite accepts and matches nothing.
+    """
+    values = list(values)
+    if not values:
+        return '()', []
+    size = MIN_IN_LIST
+    while size < len(values):
+        size *= 2
+    return f"({', '.join('?' * size)})", values + values[-1:] * (size - len(values))
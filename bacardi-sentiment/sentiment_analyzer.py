@@ -1,44 +1,209 @@
-from textblob import TextBlob
+from textblob.en import sentiment as pattern_sentiment
 from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+from lexicon_scorer import LexiconScorer
+import numpy as np
+import config
 import re
 
+# Bump whenever cleaning or scoring changes so cached scores are not reused
+SCORER_VERSION = "1"
+
+# URLs, mentions and hashtags in one compiled pass. Mentions and hashtags
+# stop where an embedded URL starts, so the result matches removing URLs first.
+CLEAN_PATTERN = re.compile(r'http\S+|[@#](?:(?!http\S)\w)+')
+
+# 'exact' runs TextBlob and VADER per post; 'lexicon' is the vectorized
+# LexiconScorer approximation for bulk rescoring; 'cascade' runs VADER and
+# approximates TextBlob, running TextBlob itself only when the combined score
+# lands near a label cut point
+ENGINES = ('exact', 'lexicon', 'cascade')
+
+# Bump an engine's tag when only that engine's scores change
+ENGINE_TAGS = {'lexicon': 'lexicon', 'cascade': 'cascade2'}
+
+def scorer_version_for(engine):
+    """Version tag of an engine; engines never share cached or stored scores"""
+    return SCORER_VERSION if engine == 'exact' else f"{SCORER_VERSION}-{ENGINE_TAGS[engine]}"
+
 class SentimentAnalyzer:
-    def __init__(self):
+    def __init__(self, cache=None, engine='exact'):
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown sentiment engine: {engine}")
         self.vader = SentimentIntensityAnalyzer()
+        self.cache = cache  # Optional SentimentCache
+        self.engine = engine
+        self.lexicon = LexiconScorer(self.vader) if engine in ('lexicon', 'cascade') else None
+        self.cascade_band = config.CASCADE_UNCERTAINTY_BAND
+        self.cascade_scored = 0
+        self.cascade_escalated = 0
+        self.scorer_version = scorer_version_for(engine)
+        self.thresholds = config.SENTIMENT_THRESHOLDS
+        self.weights = config.SENTIMENT_WEIGHTS
     
     def clean_text(self, text):
-        """Basic text cleaning"""
-        text = re.sub(r'http\S+', '', text)  # Remove URLs
-        text = re.sub(r'@\w+', '', text)     # Remove mentions
-        text = re.sub(r'#\w+', '', text)     # Remove hashtags
-        return text.strip()
+        """Basic text cleaning: drop URLs, mentions and hashtags"""
+        return CLEAN_PATTERN.sub('', text).strip()
+    
+    def classify(self, score):
+        """Map a combined score to a sentiment label"""
+        if score >= self.thresholds['positive']:
+            return 'positive'
+        elif score <= self.thresholds['negative']:
+            return 'negative'
+        return 'neutral'
+    
+    def combine(self, textblob_polarity, vader_compound):
+        """Combined score: weighted sum of both engines, or VADER alone for rows stored without TextBlob"""
+        if textblob_polarity is None:
+            return vader_compound
+        return self.weights['textblob'] * textblob_polarity + self.weights['vader'] * vader_compound
+    
+    def is_uncertain(self, combined_score):
+        """True when a combined score is too close to a label cut point to trust an approximation"""
+        return any(abs(combined_score - cut_point) < self.cascade_band
+                   for cut_point in self.thresholds.values())
+    
+    def score_components(self, cleaned_text):
+        """Return (textblob_polarity, vader_compound) for cleaned text"""
+        if self.engine != 'exact':
+            textblob_scores, vader_scores = self.score_many([cleaned_text])
+            return textblob_scores[0], vader_scores[0]
+        
+        # VADER analysis
+        vader_compound = self.vader.polarity_scores(cleaned_text)['compound']
+        
+        # TextBlob analysis (the pattern analyzer behind TextBlob.sentiment)
+        textblob_polarity = self.textblob_polarity(cleaned_text)
+        
+        return textblob_polarity, vader_compound
+    
+    def textblob_polarity(self, cleaned_text):
+        """TextBlob.sentiment polarity, tokenizing once and skipping TextBlob's wrapper objects"""
+        tokens = " ".join(pattern_sentiment.tokenizer(cleaned_text)).split()
+        assessments = pattern_sentiment.assessments((token.lower(), None) for token in tokens)
+        return sum(polarity for _, polarity, _, _ in assessments) / float(len(assessments) or 1)
+    
+    def cascade_stats(self):
+        """How many scored posts the cascade had to escalate to TextBlob"""
+        return {
+            'scored': self.cascade_scored,
+            'escalated': self.cascade_escalated,
+            'escalation_rate': self.cascade_escalated / self.cascade_scored if self.cascade_scored else 0.0
+        }
+    
+    def score_cascade(self, cleaned_texts):
+        """Exact VADER with LexiconScorer's TextBlob approximation, escalated to TextBlob near a cut point
+        
+        Every post gets a TextBlob term, so cascade scores are on the same
+        combined scale as the exact engine's.
+        """
+        textblob_scores = self.lexicon.score_batch(cleaned_texts)[0].tolist()
+        vader_scores = [self.vader.polarity_scores(cleaned_text)['compound'] for cleaned_text in cleaned_texts]
+        for i, cleaned_text in enumerate(cleaned_texts):
+            if self.is_uncertain(self.combine(textblob_scores[i], vader_scores[i])):
+                textblob_scores[i] = self.textblob_polarity(cleaned_text)
+                self.cascade_escalated += 1
+        self.cascade_scored += len(cleaned_texts)
+        return textblob_scores, vader_scores
+    
+    def score_many(self, cleaned_texts):
+        """Return lists of TextBlob and VADER scores for many cleaned texts"""
+        if self.engine == 'lexicon':
+            textblob_scores, vader_scores = self.lexicon.score_batch(cleaned_texts)
+            return textblob_scores.tolist(), vader_scores.tolist()
+        if self.engine == 'cascade':
+            return self.score_cascade(cleaned_texts)
+        
+        components = [self.score_components(cleaned_text) for cleaned_text in cleaned_texts]
+        return [c[0] for c in components], [c[1] for c in components]
     
     def analyze_sentiment(self, text):
         """Analyze sentiment using both TextBlob and VADER"""
         cleaned_text = self.clean_text(text)
         
-        # TextBlob analysis
-        blob = TextBlob(cleaned_text)
-        textblob_polarity = blob.sentiment.polarity
+        # Reuse cached components for text we have already scored
+        key = None
+        components = None
+        if self.cache is not None:
+            key = self.cache.make_key(cleaned_text, self.scorer_version)
+            components = self.cache.get(key)
         
-        # VADER analysis
-        vader_scores = self.vader.polarity_scores(cleaned_text)
+        if components is None:
+            components = self.score_components(cleaned_text)
+            if key is not None:
+                self.cache.put(key, components, self.scorer_version)
+        
+        textblob_polarity, vader_compound = components
         
-        # Combine scores (simple average)
-        combined_score = (textblob_polarity + vader_scores['compound']) / 2
+        # Combine scores (weighted by config.SENTIMENT_WEIGHTS)
+        combined_score = self.combine(textblob_polarity, vader_compound)
         
         # Classify sentiment
-        if combined_score >= 0.1:
-            sentiment_label = 'positive'
-        elif combined_score <= -0.1:
-            sentiment_label = 'negative'
-        else:
-            sentiment_label = 'neutral'
+        sentiment_label = self.classify(combined_score)
         
         return {
             'sentiment_score': combined_score,
             'sentiment_label': sentiment_label,
             'confidence': abs(combined_score),
             'textblob_score': textblob_polarity,
-            'vader_score': vader_scores['compound']
-        }
\ No newline at end of file
+            'vader_score': vader_compound,
+            'scorer_version': self.scorer_version
+        }
+    
+    def analyze_batch(self, texts):
+        """Analyze a list of texts in one call and return columnar numpy arrays"""
+        clean = self.clean_text
+        
+        count = len(texts)
+        cleaned_texts = [clean(text or '') for text in texts]
+        textblob_scores = np.empty(count, dtype=np.float64)
+        vader_scores = np.empty(count, dtype=np.float64)
+        
+        keys = None
+        cached = {}
+        if self.cache is not None:
+            make_key = self.cache.make_key
+            keys = [make_key(cleaned_text, self.scorer_version) for cleaned_text in cleaned_texts]
+            cached = self.cache.get_many(keys)
+        
+        # Positions of every uncached text, so each distinct text is scored once
+        pending = {}
+        for i, cleaned_text in enumerate(cleaned_texts):
+            components = cached.get(keys[i]) if keys is not None else None
+            if components is None:
+                pending.setdefault(cleaned_text, []).append(i)
+            else:
+                textblob_scores[i], vader_scores[i] = components
+        
+        if pending:
+            new_entries = {}
+            unique_texts = list(pending)
+            for cleaned_text, textblob_polarity, vader_compound in zip(unique_texts, *self.score_many(unique_texts)):
+                positions = pending[cleaned_text]
+                textblob_scores[positions] = textblob_polarity
+                vader_scores[positions] = vader_compound
+                if keys is not None:
+                    new_entries[keys[positions[0]]] = (textblob_polarity, vader_compound)
+            if new_entries:
+                self.cache.put_many(new_entries, self.scorer_version)
+        
+        combined_scores = self.weights['textblob'] * textblob_scores + self.weights['vader'] * vader_scores
+        labels = np.full(count, 'neutral', dtype=object)
+        labels[combined_scores >= self.thresholds['positive']] = 'positive'
+        labels[combined_scores <= self.thresholds['negative']] = 'negative'
+        
+        return {
+            'sentiment_score': combined_scores,
+            'sentiment_label': labels,
+            'confidence': np.abs(combined_scores),
+            'textblob_score': textblob_scores,
+            'vader_score': vader_scores
+        }
+    
+    def iter_batch_results(self, batch):
+        """Turn a columnar analyze_batch() result back into per-post dicts"""
+        for i in range(len(batch['sentiment_score'])):
+            result = {key: (values[i].item() if hasattr(values[i], 'item') else values[i])
+                      for key, values in batch.items()}
+            result['scorer_version'] = self.scorer_version
+            yield result
@@ -0,0 +1,129 @@
+import hashlib
+import os
+import sqlite3
+from collections import OrderedDict
+
+class SentimentCache:
+    """Persistent sentiment cache keyed by a hash of the cleaned text and scorer version.
+    
+    Lookups go through a bounded in-memory LRU first and then an SQLite
+    table stored next to the posts database. Only the per-engine components
+    are cached; labels are re-derived by the analyzer so threshold changes
+    never serve stale labels.
+    """
+    
+    def __init__(self, db_path="data/sentiment_cache.db", max_memory_entries=50000):
+        self.db_path = db_path
+        self.max_memory_entries = max_memory_entries
+        self.memory = OrderedDict()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        self.conn = sqlite3.connect(db_path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS sentiment_cache (
+                text_hash BLOB PRIMARY KEY,
+                scorer_version TEXT NOT NULL,
+                textblob_score REAL,
+                vader_score REAL,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            ) WITHOUT ROWID
+        ''')
+        self.conn.commit()
+    
+    @staticmethod
+    def make_key(cleaned_text, scorer_version):
+        """Stable digest of the scorer version and cleaned text"""
+        payload = f"{scorer_version}\0{cleaned_text}".encode('utf-8')
+        return hashlib.blake2b(payload, digest_size=16).digest()
+    
+    def _remember(self, key, components):
+        """Insert into the LRU, evicting the least recently used entry"""
+        self.memory[key] = components
+        self.memory.move_to_end(key)
+        if len(self.memory) > self.max_memory_entries:
+            self.memory.popitem(last=False)
+    
+    def get_many(self, keys):
+        """Return {key: (textblob_score, vader_score)} for every cached key"""
+        found = {}
+        missing = []
+        for key in keys:
+            components = self.memory.get(key)
+            if components is not None:
+                self.memory.move_to_end(key)
+                self.memory_hits += 1
+                found[key] = components
+            else:
+                missing.append(key)
+        
+        # Query SQLite in chunks to stay under the bound-parameter limit
+        unique_missing = list(dict.fromkeys(missing))
+        for start in range(0, len(unique_missing), 500):
+            chunk = unique_missing[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            cursor = self.conn.execute(
+                f"SELECT text_hash, textblob_score, vader_score FROM sentiment_cache "
+                f"WHERE text_hash IN ({placeholders})",
+                chunk
+            )
+            for text_hash, textblob_score, vader_score in cursor.fetchall():
+                components = (textblob_score, vader_score)
+                found[text_hash] = components
+                self._remember(text_hash, components)
+        
+        for key in missing:
+            if key in found:
+                self.disk_hits += 1
+            else:
+                self.misses += 1
+        return found
+    
+    def get(self, key):
+        """Return cached (textblob_score, vader_score) or None"""
+        return self.get_many([key]).get(key)
+    
+    def put_many(self, entries, scorer_version):
+        """Store {key: (textblob_score, vader_score)} entries"""
+        if not entries:
+            return
+        for key, components in entries.items():
+            self._remember(key, components)
+        self.conn.executemany(
+            '''INSERT OR REPLACE INTO sentiment_cache
+               (text_hash, scorer_version, textblob_score, vader_score)
+               VALUES (?, ?, ?, ?)''',
+            [(key, scorer_version, tb, vd) for key, (tb, vd) in entries.items()]
+        )
+        self.conn.commit()
+    
+    def put(self, key, components, scorer_version):
+        """Store a single (textblob_score, vader_score) entry"""
+        self.put_many({key: components}, scorer_version)
+    
+    def stats(self):
+        """Hit/miss counters for reporting savings"""
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        hits = self.memory_hits + self.disk_hits
+        return {
+            'memory_hits': self.memory_hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'hit_rate': hits / lookups if lookups else 0.0
+        }
+    
+    def purge_other_versions(self, scorer_version):
+        """Drop entries written by other scorer versions"""
+        cursor = self.conn.execute(
+            "DELETE FROM sentiment_cache WHERE scorer_version != ?", (scorer_version,)
+        )
+        self.conn.commit()
+        self.memory.clear()
+        return cursor.rowcount
+    
+    def close(self):
+        """Close the SQLite connection"""
+        self.conn.close()
@@ -21,12 +21,13 @@ def main():
     
     # Check Python version
     print(f"🐍 Python version: {sys.version}")
-    if sys.version_info < (3, 7):
-        print("❌ Python 3.7+ required")
+    if sys.version_info < (3, 8):
+        print("❌ Python 3.8+ required")
         return
     
-    # Install requirements
-    if not run_command("pip install -r requirements.txt", "Installing Python packages"):
+    # Install requirements (requirements.txt sits at the repository root)
+    requirements = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'requirements.txt')
+    if not run_command(f'pip install -r "{requirements}"', "Installing Python packages"):
         return
     
     # Install Playwright browsers
@@ -2,6 +2,7 @@ import subprocess
 import sys
 import os
 from database import DatabaseManager
+from timestamps import epoch_days_ago
 import config
 
 class SimpleDataCollector:
@@ -29,14 +30,7 @@ class SimpleDataCollector:
                     print(f"   📊 Reddit: {len(reddit_posts)} posts")
                 
                 # Save Reddit posts
-                saved_count = 0
-                for post in reddit_posts:
-                    try:
-                        if collector.save_post(post):
-                            saved_count += 1
-                    except Exception as e:
-                        print(f"Error saving Reddit post: {e}")
-                        continue
+                saved_count = collector.save_posts(reddit_posts)['inserted']
                 
                 # YouTube collection
                 youtube_posts = collector.collect_youtube_comments(keyword, limit=100)
@@ -45,13 +39,7 @@ class SimpleDataCollector:
                     print(f"   📺 YouTube: {len(youtube_posts)} comments")
                 
                 # Save YouTube posts
-                for post in youtube_posts:
-                    try:
-                        if collector.save_post(post):
-                            saved_count += 1
-                    except Exception as e:
-                        print(f"Error saving YouTube post: {e}")
-                        continue
+                saved_count += collector.save_posts(youtube_posts)['inserted']
                 
                 print(f"   💾 Saved: {saved_count} posts for '{keyword}'")
             
@@ -156,8 +144,7 @@ if __name__ == "__main__":
         print("=" * 30)
         
         try:
-            import sqlite3
-            conn = sqlite3.connect(self.db.db_path)
+            conn = self.db.get_connection()
             
             # Get basic stats
             cursor = conn.execute('''
@@ -190,14 +177,12 @@ if __name__ == "__main__":
             cursor = conn.execute('''
                 SELECT COUNT(*) as recent_count
                 FROM social_posts
-                WHERE timestamp >= datetime('now', '-1 day')
-            ''')
+                WHERE ts_epoch >= ?
+            ''', (epoch_days_ago(1),))
             
             recent = cursor.fetchone()[0]
             print(f"\n🕐 Posts in last 24h: {recent:,}")
             
-            conn.close()
-            
         except Exception as e:
             print(f"⚠️ Error generating summary: {e}")
         
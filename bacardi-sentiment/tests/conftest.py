@@ -0,0 +1,38 @@
+import os
+import random
+import sys
+import pytest
+
+# The modules are flat scripts in bacardi-sentiment/, imported by name
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import DatabaseManager
+
+# Vocabulary of make_post texts: eleven of forty words keep any two posts'
+# SimHash fingerprints far apart, so posts only link when a test means them to
+WORDS = ('smooth', 'sweet', 'harsh', 'great', 'awful', 'lovely', 'bland', 'mojito', 'daiquiri', 'cuba', 'libre',
+         'party', 'beach', 'bottle', 'price', 'summer', 'cocktail', 'lime', 'ginger', 'mint', 'ice', 'night',
+         'friends', 'bar', 'shot', 'spiced', 'gold', 'white', 'dark', 'aged', 'cheap', 'tasty', 'strong',
+         'weak', 'fresh', 'vanilla', 'coconut', 'pineapple', 'sugar', 'glass')
+
+@pytest.fixture
+def db(tmp_path):
+    """A migrated DatabaseManager on an empty temporary database"""
+    manager = DatabaseManager(str(tmp_path / 'data' / 'posts.db'))
+    yield manager
+    manager.close_all()
+
+def make_post(n, **fields):
+    """A collector-style post dict; fields override the defaults"""
+    post = {
+        'post_id': f'post{n}',
+        'platform': 'reddit',
+        'text': 'bacardi ' + ' '.join(random.Random(n).sample(WORDS, 11)),
+        'author': f'author{n}',
+        'timestamp': '2026-10-01T12:00:00',
+        'keyword_matched': 'bacardi',
+        'brand_category': 'primary',
+        'likes': n,
+    }
+    post.update(fields)
+    return post
@@ -0,0 +1,136 @@
+import os
+import pytest
+import analyze_sentiment
+import sentiment_analyzer
+from conftest import make_post
+
+class Interrupted(Exception):
+    pass
+
+@pytest.fixture
+def posts_db(db, monkeypatch):
+    """db holding 50 unanalyzed posts, used by analyze_sentiment's entry points"""
+    db.ingest_posts([make_post(n) for n in range(1, 51)])
+    monkeypatch.setattr(analyze_sentiment, 'DatabaseManager', lambda: db)
+    return db
+
+def analyzed_count(db):
+    return db.get_connection().execute(
+        "SELECT COUNT(*) FROM social_posts WHERE sentiment_label IS NOT NULL"
+    ).fetchone()[0]
+
+def latest_run(db):
+    return db.get_connection().execute(
+        "SELECT status, last_id, processed FROM analysis_runs ORDER BY run_id DESC LIMIT 1"
+    ).fetchone()
+
+def interrupt_after(monkeypatch, chunks):
+    """Make analyze_all_posts stop with Interrupted once it asks for a chunk past the first chunks"""
+    real = analyze_sentiment.iter_scored_chunks
+    
+    def iter_scored_chunks(*args, **kwargs):
+        for number, results in enumerate(real(*args, **kwargs)):
+            if number == chunks:
+                raise Interrupted()
+            yield results
+    monkeypatch.setattr(analyze_sentiment, 'iter_scored_chunks', iter_scored_chunks)
+
+def test_resume_continues_after_the_last_checkpoint(posts_db, monkeypatch):
+    # Chunks of 10 committed every 20 posts: the third chunk is written but never committed
+    interrupt_after(monkeypatch, 3)
+    with pytest.raises(Interrupted):
+        analyze_sentiment.analyze_all_posts(batch_size=10, use_cache=False, commit_every=20)
+    posts_db.get_connection().rollback()  # as when the process dies
+    assert analyzed_count(posts_db) == 20
+    status, last_id, processed = latest_run(posts_db)
+    assert (status, processed) == ('running', 20)
+    
+    monkeypatch.undo()
+    monkeypatch.setattr(analyze_sentiment, 'DatabaseManager', lambda: posts_db)
+    scored_ids = []
+    real_update = posts_db.update_post_sentiments
+    
+    def update_post_sentiments(results, conn=None):
+        scored_ids.extend(post['id'] for post, _ in results)
+        real_update(results, conn)
+    monkeypatch.setattr(posts_db, 'update_post_sentiments', update_post_sentiments)
+    
+    analyze_sentiment.analyze_all_posts(batch_size=10, use_cache=False, commit_every=20, resume=True)
+    assert len(scored_ids) == 30
+    assert min(scored_ids) > last_id
+    assert analyzed_count(posts_db) == 50
+    assert latest_run(posts_db)[0::2] == ('completed', 50)
+
+def test_resume_without_an_interrupted_run_starts_a_new_one(posts_db):
+    analyze_sentiment.analyze_all_posts(batch_size=10, use_cache=False, resume=True)
+    assert analyzed_count(posts_db) == 50
+    assert latest_run(posts_db)[0::2] == ('completed', 50)
+
+def test_retry_failed_rescores_only_failed_posts(posts_db, monkeypatch):
+    real_score_posts = analyze_sentiment.score_posts
+    failing = {'post3', 'post17'}
+    
+    def score_posts(analyzer, posts):
+        results = real_score_posts(analyzer, posts)
+        return [(post, {'error': 'boom'} if post['post_id'] in failing else sentiment)
+                for post, sentiment in results]
+    monkeypatch.setattr(analyze_sentiment, 'score_posts', score_posts)
+    analyze_sentiment.analyze_all_posts(batch_size=10, use_cache=False)
+    assert analyzed_count(posts_db) == 48
+    assert posts_db.count_failed_posts() == 2
+    
+    failing.discard('post3')
+    analyze_sentiment.retry_failed_posts(batch_size=10, use_cache=False)
+    assert analyzed_count(posts_db) == 49
+    assert [row[0] for row in posts_db.get_connection().execute(
+        "SELECT p.post_id FROM analysis_failures f JOIN social_posts p ON p.id = f.post_row_id"
+    )] == ['post17']
+
+def test_pool_matches_serial_in_order(posts_db):
+    posts = list(analyze_sentiment.iter_posts(posts_db.iter_unanalyzed_posts(7)))
+    options = {'use_cache': False}
+    serial = list(analyze_sentiment.iter_scored_chunks(posts, 7, 1, options))
+    
+    consumed = []
+    
+    def stream():
+        for post in posts:
+            consumed.append(post['id'])
+            yield post
+    pooled = []
+    analyzer_stats = {}
+    for results in analyze_sentiment.iter_scored_chunks(stream(), 7, 2, options, analyzer_stats):
+        # Two chunks per worker in flight at most, the input read no further ahead
+        assert len(consumed) <= (len(pooled) + 2 * 2) * 7
+        pooled.append(results)
+    
+    assert pooled == serial
+    assert [post['id'] for results in pooled for post, _ in results] == [post['id'] for post in posts]
+    assert 0 < len(analyzer_stats) <= 2 and os.getpid() not in analyzer_stats
+
+def test_rescore_stale_rewrites_only_older_scorer_versions(posts_db, monkeypatch):
+    conn = posts_db.get_connection()
+    
+    def versions():
+        return dict(conn.execute("SELECT post_id, scorer_version FROM social_posts"))
+    analyze_sentiment.analyze_all_posts(batch_size=10, use_cache=False)
+    assert set(versions().values()) == {sentiment_analyzer.SCORER_VERSION}
+    old_ids = [row[0] for row in conn.execute("SELECT id FROM social_posts ORDER BY id")]
+    
+    monkeypatch.setattr(sentiment_analyzer, 'SCORER_VERSION', 'bumped')
+    posts_db.ingest_posts([make_post(n) for n in range(51, 61)])
+    analyze_sentiment.analyze_all_posts(batch_size=10, use_cache=False)
+    
+    rescored_ids = []
+    real_update = posts_db.update_post_sentiments
+    
+    def update_post_sentiments(results, conn=None):
+        rescored_ids.extend(post['id'] for post, _ in results)
+        real_update(results, conn)
+    monkeypatch.setattr(posts_db, 'update_post_sentiments', update_post_sentiments)
+    
+    analyze_sentiment.rescore_stale_posts(batch_size=10, use_cache=False)
+    assert sorted(rescored_ids) == old_ids
+    assert set(versions().values()) == {'bumped'}
+    analyze_sentiment.rescore_stale_posts(batch_size=10, use_cache=False)
+    assert len(rescored_ids) == len(old_ids)
@@ -0,0 +1,79 @@
+import gc
+import sqlite3
+import threading
+import weakref
+import pytest
+
+def test_thread_reuses_its_connection(db):
+    assert db.get_connection() is db.get_connection()
+
+def test_connection_closes_when_its_thread_ends(db):
+    held = []
+    
+    def work():
+        db.get_connection().execute("SELECT 1")
+        held.append(weakref.ref(db._local.current))
+    
+    threads = [threading.Thread(target=work) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    gc.collect()
+    assert all(ref() is None for ref in held)
+
+def test_threads_get_their_own_connection_and_close_all_closes_each(db):
+    workers = 4
+    opened = threading.Barrier(workers + 1)
+    retired = threading.Event()
+    held, closed = [], []
+    
+    def work():
+        first = db.get_connection()
+        held.append(db._local.current)
+        opened.wait()
+        retired.wait()
+        db.get_connection()
+        try:
+            first.execute("SELECT 1")
+        except sqlite3.ProgrammingError:
+            closed.append(first)
+    
+    threads = [threading.Thread(target=work) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    db.get_connection()
+    own = db._local.current
+    opened.wait()
+    assert len({id(current.conn) for current in held + [own]}) == workers + 1
+    
+    db.close_all()
+    assert own.conn is None
+    retired.set()
+    for thread in threads:
+        thread.join()
+    assert all(current.conn is None for current in held)
+    assert len(closed) == workers
+
+def test_close_all_retires_every_thread(db):
+    conn = db.get_connection()
+    ready, retired = threading.Event(), threading.Event()
+    reopened = []
+    
+    def work():
+        first = db.get_connection()
+        ready.set()
+        retired.wait()
+        reopened.append(db.get_connection() is not first)
+    
+    thread = threading.Thread(target=work)
+    thread.start()
+    ready.wait()
+    db.close_all()
+    retired.set()
+    thread.join()
+    
+    with pytest.raises(sqlite3.ProgrammingError):
+        conn.execute("SELECT 1")
+    assert reopened == [True]
+    assert db.get_connection() is not conn
@@ -0,0 +1,48 @@
+from conftest import make_post
+from timestamps import to_epoch
+
+def stored_ids(db):
+    return [row[0] for row in db.get_connection().execute("SELECT post_id FROM social_posts ORDER BY id")]
+
+def test_counts_across_batches(db):
+    db.ingest_posts([make_post(1)])
+    posts = [
+        make_post(1),                    # already stored
+        make_post(2),
+        make_post(3),
+        make_post(2),                    # repeated in the batch
+        make_post(4, text=None),         # no text
+        make_post(5, platform=''),       # no platform
+        make_post(6),
+        make_post(7),
+    ]
+    counts = db.ingest_posts(iter(posts), batch_size=3)
+    assert counts == {'inserted': 4, 'ignored': 2, 'failed': 2, 'linked': 0}
+    assert stored_ids(db) == ['post1', 'post2', 'post3', 'post6', 'post7']
+
+def test_rejected_row_falls_back_to_row_by_row(db):
+    posts = [make_post(1), make_post(2, subreddit=['not', 'bindable']), make_post(3)]
+    counts = db.ingest_posts(posts)
+    assert counts == {'inserted': 2, 'ignored': 0, 'failed': 1, 'linked': 0}
+    assert stored_ids(db) == ['post1', 'post3']
+    
+    conn = db.get_connection()
+    indexed = {row[0] for row in conn.execute("SELECT post_id FROM simhash_bands")}
+    mentioned = {row[0] for row in conn.execute("SELECT post_id FROM keyword_mentions")}
+    assert indexed == mentioned == {'post1', 'post3'}
+
+def test_derived_columns_are_filled(db):
+    db.ingest_posts([make_post(1, timestamp='2026-10-01T12:00:00+02:00', likes=10, comments=2)])
+    epoch, day, engagement, mentions = db.get_connection().execute('''
+        SELECT ts_epoch, ts_day, engagement_score,
+               (SELECT COUNT(*) FROM keyword_mentions WHERE keyword = 'bacardi')
+        FROM social_posts
+    ''').fetchone()
+    assert epoch == to_epoch('2026-10-01T10:00:00Z')
+    assert day == epoch // 86400
+    assert engagement == db._calculate_engagement_score(make_post(1, likes=10, comments=2))
+    assert mentions == 1
+
+def test_posts_without_ids_are_all_kept(db):
+    counts = db.ingest_posts([make_post(1, post_id=None), make_post(2, post_id=None)])
+    assert counts['inserted'] == 2
@@ -0,0 +1,36 @@
+from datetime import datetime, timezone
+
+from conftest import make_post
+from keyword_mentions import KeywordMentionIndex
+
+TEXT = 'just tried bacardi with ginger beer and fresh lime and it was honestly great'
+
+def recent_post(n, **fields):
+    return make_post(n, timestamp=datetime.now(timezone.utc).isoformat(timespec='seconds'), **fields)
+
+def bacardi_mentions(db):
+    share = db.get_share_of_voice(days=7, keywords=['bacardi'])
+    return int(share['mentions'].iloc[0]) if len(share) else 0
+
+def test_find_matches_whole_words_and_contained_keywords():
+    index = KeywordMentionIndex(['bacardi', 'bacardi gold', 'havana club'])
+    assert index.find('Bacardi Gold beats Havana Club') == ['bacardi', 'bacardi gold', 'havana club']
+    assert index.find('bacardis and havana clubs') == []
+
+def test_share_of_voice_counts_a_near_duplicate_once(db):
+    counts = db.ingest_posts([recent_post(1, text=TEXT),
+                              recent_post(2, text=f'{TEXT} https://example.com/repost')])
+    assert counts['inserted'] == 2
+    assert counts['linked'] == 1
+    assert bacardi_mentions(db) == 1
+
+def test_share_of_voice_follows_duplicate_links(db):
+    db.ingest_posts([recent_post(1, text=TEXT), recent_post(2, text=f'{TEXT} https://example.com/repost')])
+    conn = db.get_connection()
+    conn.execute("UPDATE social_posts SET canonical_post_id = NULL")
+    conn.commit()
+    assert bacardi_mentions(db) == 2
+    
+    conn.execute("UPDATE social_posts SET canonical_post_id = 'post1' WHERE post_id = 'post2'")
+    conn.commit()
+    assert bacardi_mentions(db) == 1
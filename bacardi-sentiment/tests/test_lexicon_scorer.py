@@ -0,0 +1,55 @@
+import random
+import numpy as np
+import pytest
+from textblob.en import sentiment as pattern_sentiment
+from vaderSentiment.vaderSentiment import BOOSTER_DICT, NEGATE
+from benchmark_sentiment import make_corpus
+from lexicon_scorer import RULE_WORDS
+from sentiment_analyzer import SentimentAnalyzer
+
+@pytest.fixture(scope='module')
+def engines():
+    return SentimentAnalyzer(), SentimentAnalyzer(engine='lexicon')
+
+def scores(analyzer, texts):
+    """(textblob, vader, combined) arrays for raw texts"""
+    textblob, vader = analyzer.score_many([analyzer.clean_text(text) for text in texts])
+    combined = [analyzer.combine(tb, vd) for tb, vd in zip(textblob, vader)]
+    return np.array(textblob), np.array(vader), np.array(combined)
+
+def word_salad(analyzer, posts, seed=0):
+    """Lexicon-dense random posts with caps and trailing emphasis, the lexicon engine's worst case"""
+    words = sorted(word for word in (set(analyzer.vader.lexicon) | set(pattern_sentiment) | set(BOOSTER_DICT)
+                                     | set(NEGATE) | set(RULE_WORDS)) if word.isalpha())
+    rng = random.Random(seed)
+    texts = []
+    for _ in range(posts):
+        tokens = [rng.choice(words) for _ in range(rng.randint(4, 14))]
+        tokens = [token.upper() if rng.random() < 0.05 else token for token in tokens]
+        texts.append(' '.join(tokens) + rng.choice(['', '!', '!!', '?']))
+    return texts
+
+def test_identical_on_the_benchmark_corpus(engines):
+    exact, lexicon = engines
+    texts = [post['text'] for post in make_corpus(2000)]
+    for expected, actual in zip(scores(exact, texts), scores(lexicon, texts)):
+        np.testing.assert_allclose(actual, expected, atol=1e-12)
+
+def test_word_salad_stays_within_documented_tolerance(engines):
+    exact, lexicon = engines
+    texts = word_salad(exact, 1000)
+    _, exact_vader, exact_combined = scores(exact, texts)
+    _, lexicon_vader, lexicon_combined = scores(lexicon, texts)
+    
+    assert np.abs(lexicon_combined - exact_combined).mean() <= 0.05
+    same_label = [exact.classify(a) == lexicon.classify(b) for a, b in zip(exact_combined, lexicon_combined)]
+    assert np.mean(same_label) >= 0.95
+    assert np.abs(lexicon_vader - exact_vader).mean() <= 0.001
+
+def test_batch_matches_single_posts(engines):
+    _, lexicon = engines
+    texts = ['Bacardi is GREAT!!', 'not a good rum', '', 'kind of bad but really tasty']
+    textblob, vader = lexicon.lexicon.score_batch(texts)
+    for i, text in enumerate(texts):
+        single_textblob, single_vader = lexicon.lexicon.score_batch([text])
+        assert (textblob[i], vader[i]) == (single_textblob[0], single_vader[0])
@@ -0,0 +1,227 @@
+import itertools
+import os
+import sqlite3
+import subprocess
+import sys
+import migrations
+from conftest import make_post
+from post_snapshot import PostSnapshot
+from test_post_snapshot import assert_matches_sql
+from timestamps import to_epoch
+
+MODULE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# social_posts and keyword_mentions as the first release created them
+BASELINE_SCHEMA = '''
+    CREATE TABLE social_posts (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        platform TEXT NOT NULL,
+        post_id TEXT UNIQUE,
+        text TEXT NOT NULL,
+        author TEXT,
+        timestamp DATETIME,
+        sentiment_score REAL,
+        sentiment_label TEXT,
+        confidence_score REAL,
+        engagement_score REAL,
+        likes INTEGER DEFAULT 0,
+        retweets INTEGER DEFAULT 0,
+        comments INTEGER DEFAULT 0,
+        upvotes INTEGER DEFAULT 0,
+        followers INTEGER DEFAULT 0,
+        url TEXT,
+        keyword_matched TEXT,
+        brand_category TEXT,
+        subreddit TEXT,
+        video_id TEXT,
+        verified BOOLEAN DEFAULT 0,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE TABLE keyword_mentions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        keyword TEXT,
+        post_id TEXT,
+        platform TEXT,
+        timestamp DATETIME,
+        sentiment_score REAL,
+        FOREIGN KEY (post_id) REFERENCES social_posts (post_id)
+    );
+'''
+
+TRIGGERS = {'posts_fts_insert', 'posts_fts_update', 'posts_fts_delete', 'keyword_mentions_update',
+            'keyword_mentions_delete', 'post_changes_update', 'post_changes_delete'}
+
+MENTIONS_QUERY = "SELECT keyword, post_id, is_duplicate FROM keyword_mentions ORDER BY keyword, post_id"
+
+# Every post mentions 'bacardi'; its mention row copies the post's sentiment and duplicate flag
+MENTIONS_SYNC_QUERY = {
+    'keyword_mentions': "SELECT post_id, sentiment_score, is_duplicate FROM keyword_mentions WHERE keyword = 'bacardi'",
+    'social_posts': "SELECT post_id, sentiment_score, canonical_post_id IS NOT NULL FROM social_posts",
+}
+
+def schema(conn):
+    return sorted(conn.execute("SELECT type, name, sql FROM sqlite_master WHERE name NOT LIKE 'sqlite_%'"))
+
+def assert_search_consistent(conn):
+    """posts_fts matches its content table, and finds the same posts as LIKE"""
+    conn.execute("INSERT INTO posts_fts (posts_fts, rank) VALUES ('integrity-check', 1)")
+    for word in ('bacardi', 'mojito', 'changed'):
+        matched = {row[0] for row in conn.execute("SELECT rowid FROM posts_fts WHERE posts_fts MATCH ?", (word,))}
+        expected = {row[0] for row in conn.execute(
+            "SELECT id FROM social_posts WHERE ' ' || lower(text) || ' ' LIKE ?", (f'% {word} %',)
+        )}
+        assert matched == expected
+
+def test_migrate_is_idempotent(db):
+    conn = db.get_connection()
+    posts = [make_post(n) for n in range(1, 21)]
+    db.ingest_posts(posts + [make_post(21, text=posts[0]['text'] + ' https://example.com/repost')])
+    assert migrations.get_version(conn) == migrations.SCHEMA_VERSION
+    before = schema(conn)
+    mentions = conn.execute(MENTIONS_QUERY).fetchall()
+    assert ('bacardi', 'post21', 1) in mentions
+    
+    assert migrations.migrate(conn) == []
+    
+    # A step interrupted before its version bump runs again
+    for _, step in migrations.MIGRATIONS:
+        step(conn)
+    assert schema(conn) == before
+    assert conn.execute(MENTIONS_QUERY).fetchall() == mentions
+    assert_search_consistent(conn)
+
+def test_upgrades_a_baseline_database(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / 'old.db'))
+    conn.executescript(BASELINE_SCHEMA)
+    conn.execute('''
+        INSERT INTO social_posts (platform, post_id, text, timestamp)
+        VALUES ('reddit', 'old1', 'an old bacardi mojito post', '2025-03-01 09:30:00')
+    ''')
+    conn.commit()
+    
+    applied = migrations.migrate(conn)
+    assert [number for number, _ in applied] == [number for number, _ in migrations.MIGRATIONS]
+    
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(social_posts)")}
+    conn.execute(migrations.SOCIAL_POSTS_TABLE.format(name='reference'))
+    assert columns == {row[1] for row in conn.execute("PRAGMA table_info(reference)")}
+    
+    assert conn.execute("SELECT ts_epoch FROM social_posts").fetchone()[0] == to_epoch('2025-03-01 09:30:00')
+    assert conn.execute("SELECT keyword FROM keyword_mentions WHERE post_id = 'old1' ORDER BY 1").fetchall() == [
+        ('bacardi',), ('mojito',)
+    ]
+    assert TRIGGERS <= {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")}
+    assert_search_consistent(conn)
+
+def test_triggers_keep_derived_tables_in_step(db):
+    db.ingest_posts([make_post(n) for n in range(1, 11)])
+    conn = db.get_connection()
+    conn.execute("UPDATE social_posts SET text = 'changed bacardi text' WHERE post_id = 'post2'")
+    conn.execute("UPDATE social_posts SET sentiment_score = 0.5, canonical_post_id = 'post1' WHERE post_id = 'post3'")
+    conn.execute("DELETE FROM social_posts WHERE post_id = 'post4'")
+    conn.commit()
+    
+    assert_search_consistent(conn)
+    mentions = dict(conn.execute('''
+        SELECT post_id, sentiment_score || '/' || is_duplicate FROM keyword_mentions WHERE keyword = 'bacardi'
+    '''))
+    assert 'post4' not in mentions
+    assert mentions['post3'] == '0.5/1'
+    
+    # The snapshot holds no text, so only post3's update and post4's delete are logged
+    changed = {row[0] for row in conn.execute('''
+        SELECT post_id FROM social_posts p JOIN post_changes c ON c.post_row_id = p.id
+    ''')}
+    assert changed == {'post3'}
+    assert conn.execute("SELECT COUNT(*) FROM post_changes").fetchone()[0] == 2
+
+def managed_indexes(conn):
+    """Definitions of social_posts' indexes, under the name each alternates from"""
+    return {' '.join(sql.replace(name, name.replace('_rebuilt', ''), 1).replace('"', '').split())
+            for name, sql in conn.execute("SELECT name, sql FROM sqlite_master WHERE type = 'index' "
+                                          "AND tbl_name = 'social_posts' AND sql IS NOT NULL")}
+
+def test_rebuild_social_posts_keeps_indexes_and_triggers(db):
+    db.ingest_posts([make_post(n) for n in range(1, 11)])
+    conn = db.get_connection()
+    indexes = managed_indexes(conn)
+    
+    for _ in range(2):
+        assert migrations.rebuild_social_posts(conn, batch_size=3) == 10
+        assert managed_indexes(conn) == indexes
+        assert TRIGGERS <= {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")}
+    
+    db.ingest_posts([make_post(11)])
+    conn.execute("UPDATE social_posts SET text = 'changed bacardi text' WHERE post_id = 'post5'")
+    conn.commit()
+    assert_search_consistent(conn)
+
+def test_writes_during_a_rebuild_reach_the_rebuilt_table(db):
+    db.ingest_posts([make_post(n) for n in range(1, 21)])
+    snapshot = PostSnapshot()
+    snapshot.refresh(db.get_connection())
+    
+    # Another connection writes before each copy batch, index build and the swap
+    rival = db.get_connection()
+    calls = itertools.count(1)
+    
+    def write():
+        n = next(calls)
+        if n % 4 == 0:
+            rival.execute("DELETE FROM social_posts WHERE post_id = ?", (f'post{n}',))
+        elif n % 4 == 1:
+            rival.execute("UPDATE social_posts SET sentiment_score = ?, sentiment_label = 'negative' "
+                          "WHERE post_id = ?", (-n / 100, f'post{n}'))
+        elif n % 4 == 2:
+            db.ingest_posts([make_post(100 + n)])
+        else:
+            rival.execute("UPDATE social_posts SET text = 'changed bacardi text', canonical_post_id = 'post1' "
+                          "WHERE post_id = ?", (f'post{n}',))
+        rival.commit()
+    
+    class WritingConnection(sqlite3.Connection):
+        def execute(self, sql, *params):
+            if sql.startswith(('BEGIN IMMEDIATE', 'INSERT OR REPLACE INTO social_posts_shadow')):
+                write()
+            return super().execute(sql, *params)
+    
+    migrations.rebuild_social_posts(sqlite3.connect(db.db_path, factory=WritingConnection), batch_size=3)
+    assert next(calls) > 10
+    
+    conn = db.get_connection()
+    assert snapshot.refresh(conn) > 0
+    assert len(snapshot) == conn.execute("SELECT COUNT(*) FROM social_posts").fetchone()[0]
+    assert_matches_sql(snapshot, conn)
+    assert_search_consistent(conn)
+    assert sorted(conn.execute(MENTIONS_SYNC_QUERY['keyword_mentions'])) == sorted(
+        conn.execute(MENTIONS_SYNC_QUERY['social_posts']))
+
+def test_column_added_by_another_process_is_skipped(tmp_path):
+    path = str(tmp_path / 'old.db')
+    rival = sqlite3.connect(path)
+    rival.executescript(BASELINE_SCHEMA)
+    
+    class RacingConnection(sqlite3.Connection):
+        """Lets the rival add a column between this connection's PRAGMA read and its ALTER"""
+        def execute(self, sql, *params):
+            rows = super().execute(sql, *params).fetchall()
+            if sql.startswith('PRAGMA table_info(social_posts)'):
+                rival.execute("ALTER TABLE social_posts ADD COLUMN scorer_version TEXT")
+                rival.commit()
+            return rows
+    
+    migrations.create_base_tables(sqlite3.connect(path, factory=RacingConnection))
+    columns = [row[1] for row in rival.execute("PRAGMA table_info(social_posts)")]
+    assert columns.count('scorer_version') == 1
+    assert 'canonical_post_id' in columns
+
+def test_processes_starting_together_all_migrate(tmp_path):
+    path = str(tmp_path / 'data' / 'posts.db')
+    code = "import sys; from database import DatabaseManager; DatabaseManager(sys.argv[1]).close_all()"
+    processes = [subprocess.Popen([sys.executable, '-c', code, path], cwd=MODULE_DIR, stdout=subprocess.DEVNULL,
+                                  stderr=subprocess.PIPE, text=True) for _ in range(3)]
+    errors = [process.communicate()[1] for process in processes]
+    assert [process.returncode for process in processes] == [0, 0, 0], errors
+    conn = sqlite3.connect(path)
+    assert migrations.get_version(conn) == migrations.SCHEMA_VERSION
+    assert TRIGGERS <= {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")}
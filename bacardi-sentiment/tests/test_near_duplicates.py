@@ -0,0 +1,97 @@
+import random
+from conftest import make_post
+from near_duplicates import (
+    MAX_DISTANCE, MIN_TOKENS, NearDuplicateIndex, from_signed, hamming_distance, simhash, simhash_many, to_signed
+)
+
+TEXT = 'just tried bacardi with ginger beer and fresh lime and it was honestly great'
+
+def flip(fingerprint, bits):
+    for bit in bits:
+        fingerprint ^= 1 << bit
+    return fingerprint
+
+def test_short_texts_have_no_fingerprint():
+    short = ' '.join(['rum'] * (MIN_TOKENS - 1))
+    assert simhash(short) is None
+    assert simhash(' '.join(f'word{n}' for n in range(MIN_TOKENS))) is not None
+
+def test_urls_and_case_do_not_change_the_fingerprint():
+    assert simhash(TEXT) == simhash(f'{TEXT.upper()} https://example.com/a?b=1')
+
+def test_signed_storage_round_trips():
+    for fingerprint in (0, 1, (1 << 63) - 1, 1 << 63, (1 << 64) - 1):
+        assert -(1 << 63) <= to_signed(fingerprint) < 1 << 63
+        assert from_signed(to_signed(fingerprint)) == fingerprint
+
+def test_closest_match_is_found_up_to_max_distance(db):
+    index = NearDuplicateIndex()
+    cursor = db.get_connection().cursor()
+    rng = random.Random(0)
+    for _ in range(200):
+        fingerprint = rng.getrandbits(64)
+        near = flip(fingerprint, rng.sample(range(64), MAX_DISTANCE))
+        far = flip(fingerprint, rng.sample(range(64), MAX_DISTANCE + 1))
+        assert hamming_distance(fingerprint, near) == MAX_DISTANCE
+        
+        candidates = index.load_candidates(cursor, [fingerprint, near, far])
+        assert candidates.find_closest(1) is None  # not accepted as canonical yet
+        candidates.add_candidate(0, {'post_id': 'canonical'})
+        assert candidates.find_closest(1) == {'post_id': 'canonical'}
+        assert candidates.find_closest(2) is None
+
+def test_closest_of_several_candidates_wins(db):
+    index = NearDuplicateIndex()
+    fingerprint = random.Random(1).getrandbits(64)
+    candidates = index.load_candidates(db.get_connection().cursor(),
+                                       [flip(fingerprint, [0, 20]), flip(fingerprint, [40]), fingerprint, None])
+    candidates.add_candidate(0, {'post_id': 'two bits away'})
+    candidates.add_candidate(1, {'post_id': 'one bit away'})
+    assert candidates.find_closest(2) == {'post_id': 'one bit away'}
+    assert candidates.find_closest(3) is None
+
+def test_indexed_posts_are_found(db):
+    index = NearDuplicateIndex()
+    cursor = db.get_connection().cursor()
+    fingerprint = random.Random(2).getrandbits(64)
+    for n, bits in ((1, [5, 9]), (2, [33])):
+        db.ingest_posts([make_post(n)])
+        cursor.execute("UPDATE social_posts SET simhash = ? WHERE post_id = ?",
+                       (to_signed(flip(fingerprint, bits)), f'post{n}'))
+        cursor.execute("DELETE FROM simhash_bands WHERE post_id = ?", (f'post{n}',))
+        index.add(cursor, f'post{n}', flip(fingerprint, bits))
+    candidates = index.load_candidates(cursor, [fingerprint, flip(fingerprint, [1, 2, 3, 4])], ['author'])
+    assert candidates.find_closest(0) == {'post_id': 'post2', 'author': 'author2'}
+    assert candidates.find_closest(1) is None
+
+def test_batch_fingerprints_match_single_texts():
+    rng = random.Random(3)
+    words = TEXT.split() + ['Añejo', 'https://example.com/x', 'rum', 'rum']
+    texts = [' '.join(rng.choice(words) for _ in range(rng.randint(0, 20))) for _ in range(300)] + [None, '']
+    assert simhash_many(texts) == [simhash(text) for text in texts]
+    assert simhash_many([]) == []
+
+def test_ingest_links_reposts_and_copies_sentiment(db):
+    counts = db.ingest_posts([
+        make_post(1, text=TEXT, sentiment_score=0.7, sentiment_label='positive'),
+        make_post(2, text=f'{TEXT} https://example.com/repost'),
+        make_post(3),
+    ])
+    assert counts == {'inserted': 3, 'ignored': 0, 'failed': 0, 'linked': 1}
+    rows = dict((row[0], row[1:]) for row in db.get_connection().execute(
+        "SELECT post_id, canonical_post_id, sentiment_label FROM social_posts"
+    ))
+    assert rows == {'post1': (None, 'positive'), 'post2': ('post1', 'positive'), 'post3': (None, None)}
+    
+    # Only canonical posts are indexed
+    indexed = {row[0] for row in db.get_connection().execute("SELECT post_id FROM simhash_bands")}
+    assert indexed == {'post1', 'post3'}
+
+def test_ingest_links_to_posts_stored_earlier(db):
+    db.ingest_posts([make_post(1, text=TEXT)])
+    counts = db.ingest_posts([make_post(2, text=f'{TEXT.capitalize()}!!')])
+    assert counts['linked'] == 1
+
+def test_ingest_never_links_short_posts(db):
+    counts = db.ingest_posts([make_post(1, text='love this rum'), make_post(2, text='love this rum')])
+    assert counts == {'inserted': 2, 'ignored': 0, 'failed': 0, 'linked': 0}
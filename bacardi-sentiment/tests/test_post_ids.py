@@ -0,0 +1,50 @@
+import os
+import subprocess
+import sys
+from conftest import make_post
+from post_ids import LEGACY_SCRAPED_ID, stable_post_id
+
+MODULE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def test_same_post_gets_the_same_id():
+    post_id = stable_post_id('trustpilot', 'Great  rum,\nsmooth finish', 'https://example.com/r')
+    assert post_id == stable_post_id('trustpilot', ' great rum, smooth finish ', 'https://example.com/r')
+    assert post_id.startswith('trustpilot_')
+    assert LEGACY_SCRAPED_ID.match(post_id) is None
+
+def test_source_text_and_url_all_matter():
+    post_id = stable_post_id('news', 'bacardi launches a new rum', 'https://example.com/a')
+    assert post_id != stable_post_id('twitter', 'bacardi launches a new rum', 'https://example.com/a')
+    assert post_id != stable_post_id('news', 'bacardi launches a new gin', 'https://example.com/a')
+    assert post_id != stable_post_id('news', 'bacardi launches a new rum', 'https://example.com/b')
+
+def test_id_is_stable_across_processes():
+    # hash() ids changed with every interpreter's salt; these must not
+    code = "from post_ids import stable_post_id; print(stable_post_id('news', 'bacardi rum', 'u'))"
+    ids = {subprocess.run([sys.executable, '-c', code], cwd=MODULE_DIR, capture_output=True, text=True,
+                          env=dict(os.environ, PYTHONHASHSEED=seed), check=True).stdout.strip()
+           for seed in ('1', '2')}
+    assert ids == {stable_post_id('news', 'bacardi rum', 'u')}
+
+def test_legacy_pattern_matches_only_scraper_hash_ids():
+    for post_id in ('twitter_-8312904612', 'news_42', 'google_-1', 'instagram_77'):
+        assert LEGACY_SCRAPED_ID.match(post_id)
+    for post_id in ('t3_abc123', 'twitter_1a2b', 'reddit_-12', 'news_-'):
+        assert LEGACY_SCRAPED_ID.match(post_id) is None
+
+def test_collapse_moves_legacy_rows_onto_stable_ids(db):
+    text, url = 'bacardi launches a new spiced rum for the summer season in stores now', 'https://example.com/a'
+    stable = stable_post_id('news', text, url)
+    db.ingest_posts([
+        make_post(1, post_id='news_-111', platform='news', text=text, url=url),
+        make_post(2, post_id='news_222', platform='news', text=text, url=url),
+        make_post(3, post_id='t3_kept', platform='reddit'),
+    ])
+    conn = db.get_connection()
+    conn.execute("UPDATE social_posts SET canonical_post_id = 'news_222' WHERE post_id = 't3_kept'")
+    conn.commit()
+    
+    assert db.collapse_duplicate_posts() == (1, 1)
+    rows = conn.execute("SELECT post_id, canonical_post_id FROM social_posts ORDER BY id").fetchall()
+    assert rows == [(stable, None), ('t3_kept', stable)]
+    assert db.collapse_duplicate_posts() == (0, 0)
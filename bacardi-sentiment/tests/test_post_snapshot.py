@@ -0,0 +1,218 @@
+import random
+import numpy as np
+import pandas as pd
+import pytest
+import database
+from conftest import make_post
+from post_snapshot import CODED_COLUMNS, LABELS, PostSnapshot
+from timestamps import to_epoch
+
+PLATFORMS = ('reddit', 'twitter', 'youtube', 'news')
+BRANDS = ('primary', 'competitor', 'general', None)
+KEYWORDS = ('bacardi', 'mojito', 'havana club', None)
+
+# PostSnapshot.mask() keyword arguments and the same filter in SQL
+FILTERS = [
+    ({'include_duplicates': True}, '1'),
+    ({}, 'canonical_post_id IS NULL'),
+    ({'platform': 'youtube'}, "platform = 'youtube' AND canonical_post_id IS NULL"),
+    ({'brand_category': 'primary', 'sentiment_label': 'positive', 'min_engagement': 5, 'verified_only': True},
+     "brand_category = 'primary' AND sentiment_label = 'positive' AND engagement_score >= 5 AND verified "
+     "AND canonical_post_id IS NULL"),
+    ({'platform': 'myspace'}, "platform = 'myspace' AND canonical_post_id IS NULL"),
+]
+
+GROUP_KEYS = {column: column for column in CODED_COLUMNS}
+GROUP_KEYS['day'] = "strftime('%Y-%m-%d', ts_epoch, 'unixepoch')"
+
+def random_posts(first, count, rng):
+    """Posts spread over platforms, categories and ten days, some without a timestamp"""
+    return [make_post(
+        n,
+        platform=rng.choice(PLATFORMS),
+        brand_category=rng.choice(BRANDS),
+        keyword_matched=rng.choice(KEYWORDS),
+        timestamp=None if rng.random() < 0.1 else f'2026-09-{rng.randint(10, 19)}T{rng.randint(0, 23):02d}:00:00Z',
+        likes=rng.randint(0, 50),
+        upvotes=rng.randint(0, 50),
+    ) for n in range(first, first + count)]
+
+def score_posts(conn, rng, where):
+    for row_id, in conn.execute(f"SELECT id FROM social_posts WHERE {where}").fetchall():
+        score = rng.uniform(-1, 1)
+        label = 'positive' if score > 0.1 else 'negative' if score < -0.1 else 'neutral'
+        conn.execute("UPDATE social_posts SET sentiment_score = ?, sentiment_label = ? WHERE id = ?",
+                     (score, label, row_id))
+
+def expected_group(conn, column, where):
+    key = GROUP_KEYS[column]
+    frame = pd.read_sql_query(f'''
+        SELECT {key} AS "{column}", COUNT(*) AS post_count, AVG(sentiment_score) AS avg_sentiment,
+               AVG(COALESCE(engagement_score, 0)) AS avg_engagement,
+               {', '.join(f"TOTAL(sentiment_label = '{label}') AS {label}_count" for label in LABELS)}
+        FROM social_posts WHERE {where} AND {key} IS NOT NULL GROUP BY 1
+    ''', conn).astype({'avg_sentiment': float})
+    return frame.sort_values(column).reset_index(drop=True)
+
+def expected_summary(conn, where):
+    row = conn.execute(f'''
+        SELECT COUNT(*), COUNT(sentiment_label), AVG(sentiment_score),
+               {', '.join(f"TOTAL(sentiment_label = '{label}')" for label in LABELS)},
+               MIN(ts_epoch), MAX(ts_epoch), COUNT(ts_epoch), COUNT(DISTINCT platform),
+               AVG(COALESCE(engagement_score, 0))
+        FROM social_posts WHERE {where}
+    ''').fetchone()
+    names = ['total_posts', 'analyzed_posts', 'avg_sentiment'] + [f'{label}_count' for label in LABELS] + [
+        'earliest_epoch', 'latest_epoch', 'dated_posts', 'platforms_covered', 'avg_engagement']
+    return dict(zip(names, row))
+
+def assert_matches_sql(snapshot, conn):
+    for kwargs, where in FILTERS:
+        aggregates = snapshot.aggregate(snapshot.mask(**kwargs))
+        assert aggregates['summary'] == pytest.approx(expected_summary(conn, where))
+        for column in GROUP_KEYS:
+            frame = aggregates[column]
+            assert list(frame['post_count']) == sorted(frame['post_count'], reverse=True)
+            pd.testing.assert_frame_equal(frame.sort_values(column).reset_index(drop=True),
+                                          expected_group(conn, column, where), check_dtype=False)
+
+def test_aggregates_match_sql_through_changes(db):
+    rng = random.Random(7)
+    conn = db.get_connection()
+    snapshot = PostSnapshot()
+    assert snapshot.refresh(conn) == 0
+    assert_matches_sql(snapshot, conn)
+    
+    db.ingest_posts(random_posts(1, 300, rng))
+    assert snapshot.refresh(conn) == 300
+    assert len(snapshot) == 300
+    assert_matches_sql(snapshot, conn)
+    
+    score_posts(conn, rng, 'id % 3 != 0')
+    conn.execute("UPDATE social_posts SET canonical_post_id = 'post1' WHERE id % 7 = 0")
+    conn.execute("UPDATE social_posts SET verified = 1 WHERE id % 3 = 1")
+    conn.commit()
+    assert snapshot.refresh(conn) == 200 + 14  # scored rows, plus linked rows left unscored
+    assert_matches_sql(snapshot, conn)
+    
+    # New rows, rescored and newly linked rows, deletes and a new platform
+    db.ingest_posts(random_posts(301, 50, rng))
+    score_posts(conn, rng, 'id % 5 = 0')
+    conn.execute("UPDATE social_posts SET canonical_post_id = NULL WHERE id % 14 = 0")
+    conn.execute("UPDATE social_posts SET platform = 'myspace', ts_epoch = NULL WHERE id % 11 = 0")
+    conn.execute("DELETE FROM social_posts WHERE id % 13 = 0 OR id > 340")
+    conn.commit()
+    assert snapshot.refresh(conn) > 0
+    assert len(snapshot) == conn.execute("SELECT COUNT(*) FROM social_posts").fetchone()[0]
+    assert_matches_sql(snapshot, conn)
+    assert snapshot.refresh(conn) == 0
+
+def test_group_by_and_summary_agree_with_aggregate(db):
+    db.ingest_posts(random_posts(1, 40, random.Random(3)))
+    snapshot = PostSnapshot()
+    snapshot.refresh(db.get_connection())
+    mask = snapshot.mask(platform='reddit')
+    aggregates = snapshot.aggregate(mask)
+    assert snapshot.summary(mask) == aggregates['summary']
+    pd.testing.assert_frame_equal(snapshot.group_by(mask, 'keyword_matched'), aggregates['keyword_matched'])
+
+def test_top_ids(db):
+    db.ingest_posts([make_post(n, upvotes=likes, timestamp=f'2026-10-0{day}T12:00:00Z')
+                     for n, likes, day in ((1, 5, 1), (2, 9, 2), (3, 9, 1), (4, 1, 3), (5, 7, 2))])
+    snapshot = PostSnapshot()
+    snapshot.refresh(db.get_connection())
+    mask = snapshot.mask()
+    assert snapshot.top_ids(mask, 'engagement', 3) == [3, 2, 5]
+    assert snapshot.top_ids(mask, 'epoch', 2) == [4, 5]
+    assert snapshot.top_ids(mask, 'engagement', 10) == [3, 2, 5, 1, 4]
+    assert snapshot.top_ids(snapshot.mask(platform='myspace'), 'epoch', 5) == []
+    assert snapshot.top_ids(np.zeros(len(mask), dtype=bool), 'epoch', 5) == []
+
+def test_trend_and_platform_readers_match_sql(db, monkeypatch):
+    rng = random.Random(11)
+    conn = db.get_connection()
+    # Windows open on 2026-09-14, partway through random_posts' days
+    monkeypatch.setattr(database, 'day_start_epoch', lambda days: to_epoch('2026-09-14T00:00:00Z'))
+    
+    def expected(column, key):
+        frame = pd.read_sql_query(f'''
+            SELECT {key} AS "{column}", AVG(sentiment_score) AS avg_sentiment, COUNT(*) AS post_count,
+                   {', '.join(f"TOTAL(sentiment_label = '{label}') AS {label}" for label in LABELS)},
+                   AVG(COALESCE(engagement_score, 0)) AS avg_engagement
+            FROM social_posts WHERE ts_epoch >= ? GROUP BY 1 ORDER BY 1 DESC
+        ''', conn, params=[to_epoch('2026-09-14T00:00:00Z')]).astype({'avg_sentiment': float})
+        return frame
+    
+    def check():
+        pd.testing.assert_frame_equal(db.get_sentiment_trends(), expected('date', "date(ts_epoch, 'unixepoch')"),
+                                      check_dtype=False)
+        breakdown = expected('platform', 'platform').rename(columns={'post_count': 'total_posts'})
+        pd.testing.assert_frame_equal(
+            db.get_platform_breakdown().sort_values('platform').reset_index(drop=True),
+            breakdown[list(db.get_platform_breakdown().columns)].sort_values('platform').reset_index(drop=True),
+            check_dtype=False)
+    
+    db.ingest_posts(random_posts(1, 200, rng))
+    check()
+    score_posts(conn, rng, 'id % 2 = 0')
+    conn.execute("UPDATE social_posts SET canonical_post_id = 'post1' WHERE id % 9 = 0")
+    conn.commit()
+    check()
+    # Later days than the snapshot's bins reserve, a new platform and deletes
+    db.ingest_posts([make_post(n, timestamp='2027-03-01T08:00:00Z') for n in range(201, 206)])
+    conn.execute("UPDATE social_posts SET platform = 'myspace' WHERE id % 7 = 0")
+    conn.execute("DELETE FROM social_posts WHERE id % 5 = 0")
+    conn.commit()
+    check()
+
+def test_refresh_keeps_sums_equal_to_a_rebuild(db):
+    rng = random.Random(5)
+    conn = db.get_connection()
+    snapshot = PostSnapshot()
+    db.ingest_posts(random_posts(1, 150, rng))
+    score_posts(conn, rng, 'id % 2 = 0')
+    conn.commit()
+    snapshot.refresh(conn)
+    bins = snapshot._binned()
+    # Rescores, deletes and new rows on days and values the bins already hold
+    score_posts(conn, rng, 'id % 3 = 0')
+    conn.execute("DELETE FROM social_posts WHERE id % 8 = 0")
+    conn.commit()
+    db.ingest_posts(random_posts(151, 30, rng))
+    snapshot.refresh(conn)
+    assert snapshot._binned() is bins
+    
+    rebuilt = PostSnapshot()
+    rebuilt.refresh(conn)
+    for kwargs, _ in FILTERS:
+        kept, expected = (copy.aggregate(copy.mask(**kwargs)) for copy in (snapshot, rebuilt))
+        assert kept['summary'] == pytest.approx(expected['summary'])
+        for column in GROUP_KEYS:
+            pd.testing.assert_frame_equal(kept[column].sort_values(column).reset_index(drop=True),
+                                          expected[column].sort_values(column).reset_index(drop=True))
+    for column in ('day', 'platform'):
+        since_day = to_epoch('2026-09-14T00:00:00Z') // 86400
+        pd.testing.assert_frame_equal(*(copy.rollup(column, since_day).sort_values(column).reset_index(drop=True)
+                                        for copy in (snapshot, rebuilt)))
+
+def test_aggregate_of_any_mask_matches_its_rows(db):
+    rng = random.Random(19)
+    conn = db.get_connection()
+    db.ingest_posts(random_posts(1, 400, rng))
+    score_posts(conn, rng, 'id % 4 != 0')
+    conn.execute("DELETE FROM social_posts WHERE id % 10 = 0")
+    conn.commit()
+    snapshot = PostSnapshot()
+    snapshot.refresh(conn)
+    ids = snapshot.ids[snapshot.live]
+    
+    # Sparse masks bincount their rows, dense ones subtract the rest from the totals
+    picker = np.random.default_rng(19)
+    for share in (0, 0.1, 0.49, 0.51, 0.9, 1):
+        chosen = ids[picker.random(len(ids)) < share]
+        aggregates = snapshot.aggregate(np.isin(snapshot.ids, chosen))
+        where = f"id IN ({', '.join(map(str, chosen))})" if len(chosen) else '0'
+        assert aggregates['summary'] == pytest.approx(expected_summary(conn, where))
+        for column in GROUP_KEYS:
+            pd.testing.assert_frame_equal(aggregates[column].sort_values(column).reset_index(drop=True),
+                                          expected_group(conn, column, where), check_dtype=False)
@@ -0,0 +1,29 @@
+import sqlite3
+import query_builder
+from query_builder import MIN_IN_LIST, WINDOW_STEP_SECONDS, in_list, window_start
+
+def test_window_start_rounds_down_to_the_step(monkeypatch):
+    monkeypatch.setattr(query_builder, 'epoch_days_ago', lambda days: 1_790_000_000 - days * 86400)
+    assert window_start(7) == 1_789_394_400
+    assert window_start(7) % WINDOW_STEP_SECONDS == 0
+    assert 0 <= 1_790_000_000 - 7 * 86400 - window_start(7) < WINDOW_STEP_SECONDS
+
+def test_in_list_pads_to_a_power_of_two():
+    assert in_list([]) == ('()', [])
+    sizes = {}
+    for length in (1, MIN_IN_LIST, MIN_IN_LIST + 1, 100):
+        placeholders, params = in_list(range(length))
+        assert placeholders.count('?') == len(params)
+        assert params[:length] == list(range(length))
+        assert set(params[length:]) <= {length - 1}
+        sizes[length] = len(params)
+    assert sizes == {1: MIN_IN_LIST, MIN_IN_LIST: MIN_IN_LIST, MIN_IN_LIST + 1: 2 * MIN_IN_LIST, 100: 128}
+
+def test_in_list_queries_match_the_values():
+    conn = sqlite3.connect(':memory:')
+    conn.execute("CREATE TABLE t (x INTEGER)")
+    conn.executemany("INSERT INTO t VALUES (?)", [(x,) for x in range(20)])
+    for values in ([], [3], [5, 1, 17]):
+        placeholders, params = in_list(values)
+        found = [row[0] for row in conn.execute(f"SELECT x FROM t WHERE x IN {placeholders} ORDER BY x", params)]
+        assert found == sorted(values)
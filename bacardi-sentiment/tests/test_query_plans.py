@@ -0,0 +1,13 @@
+from check_query_plans import DASHBOARD_QUERIES, capture_manager_queries, full_table_scans, seed_posts
+
+def test_manager_and_dashboard_queries_use_indexes(db):
+    seed_posts(db, 2000)
+    queries = capture_manager_queries(db)
+    assert queries
+    conn = db.get_connection()
+    for sql in queries + list(DASHBOARD_QUERIES.values()):
+        assert full_table_scans(conn, sql) == [], sql
+
+def test_a_full_scan_is_reported(db):
+    scans = full_table_scans(db.get_connection(), "SELECT id FROM social_posts WHERE text LIKE '%rum%'")
+    assert scans and scans[0].startswith('SCAN social_posts')
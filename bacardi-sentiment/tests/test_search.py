@@ -0,0 +1,83 @@
+import database
+from conftest import make_post
+from database import fts_query, post_filters
+
+def search_authors(db, query, **kwargs):
+    return sorted(db.search_posts(query, **kwargs)['author'])
+
+def test_query_text_is_quoted():
+    assert fts_query('bacardi rum') == '"bacardi" "rum"'
+    assert fts_query('hango*') == '"hango"*'
+    assert fts_query('bacardi AND (rum OR "gin') == '"bacardi" "AND" "rum" "OR" "gin"'
+    assert fts_query(' !? ') == ''
+
+def test_no_filters_leave_out_duplicates():
+    assert post_filters({}) == (['canonical_post_id IS NULL'], [])
+    assert post_filters({'include_duplicates': True}) == ([], [])
+    assert post_filters({'platform': None, 'days': 0, 'min_engagement': 0, 'verified_only': False}) == (
+        ['canonical_post_id IS NULL'], []
+    )
+
+def test_every_filter_becomes_a_param(monkeypatch):
+    monkeypatch.setattr(database, 'window_start', lambda days: days * 1000)
+    conditions, params = post_filters({
+        'keyword_matched': "x' OR 1=1 --",
+        'platform': 'reddit',
+        'days': 30,
+        'min_engagement': 5,
+        'verified_only': True,
+        'include_duplicates': True,
+    }, alias='p.')
+    assert conditions == [
+        'p.platform = ?',
+        'p.keyword_matched = ?',
+        'p.ts_epoch >= ?',
+        'COALESCE(p.engagement_score, 0) >= ?',
+        'p.verified = 1',
+    ]
+    assert params == ['reddit', "x' OR 1=1 --", 30000, 5]
+
+def test_every_word_must_appear(db):
+    db.ingest_posts([
+        make_post(1, text='Bacardi Superior in a classic daiquiri tonight'),
+        make_post(2, text='A piña colada made with Bacardi coconut'),
+        make_post(3, text='Havana Club anejo neat, no mixers at all'),
+    ])
+    assert search_authors(db, 'bacardi') == ['author1', 'author2']
+    assert search_authors(db, 'bacardi daiquiri') == ['author1']
+    assert search_authors(db, 'pina') == ['author2']          # diacritics folded
+    assert search_authors(db, 'daiqu*') == ['author1']
+    assert search_authors(db, 'havana AND OR (') == []        # operators are plain words
+    assert db.search_posts('   ').empty
+
+def test_best_match_ranks_first_with_snippet(db):
+    db.ingest_posts([
+        make_post(1, text='rum cocktails for the weekend with friends and a few snacks'),
+        make_post(2, text='rum rum rum, nothing but rum at this rum bar'),
+    ])
+    results = db.search_posts('rum')
+    assert list(results['author']) == ['author2', 'author1']
+    assert '**rum**' in results['snippet'].iloc[0]
+
+def test_filters_and_duplicates(db):
+    text = 'just tried bacardi with ginger beer and fresh lime and it was honestly great'
+    db.ingest_posts([
+        make_post(1, text=text),
+        make_post(2, text=f'{text} https://example.com/repost'),
+        make_post(3, text=f'bacardi on the beach {text[:20]}', platform='youtube'),
+    ])
+    assert search_authors(db, 'bacardi') == ['author1', 'author3']
+    assert search_authors(db, 'bacardi', filters={'include_duplicates': True}) == ['author1', 'author2', 'author3']
+    assert search_authors(db, 'bacardi', filters={'platform': 'youtube'}) == ['author3']
+
+def test_best_matches_win_regardless_of_age(db, monkeypatch):
+    # The oldest post is the best match; filters leave fewer than the limit among the first candidates
+    db.ingest_posts([make_post(n, text=f'bacardi review {n} ' + 'filler ' * n) for n in range(1, 9)]
+                    + [make_post(9, text='bacardi on the beach', platform='youtube')])
+    monkeypatch.setattr(database, 'SEARCH_CANDIDATES', 2)
+    results = db.search_posts('bacardi', limit=3)
+    assert list(results['author']) == ['author1', 'author9', 'author2']
+    assert list(db.search_posts('bacardi', filters={'platform': 'reddit'}, limit=3)['author']) == [
+        'author1', 'author2', 'author3'
+    ]
+    assert len(db.search_posts('bacardi', filters={'platform': 'reddit'}, limit=50)) == 8
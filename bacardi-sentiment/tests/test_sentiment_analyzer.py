@@ -0,0 +1,87 @@
+import random
+import pytest
+import analyze_sentiment
+from benchmark_sentiment import legacy_clean_text, make_corpus
+from sentiment_analyzer import SentimentAnalyzer
+
+TEXTS = [post['text'] for post in make_corpus(300)] + [
+    'Bacardi is GREAT!!', 'not a good rum', '', 'kind of bad but really tasty', 'meh', 'worst hangover ever',
+]
+
+@pytest.fixture(scope='module')
+def exact():
+    return SentimentAnalyzer()
+
+@pytest.fixture
+def cascade():
+    return SentimentAnalyzer(engine='cascade')
+
+def test_cascade_scores_every_post_on_the_combined_scale(exact, cascade):
+    batch = list(cascade.iter_batch_results(cascade.analyze_batch(TEXTS)))
+    for text, result in zip(TEXTS, batch):
+        assert result['textblob_score'] is not None
+        assert result['sentiment_score'] == pytest.approx(cascade.combine(result['textblob_score'], result['vader_score']))
+        assert result['vader_score'] == exact.analyze_sentiment(text)['vader_score']
+        assert result == cascade.analyze_sentiment(text)
+
+def test_cascade_escalates_posts_near_a_cut_point(exact):
+    cleaned = [exact.clean_text(text) for text in TEXTS]
+    for band in (0.0, 0.1, 0.25, 5.0):
+        cascade = SentimentAnalyzer(engine='cascade')
+        cascade.cascade_band = band
+        approximate = cascade.lexicon.score_batch(cleaned)[0]
+        textblob_scores, vader_scores = cascade.score_many(cleaned)
+        
+        uncertain = [cascade.is_uncertain(cascade.combine(tb, vd)) for tb, vd in zip(approximate, vader_scores)]
+        for text, is_uncertain, approximation, textblob in zip(cleaned, uncertain, approximate, textblob_scores):
+            assert textblob == (exact.textblob_polarity(text) if is_uncertain else approximation)
+        assert cascade.cascade_stats() == {
+            'scored': len(cleaned),
+            'escalated': sum(uncertain),
+            'escalation_rate': sum(uncertain) / len(cleaned),
+        }
+    # A band wider than the score range escalates every post and matches the exact engine
+    assert cascade.cascade_stats()['escalation_rate'] == 1.0
+    assert cascade.analyze_sentiment(TEXTS[0]) == dict(exact.analyze_sentiment(TEXTS[0]),
+                                                       scorer_version=cascade.scorer_version)
+
+def test_escalation_rate_report_sums_every_process(capsys):
+    analyze_sentiment.print_cascade_stats({
+        101: {'cache': None, 'cascade': {'scored': 30, 'escalated': 6, 'escalation_rate': 0.2}},
+        102: {'cache': None, 'cascade': {'scored': 10, 'escalated': 4, 'escalation_rate': 0.4}},
+    })
+    assert capsys.readouterr().out == "Cascade: 10/40 posts needed TextBlob (25.0% escalated, 75.0% approximated)\n"
+    analyze_sentiment.print_cascade_stats({101: {'cache': None, 'cascade': None}})
+    assert capsys.readouterr().out == ''
+
+@pytest.mark.parametrize('engine', ['exact', 'lexicon', 'cascade'])
+def test_batch_results_match_single_posts(engine):
+    analyzer = SentimentAnalyzer(engine=engine)
+    texts = TEXTS + [TEXTS[0], '@bacardi #rum https://example.com', None]
+    batch = list(analyzer.iter_batch_results(analyzer.analyze_batch(texts)))
+    assert batch == [analyzer.analyze_sentiment(text or '') for text in texts]
+
+def test_a_failing_batch_is_rescored_post_by_post(exact, monkeypatch):
+    def fail_batch(texts):
+        raise ValueError('batch failed')
+    
+    def fail_on_broken(text):
+        if text == 'broken':
+            raise ValueError('post failed')
+        return SentimentAnalyzer.analyze_sentiment(exact, text)
+    monkeypatch.setattr(exact, 'analyze_batch', fail_batch)
+    monkeypatch.setattr(exact, 'analyze_sentiment', fail_on_broken)
+    posts = [{'post_id': f'post{n}', 'text': text} for n, text in enumerate(['great rum', 'broken', 'awful'])]
+    results = analyze_sentiment.score_posts(exact, posts)
+    assert [post for post, _ in results] == posts
+    assert results[1][1] == {'error': 'post failed'}
+    assert [sentiment['sentiment_label'] for _, sentiment in results[0::2]] == ['positive', 'negative']
+
+def test_clean_text_matches_the_three_pass_cleanup(exact):
+    pieces = ['bacardi', 'rum', '@bacardi', '#mojito', 'https://t.co/x1', 'http://a.b/c?d=e', '@user#tag',
+              '#tag@user', '@userhttps://x.y', '#taghttp://x', 'mail@example.com', 'Añejo', '#año', '@_x_',
+              '@', '#', '!!', '😀', 'httpnot', '#http', 'x@http://y', '\t', '\n']
+    rng = random.Random(10)
+    texts = [''.join(rng.choice(pieces + [' '] * 6) for _ in range(rng.randint(0, 12))) for _ in range(3000)]
+    for text in texts + pieces:
+        assert exact.clean_text(text) == legacy_clean_text(text), text
@@ -0,0 +1,50 @@
+import pytest
+from sentiment_analyzer import SentimentAnalyzer
+from sentiment_cache import SentimentCache
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = SentimentCache(str(tmp_path / 'sentiment_cache.db'), max_memory_entries=2)
+    yield cache
+    cache.close()
+
+def test_key_depends_on_text_and_version():
+    key = SentimentCache.make_key('great rum', '1')
+    assert key == SentimentCache.make_key('great rum', '1')
+    assert key != SentimentCache.make_key('great rum', '2')
+    assert key != SentimentCache.make_key('great rum!', '1')
+
+def test_entries_survive_reopening(tmp_path, cache):
+    key = cache.make_key('great rum', '1')
+    cache.put(key, (0.8, 0.6), '1')
+    cache.close()
+    
+    reopened = SentimentCache(cache.db_path)
+    try:
+        assert reopened.get(key) == (0.8, 0.6)
+        assert reopened.stats()['disk_hits'] == 1
+    finally:
+        reopened.close()
+
+def test_memory_is_bounded_and_falls_back_to_disk(cache):
+    keys = [cache.make_key(f'text {n}', '1') for n in range(3)]
+    cache.put_many({key: (n / 10, n / 10) for n, key in enumerate(keys)}, '1')
+    assert len(cache.memory) == 2
+    assert keys[0] not in cache.memory
+    
+    assert cache.get_many(keys) == {key: (n / 10, n / 10) for n, key in enumerate(keys)}
+    assert cache.stats() == {'memory_hits': 2, 'disk_hits': 1, 'misses': 0, 'hit_rate': 1.0}
+
+def test_purge_drops_other_versions(cache):
+    old, new = cache.make_key('rum', '0'), cache.make_key('rum', '1')
+    cache.put(old, (0.1, 0.1), '0')
+    cache.put(new, (0.2, 0.2), '1')
+    assert cache.purge_other_versions('1') == 1
+    assert cache.get_many([old, new]) == {new: (0.2, 0.2)}
+
+def test_analyzer_scores_a_cached_text_once(cache):
+    analyzer = SentimentAnalyzer(cache=cache)
+    first = analyzer.analyze_sentiment('Bacardi mojitos are absolutely wonderful')
+    assert cache.stats()['misses'] == 1
+    assert analyzer.analyze_sentiment('Bacardi mojitos are absolutely wonderful') == first
+    assert cache.stats()['misses'] == 1
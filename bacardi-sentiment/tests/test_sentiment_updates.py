@@ -0,0 +1,94 @@
+import pytest
+from conftest import make_post
+from database import DatabaseManager
+from sentiment_analyzer import SentimentAnalyzer
+
+TEXT = 'just tried bacardi with ginger beer and fresh lime and it was honestly great'
+
+RESULT = {
+    'sentiment_score': 0.62,
+    'sentiment_label': 'positive',
+    'confidence': 0.62,
+    'textblob_score': 0.5,
+    'vader_score': 0.7,
+    'scorer_version': '1',
+}
+
+def stored_sentiment(db, post_id):
+    return db.get_connection().execute('''
+        SELECT sentiment_score, sentiment_label, confidence_score, textblob_score, vader_score, scorer_version
+        FROM social_posts WHERE post_id = ?
+    ''', (post_id,)).fetchone()
+
+def test_update_post_sentiment_writes_components_to_duplicates(db):
+    db.ingest_posts([make_post(1, text=TEXT), make_post(2, text=f'{TEXT} https://example.com/repost')])
+    db.update_post_sentiment('post1', RESULT)
+    expected = (0.62, 'positive', 0.62, 0.5, 0.7, '1')
+    assert stored_sentiment(db, 'post1') == expected
+    assert stored_sentiment(db, 'post2') == expected
+
+def test_update_post_sentiment_accepts_confidence_score(db):
+    db.ingest_posts([make_post(1)])
+    result = {key: value for key, value in RESULT.items() if key != 'confidence'}
+    db.update_post_sentiment('post1', dict(result, confidence_score=0.4))
+    assert stored_sentiment(db, 'post1')[2] == 0.4
+
+def test_update_post_sentiment_ignores_unknown_posts(db):
+    db.update_post_sentiment('missing', RESULT)
+    assert db.get_connection().execute("SELECT COUNT(*) FROM social_posts").fetchone()[0] == 0
+
+def test_relabel_matches_the_analyzer_under_new_weights_and_thresholds(db):
+    db.ingest_posts([make_post(n) for n in range(1, 6)])
+    components = {'post1': (0.4, 0.1), 'post2': (-0.3, 0.05), 'post3': (None, -0.2), 'post4': (0.0, 0.12)}
+    conn = db.get_connection()
+    rows = conn.execute("SELECT id, post_id FROM social_posts").fetchall()
+    db.update_post_sentiments([
+        ({'id': row_id, 'post_id': post_id},
+         dict(RESULT, textblob_score=components[post_id][0], vader_score=components[post_id][1]))
+        for row_id, post_id in rows if post_id in components
+    ])
+    
+    thresholds = {'positive': 0.15, 'negative': -0.05}
+    weights = {'textblob': 0.8, 'vader': 0.2}
+    assert db.relabel_posts(thresholds, weights) == (4, 3, 1)
+    
+    analyzer = SentimentAnalyzer()
+    analyzer.thresholds, analyzer.weights = thresholds, weights
+    for post_id, (textblob, vader) in components.items():
+        score, label, confidence = stored_sentiment(db, post_id)[:3]
+        expected = analyzer.combine(textblob, vader)
+        assert score == pytest.approx(expected)
+        assert label == analyzer.classify(expected)
+        assert confidence == pytest.approx(abs(expected))
+    assert stored_sentiment(db, 'post5')[:2] == (None, None)
+    
+    # Rows already matching the thresholds and weights are not rewritten
+    changes = conn.execute("SELECT COUNT(*) FROM post_changes").fetchone()[0]
+    assert db.relabel_posts(thresholds, weights) == (0, 0, 1)
+    assert conn.execute("SELECT COUNT(*) FROM post_changes").fetchone()[0] == changes
+    assert db.relabel_posts({'positive': 0.5, 'negative': -0.5}, weights) == (3, 3, 1)
+
+def test_data_version_moves_on_every_write(db, tmp_path):
+    versions = [db.get_data_version()]
+    
+    def moved():
+        versions.append(db.get_data_version())
+        return versions[-1] != versions[-2]
+    db.ingest_posts([make_post(1), make_post(2)])
+    assert moved()
+    assert not moved()
+    db.update_post_sentiment('post1', RESULT)
+    assert moved()
+    db.update_post_sentiments([({'id': 2, 'post_id': 'post2'}, RESULT)])
+    assert moved()
+    
+    # Writes through another connection, as by analyze_sentiment.py
+    other = DatabaseManager(db.db_path)
+    other.get_connection().execute("DELETE FROM social_posts WHERE post_id = 'post2'")
+    other.get_connection().commit()
+    assert moved()
+    other.ingest_posts([make_post(3)])
+    other.get_connection().execute("DELETE FROM social_posts WHERE post_id = 'post3'")
+    other.get_connection().commit()
+    assert moved()  # the newest id came and went; the deletion still counts
+    other.close_all()
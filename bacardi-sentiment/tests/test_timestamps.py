@@ -0,0 +1,62 @@
+import sqlite3
+from datetime import datetime, timezone
+import pytest
+import timestamps
+from timestamps import DAY_SECONDS, day_start_epoch, epoch_days_ago, format_epoch, to_day, to_epoch
+
+UTC_NOON = int(datetime(2026, 10, 1, 12, tzinfo=timezone.utc).timestamp())
+
+@pytest.mark.parametrize('value', [
+    '2026-10-01T12:00:00Z',
+    '2026-10-01T12:00:00+00:00',
+    '2026-10-01T14:00:00+02:00',
+    '2026-10-01 07:00:00-05:00',
+    datetime(2026, 10, 1, 12, tzinfo=timezone.utc),
+    UTC_NOON,
+    float(UTC_NOON) + 0.5,
+    str(UTC_NOON),
+])
+def test_collector_formats_parse_to_utc(value):
+    assert to_epoch(value) == UTC_NOON
+
+def test_naive_values_are_local_time():
+    assert to_epoch('2026-10-01T12:00:00') == int(datetime(2026, 10, 1, 12).timestamp())
+    assert to_epoch(datetime(2026, 10, 1, 12)) == int(datetime(2026, 10, 1, 12).timestamp())
+
+@pytest.mark.parametrize('value', [None, '', '  ', 'null', 'None', 'yesterday', True, False])
+def test_unparseable_values_give_none(value):
+    assert to_epoch(value) is None
+
+def test_days_are_utc_and_floor_before_1970():
+    assert to_day(UTC_NOON) == to_day(UTC_NOON - 12 * 3600) == UTC_NOON // DAY_SECONDS
+    assert to_day(UTC_NOON - 12 * 3600 - 1) == UTC_NOON // DAY_SECONDS - 1
+    assert to_day(-1) == -1
+    assert to_day(None) is None
+
+def test_window_bounds_match_sqlite():
+    conn = sqlite3.connect(':memory:')
+    for days in (0, 1, 30):
+        expected = conn.execute("SELECT CAST(strftime('%s', date('now', ?)) AS INTEGER)",
+                                (f'-{days} days',)).fetchone()[0]
+        assert day_start_epoch(days) == expected
+    now = conn.execute("SELECT CAST(strftime('%s', 'now') AS INTEGER)").fetchone()[0]
+    assert abs(epoch_days_ago(7) - (now - 7 * DAY_SECONDS)) <= 1
+
+def test_format_matches_sqlite_datetime():
+    conn = sqlite3.connect(':memory:')
+    for epoch in (0, UTC_NOON, UTC_NOON + 59):
+        assert format_epoch(epoch) == conn.execute("SELECT datetime(?, 'unixepoch')", (epoch,)).fetchone()[0]
+    assert format_epoch(None) is None
+
+class PrePy311Datetime(datetime):
+    """datetime whose fromisoformat() rejects a trailing Z, as before Python 3.11"""
+    @classmethod
+    def fromisoformat(cls, text):
+        if text[-1:] in ('Z', 'z'):
+            raise ValueError(f'Invalid isoformat string: {text!r}')
+        return super().fromisoformat(text)
+
+@pytest.mark.parametrize('value', ['2026-10-01T12:00:00Z', '2026-10-01T12:00:00z', '2026-10-01T12:00:00.000Z'])
+def test_trailing_z_parses_before_python_311(monkeypatch, value):
+    monkeypatch.setattr(timestamps, 'datetime', PrePy311Datetime)
+    assert to_epoch(value) == UTC_NOON
@@ -0,0 +1,51 @@
+import time
+from datetime import datetime, timezone
+
+DAY_SECONDS = 86400
+
+def to_epoch(value):
+    """UTC epoch seconds for a collector timestamp, or None if it can't be parsed
+    
+    Accepts ISO strings with or without an offset (YouTube's trailing Z
+    included), datetimes and raw epoch numbers. Naive values are read as
+    local time: that is what datetime.now() and datetime.fromtimestamp()
+    in the collectors produce.
+    """
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    if isinstance(value, datetime):
+        return int(value.timestamp())
+    text = str(value).strip()
+    if not text or text.lower() in ('null', 'none'):
+        return None
+    if text[-1:] in ('Z', 'z'):
+        # fromisoformat() only reads a trailing Z from Python 3.11 on
+        text = text[:-1] + '+00:00'
+    try:
+        return int(datetime.fromisoformat(text).timestamp())
+    except ValueError:
+        pass
+    try:
+        return int(float(text))
+    except ValueError:
+        return None
+
+def to_day(epoch):
+    """UTC day number (days since 1970-01-01) of an epoch, or None"""
+    return None if epoch is None else epoch // DAY_SECONDS
+
+def epoch_days_ago(days):
+    """Epoch bound for a rolling "last N days" window"""
+    return int(time.time()) - days * DAY_SECONDS
+
+def day_start_epoch(days_ago=0):
+    """Epoch of UTC midnight N days before today, the bound of date('now', '-N days')"""
+    return (int(time.time()) // DAY_SECONDS - days_ago) * DAY_SECONDS
+
+def format_epoch(epoch):
+    """'YYYY-MM-DD HH:MM:SS' in UTC, as SQLite's datetime() prints it"""
+    if epoch is None:
+        return None
+    return datetime.fromtimestamp(epoch, timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
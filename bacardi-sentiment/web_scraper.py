@@ -7,6 +7,7 @@ import random
 import re
 from urllib.parse import quote_plus
 from database import DatabaseManager
+from post_ids import stable_post_id
 import config
 
 class AdvancedWebScraper:
@@ -108,7 +109,7 @@ class AdvancedWebScraper:
                             if not text or len(text) < 10:
                                 continue
                             
-                            post_id = f"twitter_{hash(text + str(i))}"
+                            post_id = stable_post_id('twitter', text.strip()[:500], search_url)
                             
                             post_data = {
                                 'post_id': post_id,
@@ -206,7 +207,7 @@ class AdvancedWebScraper:
                             
                             if len(text_content) > 10:
                                 post_data = {
-                                    'post_id': f"instagram_{hash(text_content + str(i))}",
+                                    'post_id': stable_post_id('instagram', text_content[:300], url),
                                     'platform': 'instagram',
                                     'text': text_content[:300],
                                     'author': 'instagram_user',
@@ -296,7 +297,7 @@ class AdvancedWebScraper:
                             continue
                         
                         review_data = {
-                            'post_id': f"trustpilot_{hash(review_text)}",
+                            'post_id': stable_post_id('trustpilot', review_text, page.url),
                             'platform': 'trustpilot',
                             'text': review_text,
                             'author': 'anonymous',
@@ -362,7 +363,7 @@ class AdvancedWebScraper:
                             continue
                         
                         review_data = {
-                            'post_id': f"google_{hash(review_text)}",
+                            'post_id': stable_post_id('google_reviews', review_text[:400], page.url),
                             'platform': 'google_reviews',
                             'text': review_text[:400],
                             'author': 'google_user',
@@ -463,7 +464,7 @@ class AdvancedWebScraper:
                             continue
                         
                         article_data = {
-                            'post_id': f"news_{hash(full_text)}",
+                            'post_id': stable_post_id('news', full_text[:500], news_url),
                             'platform': 'news',
                             'text': full_text[:500],
                             'author': 'news_outlet',
@@ -650,16 +651,9 @@ class AdvancedWebScraper:
         print(f"📊 Total posts collected: {len(all_posts)}")
         
         # Save to database
-        saved_count = 0
-        for post in all_posts:
-            try:
-                if self.db.save_post(post):
-                    saved_count += 1
-            except Exception as e:
-                print(f"Error saving post: {e}")
-                continue
-        
-        print(f"💾 Saved {saved_count} posts to database")
+        counts = self.db.ingest_posts(all_posts)
+        print(f"💾 Saved {counts['inserted']} posts to database "
+              f"({counts['ignored']} already stored, {counts['failed']} failed)")
         
         return all_posts
 